@@ -0,0 +1,352 @@
+"""Бенчмарки создания документов и рассылки приглашений
+
+Для каждого размера таблицы создается синтетическая таблица участников,
+и каждый этап (сертификаты и благодарственные письма, дипломы, приглашения)
+запускается в отдельном процессе с настоящими шаблонами, конвертером-
+заглушкой (backend = fake) и SMTP сервером-заглушкой в том же процессе.
+Для этапа записываются документы в секунду, пиковая память процесса (RSS)
+и разбивка времени по операциям из отчета metrics.
+
+    python benchmarks/run_benchmarks.py --sizes 100 1000 --output results.json
+    python benchmarks/run_benchmarks.py --baseline results.json
+    python benchmarks/run_benchmarks.py --set processing.renderer=zip
+
+С --baseline результаты сравниваются с прошлыми: если скорость этапа
+упала больше допустимого (--tolerance), программа завершается с кодом 1.
+"""
+
+import argparse
+import configparser
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:
+    # На Windows пиковая память не измеряется
+    resource = None
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+
+STAGES = ("documents", "diplomas", "invitations")
+DEFAULT_SIZES = (100, 1000, 10000)
+
+# Шаблоны берутся из репозитория
+TEMPLATE_OPTIONS = (
+    "gratitude_template",
+    "certificate_template",
+    "invitation_template",
+    "winner_template",
+    "email_template",
+)
+
+
+def write_config(workdir, roster_path, overrides):
+    """Создает config.ini бенчмарка на основе config.ini репозитория
+
+    Конвертер и SMTP заменяются заглушками, ограничения скорости, кэш PDF
+    и журнал рассылки отключаются, чтобы измерялась вся работа целиком.
+    """
+    config = configparser.ConfigParser()
+    config.read(os.path.join(REPO_DIR, "config.ini"), encoding="utf-8")
+    for option in TEMPLATE_OPTIONS:
+        config.set("files", option, os.path.join(REPO_DIR, config.get("files", option)))
+    config.set("files", "excel_file", roster_path)
+    config.set("paths", "output_dir", os.path.join(workdir, "output"))
+
+    settings = {
+        "converter": {"backend": "fake"},
+        "rate_limits": {"render": "0", "convert": "0", "smtp": "0"},
+        "email": {
+            "smtp_server": "127.0.0.1",
+            "starttls": "false",
+            "sender_email": "benchmark@example.com",
+            "sender_password": "",
+        },
+        "cache": {"enabled": "false"},
+        "ledger": {"enabled": "false"},
+        "metrics": {"enabled": "true"},
+    }
+    for override in overrides:
+        key, value = override.split("=", 1)
+        section, option = key.split(".", 1)
+        settings.setdefault(section, {})[option] = value
+    for section, options in settings.items():
+        if not config.has_section(section):
+            config.add_section(section)
+        for option, value in options.items():
+            config.set(section, option, value)
+
+    config_path = os.path.join(workdir, "config.ini")
+    with open(config_path, "w", encoding="utf-8") as file:
+        config.write(file)
+    return config_path
+
+
+def count_pdf_files(directory):
+    """Число PDF участников (без общих PDF и PDF фона шаблонов)"""
+    count = 0
+    for root, dirs, files in os.walk(directory):
+        if os.path.basename(root) == "overlay_backgrounds":
+            continue
+        count += sum(
+            1 for file in files if file.endswith(".pdf") and not file.startswith("Все_")
+        )
+    return count
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # На Linux ru_maxrss в килобайтах
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def run_stage(stage, config_path):
+    """Выполняет один этап в текущем процессе и возвращает его результаты"""
+    import metrics
+    from blag_sert import DocumentGenerator
+    from conference_run import OVERLAY_TEMPLATES
+    from diplomas_generator import DiplomaGenerator
+    from e_mail_sender import process_invitations
+    from pdf_cache import create_pdf_cache
+    from pdf_converters import create_converter
+    from pdf_overlay import create_overlay_renderer
+    from rate_limit import create_rate_limiter
+    from roster import ROSTER_COLUMNS, load_roster, prepare_participants
+    from smtp_sink import SmtpSink
+
+    config = configparser.ConfigParser()
+    config.read(config_path, encoding="utf-8")
+    files = config["files"]
+    output_dir = config.get("paths", "output_dir")
+    renderer = config.get("processing", "renderer", fallback="docx")
+    participants = prepare_participants(
+        load_roster(files["excel_file"], ROSTER_COLUMNS)
+    )
+
+    with SmtpSink() as sink, create_converter(config) as converter, open(
+        os.devnull, "w", encoding="utf-8"
+    ) as devnull:
+        config.set("email", "smtp_port", str(sink.port))
+        overlay = None
+        if renderer == "overlay" and stage != "invitations":
+            overlay = create_overlay_renderer(
+                config,
+                converter,
+                output_dir,
+                [files[option] for option in OVERLAY_TEMPLATES[stage]],
+            )
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(devnull):
+            if stage == "documents":
+                generator = DocumentGenerator(
+                    cleanup_docx=config.getboolean("processing", "cleanup_docx"),
+                    render_limiter=create_rate_limiter(config, "render"),
+                    renderer=renderer,
+                    workers=config.getint("processing", "workers", fallback=1),
+                    converter=converter,
+                    pdf_cache=create_pdf_cache(
+                        config, output_dir, converter.name, renderer, overlay
+                    ),
+                    combined_conversion=config.getboolean(
+                        "processing", "combined_conversion", fallback=False
+                    ),
+                    combined_batch_size=config.getint(
+                        "processing", "combined_batch_size", fallback=0
+                    ),
+                    overlay=overlay,
+                    stream_chunk_size=config.getint(
+                        "processing", "stream_chunk_size", fallback=0
+                    ),
+                )
+                generator.generate_documents(
+                    files["excel_file"],
+                    files["gratitude_template"],
+                    files["certificate_template"],
+                    output_dir,
+                    participants,
+                )
+                expected = 2 * len(participants)
+            elif stage == "diplomas":
+                generator = DiplomaGenerator(converter=converter, overlay=overlay)
+                generator.generate_diplomas(config, participants)
+                expected = sum(1 for participant in participants if participant.prize)
+            else:
+                process_invitations(config, participants, converter)
+                expected = len(participants)
+        elapsed = time.perf_counter() - start
+
+        report_path = metrics.write_reports(config, output_dir, stage)
+        emails = sink.messages
+
+    with open(report_path, encoding="utf-8") as file:
+        report = json.load(file)
+    documents = count_pdf_files(output_dir)
+    return {
+        "stage": stage,
+        "participants": len(participants),
+        "expected_documents": expected,
+        "documents": documents,
+        "emails": emails,
+        "seconds": round(elapsed, 3),
+        "docs_per_second": round(documents / elapsed, 2) if elapsed else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "operations": {
+            name: {
+                key: stats[key]
+                for key in ("count", "errors", "mean_seconds", "total_seconds")
+            }
+            for name, stats in report["stages"].items()
+        },
+    }
+
+
+def run_child(stage, config_path):
+    """Запускает этап в отдельном процессе, чтобы память мерилась только для него"""
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", stage, config_path],
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        cwd=os.path.dirname(config_path),
+    )
+    if completed.returncode != 0:
+        error = (completed.stderr.strip().splitlines() or ["неизвестная ошибка"])[-1]
+        return {"stage": stage, "error": error}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline_path, tolerance):
+    """Сравнивает скорость с прошлыми результатами, возвращает список замедлений"""
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = json.load(file)
+    previous = {
+        (entry["size"], entry["stage"]): entry.get("docs_per_second")
+        for entry in baseline["results"]
+    }
+
+    regressions = []
+    for entry in results:
+        old = previous.get((entry["size"], entry["stage"]))
+        new = entry.get("docs_per_second")
+        if not old or new is None:
+            continue
+        change = new / old - 1
+        print(
+            f"  {entry['stage']:<12} {entry['size']:>6}: {old:>9.1f} -> {new:>9.1f} док/с"
+            f" ({change:+.0%})"
+        )
+        if change < -tolerance:
+            regressions.append(entry)
+    return regressions
+
+
+def print_row(entry):
+    if "error" in entry:
+        print(f"{entry['stage']:<12} {entry['size']:>6}  ОШИБКА: {entry['error']}")
+        return
+    rss = entry["peak_rss_mb"]
+    print(
+        f"{entry['stage']:<12} {entry['size']:>6} {entry['documents']:>8}"
+        f" {entry['seconds']:>9.2f} {entry['docs_per_second']:>9.1f}"
+        f" {rss if rss is not None else '-':>9}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки создания документов")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="строк в таблице"
+    )
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="прошлые результаты для сравнения")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="допустимое замедление (доля, по умолчанию 0.2)",
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="SECTION.OPTION=VALUE",
+        help="изменить настройку config.ini бенчмарка",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="не удалять рабочие папки")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_stage(*args.child), ensure_ascii=False))
+        return 0
+
+    from roster import ROSTER_COLUMNS, load_roster
+    from synthetic_roster import write_roster
+
+    print(
+        f"{'Этап':<12} {'Строк':>6} {'PDF':>8} {'Секунд':>9} {'Док/с':>9} {'RSS, МБ':>9}"
+    )
+    results = []
+    for size in args.sizes:
+        workdir = tempfile.mkdtemp(prefix=f"conference_bench_{size}_")
+        try:
+            roster_path = os.path.join(workdir, "roster.xlsx")
+            write_roster(size, roster_path, args.seed)
+            # Разбор Excel выполняется один раз, этапы читают кэш таблицы
+            load_roster(roster_path, ROSTER_COLUMNS)
+            config_path = write_config(workdir, roster_path, args.set)
+
+            for stage in args.stages:
+                output_dir = os.path.join(workdir, "output")
+                shutil.rmtree(output_dir, ignore_errors=True)
+                entry = {"size": size, **run_child(stage, config_path)}
+                results.append(entry)
+                print_row(entry)
+        finally:
+            if args.keep:
+                print(f"Рабочая папка: {workdir}")
+            else:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "settings": args.set,
+                "results": results,
+            },
+            file,
+            ensure_ascii=False,
+            indent=2,
+        )
+    print(f"\nРезультаты: {args.output}")
+
+    failed = [entry for entry in results if "error" in entry]
+    if args.baseline:
+        print(f"\nСравнение с {args.baseline}:")
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"Замедление больше {args.tolerance:.0%}: {len(regressions)} этапов")
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
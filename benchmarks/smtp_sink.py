@@ -0,0 +1,106 @@
+"""SMTP сервер-заглушка для бенчмарков
+
+Принимает письма в отдельном потоке того же процесса и только считает их,
+поэтому время отправки определяется программой, а не почтовым сервером.
+Поддерживает команды, которые использует smtplib без STARTTLS и
+авторизации. Для тестов запоминает адресатов принятых писем и может
+отклонять заданные адреса.
+"""
+
+import socketserver
+import threading
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self):
+        self.reply("220 benchmark sink ready")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("ascii", "replace").strip().upper()
+            if command.startswith("EHLO"):
+                self.wfile.write(b"250-benchmark sink\r\n250 SIZE 104857600\r\n")
+            elif command.startswith("RCPT"):
+                address = line.decode("ascii", "replace").partition(":")[2]
+                address = address.strip().strip("<>")
+                if address in self.server.rejected:
+                    self.reply("550 Mailbox unavailable")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif command.startswith(("MAIL", "RSET")):
+                # Новое письмо: адресаты предыдущего больше не действуют
+                recipients = []
+                self.reply("250 OK")
+            elif command.startswith(("HELO", "NOOP")):
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                size = self.read_message()
+                self.server.record(size, recipients)
+                recipients = []
+                self.reply("250 OK queued")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+    def read_message(self):
+        size = 0
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b".\r\n", b".\n"):
+                return size
+            size += len(line)
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    """SMTP сервер на 127.0.0.1, считающий принятые письма и их объем
+
+    with SmtpSink() as sink:
+        ...  # отправка на 127.0.0.1:sink.port
+        print(sink.messages)
+
+    rejected - адреса, которые отклоняются кодом 550, recipients - адреса
+    принятых писем в порядке их получения.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0, rejected=()):
+        super().__init__(("127.0.0.1", port), _SmtpHandler)
+        self.port = self.server_address[1]
+        self.rejected = set(rejected)
+        self.messages = 0
+        self.bytes = 0
+        self.recipients = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def record(self, size, recipients=()):
+        with self._lock:
+            self.messages += 1
+            self.bytes += size
+            self.recipients.extend(recipients)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
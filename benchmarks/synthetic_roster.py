@@ -0,0 +1,145 @@
+"""Синтетическая таблица участников для бенчмарков
+
+Создает таблицу с колонками настоящей таблицы участников: русские ФИО
+(мужские и женские с согласованными отчествами), ФИО руководителей,
+длинные названия докладов, e-mail и места призеров.
+
+    python benchmarks/synthetic_roster.py 1000 roster_1000.xlsx
+"""
+
+import os
+import random
+import sys
+
+import pandas as pd
+
+
+MALE_NAMES = [
+    "Александр", "Алексей", "Андрей", "Артём", "Владимир", "Дмитрий", "Евгений",
+    "Иван", "Илья", "Кирилл", "Максим", "Михаил", "Никита", "Николай", "Павел",
+    "Роман", "Сергей", "Тимофей", "Фёдор", "Ярослав",
+]
+FEMALE_NAMES = [
+    "Алина", "Анастасия", "Анна", "Валерия", "Варвара", "Виктория", "Дарья",
+    "Екатерина", "Елизавета", "Ксения", "Мария", "Наталья", "Ольга", "Полина",
+    "Софья", "Татьяна", "Ульяна", "Юлия",
+]
+# Отчества: мужская и женская форма
+PATRONYMICS = [
+    ("Александрович", "Александровна"), ("Алексеевич", "Алексеевна"),
+    ("Андреевич", "Андреевна"), ("Викторович", "Викторовна"),
+    ("Владимирович", "Владимировна"), ("Дмитриевич", "Дмитриевна"),
+    ("Игоревич", "Игоревна"), ("Ильич", "Ильинична"),
+    ("Михайлович", "Михайловна"), ("Николаевич", "Николаевна"),
+    ("Олегович", "Олеговна"), ("Петрович", "Петровна"),
+    ("Сергеевич", "Сергеевна"), ("Юрьевич", "Юрьевна"),
+]
+# Фамилии: мужская и женская форма
+SURNAMES = [
+    ("Иванов", "Иванова"), ("Смирнов", "Смирнова"), ("Кузнецов", "Кузнецова"),
+    ("Попов", "Попова"), ("Васильев", "Васильева"), ("Петров", "Петрова"),
+    ("Соколов", "Соколова"), ("Михайлов", "Михайлова"), ("Новиков", "Новикова"),
+    ("Фёдоров", "Фёдорова"), ("Морозов", "Морозова"), ("Волков", "Волкова"),
+    ("Алексеев", "Алексеева"), ("Лебедев", "Лебедева"), ("Семёнов", "Семёнова"),
+    ("Егоров", "Егорова"), ("Павлов", "Павлова"), ("Козлов", "Козлова"),
+    ("Степанов", "Степанова"), ("Николаев", "Николаева"), ("Орлов", "Орлова"),
+    ("Андреев", "Андреева"), ("Макаров", "Макарова"), ("Никитин", "Никитина"),
+    ("Захаров", "Захарова"), ("Зайцев", "Зайцева"), ("Соловьёв", "Соловьёва"),
+    ("Белоусов", "Белоусова"), ("Воскресенский", "Воскресенская"),
+    ("Преображенский", "Преображенская"),
+]
+
+TITLE_STARTS = [
+    "Исследование влияния",
+    "Моделирование процессов",
+    "Сравнительный анализ методов оценки",
+    "Экспериментальное изучение",
+    "Разработка программного комплекса для анализа",
+    "Применение методов машинного обучения для прогнозирования",
+    "Особенности",
+    "Математическая модель",
+]
+TITLE_SUBJECTS = [
+    "температуры и влажности на рост микрозелени",
+    "распространения загрязнений в малых реках",
+    "энергопотребления школьного здания",
+    "устойчивости мостовых конструкций из композитных материалов",
+    "динамики численности популяций городских птиц",
+    "качества питьевой воды из различных источников",
+    "фразеологизмов с компонентом-зоонимом в русском и английском языках",
+    "солнечной активности и геомагнитных бурь",
+    "свойств биоразлагаемых пластиков на основе крахмала",
+]
+TITLE_CONTEXTS = [
+    "в условиях Среднего Урала",
+    "на примере Свердловской области",
+    "в лабораторных условиях школьного кабинета химии",
+    "с использованием открытых данных и микроконтроллеров Arduino",
+    "в период с 2015 по 2024 год",
+    "",
+]
+
+TRANSLIT = str.maketrans(
+    {
+        "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e",
+        "ж": "zh", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+        "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+        "ф": "f", "х": "h", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sch",
+        "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+    }
+)
+
+
+def random_person(rng):
+    """Возвращает (фамилия, имя, отчество) с согласованным родом"""
+    female = rng.random() < 0.5
+    form = 1 if female else 0
+    name = rng.choice(FEMALE_NAMES if female else MALE_NAMES)
+    return rng.choice(SURNAMES)[form], name, rng.choice(PATRONYMICS)[form]
+
+
+def random_title(rng):
+    parts = [
+        rng.choice(TITLE_STARTS),
+        rng.choice(TITLE_SUBJECTS),
+        rng.choice(TITLE_CONTEXTS),
+    ]
+    return " ".join(part for part in parts if part)
+
+
+def generate_roster(rows, seed=0, prize_share=0.15):
+    """Создает таблицу участников из rows строк (воспроизводимо по seed)"""
+    rng = random.Random(seed)
+    records = []
+    for number in range(rows):
+        surname, name, patronymic = random_person(rng)
+        supervisor = " ".join(random_person(rng))
+        login = f"{surname}.{name[0]}".lower().translate(TRANSLIT)
+        prize = rng.choice((1, 2, 3)) if rng.random() < prize_share else None
+        records.append(
+            {
+                "ФИО участника": f"{surname} {name} {patronymic}",
+                "Название доклада": random_title(rng),
+                "ФИО руководителя": supervisor,
+                "e-mail": f"{login}{number}@example.com",
+                "Призер": prize,
+            }
+        )
+    return pd.DataFrame(records)
+
+
+def write_roster(rows, path, seed=0):
+    """Сохраняет синтетическую таблицу в Excel или CSV (по расширению)"""
+    frame = generate_roster(rows, seed)
+    if os.path.splitext(path)[1].lower() == ".csv":
+        frame.to_csv(path, index=False)
+    else:
+        frame.to_excel(path, index=False)
+    return frame
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Использование: python synthetic_roster.py <число строк> <файл>")
+        sys.exit(1)
+    write_roster(int(sys.argv[1]), sys.argv[2])
@@ -1,99 +1,177 @@
-import pandas as pd
-from docx import Document
-from docx2pdf import convert
 import os
-import re
 import sys
-import time
 import configparser
+import gc
+import multiprocessing
+from collections import Counter
+import metrics
+import profiling
+from combined_convert import convert_combined
+from docx_templates import replace_placeholders
+from render_pool import RenderJob, iter_render_jobs, render_to_file
+from pdf_converters import Docx2PdfWorker, PdfConverter, create_converter
+from rate_limit import RateLimiter, create_rate_limiter
+from pdf_cache import create_pdf_cache, pdf_path_for
+from pdf_overlay import create_overlay_renderer
+from roster import iter_roster_chunks, load_roster, prepare_participants, split_chunks
 
 
 class DocumentGenerator:
-    def __init__(self, cleanup_docx=True, delay_between_files=1):
+    def __init__(
+        self,
+        cleanup_docx=True,
+        render_limiter=None,
+        renderer="docx",
+        workers=1,
+        converter=None,
+        pdf_cache=None,
+        roster_cache=True,
+        combined_conversion=False,
+        combined_batch_size=0,
+        overlay=None,
+        stream_chunk_size=0,
+    ):
         self.cleanup_docx = cleanup_docx
-        self.delay_between_files = delay_between_files
+        self.roster_cache = roster_cache
+        self.render_limiter = render_limiter or RateLimiter()
+        self.renderer = renderer
+        self.workers = workers
+        # Без явно заданного конвертера используется прежний docx2pdf
+        self.converter = converter or PdfConverter(
+            lambda index: Docx2PdfWorker(), name="docx2pdf"
+        )
+        # Кэш готовых PDF используется, только если DOCX не нужно сохранять
+        self.pdf_cache = pdf_cache if cleanup_docx else None
+        # Конвертация одним документом на пакет вместо отдельных файлов
+        self.combined_conversion = combined_conversion
+        self.combined_batch_size = combined_batch_size
+        # Заполнение наложением текста на PDF шаблона (OverlayRenderer)
+        self.overlay = overlay
+        # Потоковая обработка частями по stream_chunk_size участников (0 - выключена)
+        self.stream_chunk_size = stream_chunk_size
 
     def process_template(self, template_path, output_path, replacements):
         """Заполняет шаблон документа и сохраняет"""
         try:
-            doc = Document(template_path)
-
-            # Замена в параграфах
-            for paragraph in doc.paragraphs:
-                self._replace_in_paragraph(paragraph, replacements)
-
-            # Замена в таблицах
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        for paragraph in cell.paragraphs:
-                            self._replace_in_paragraph(paragraph, replacements)
-
-            # Замена в заголовках и нижних колонтитулах
-            for section in doc.sections:
-                for paragraph in section.header.paragraphs:
-                    self._replace_in_paragraph(paragraph, replacements)
-                for paragraph in section.footer.paragraphs:
-                    self._replace_in_paragraph(paragraph, replacements)
-
-            doc.save(output_path)
+            job = RenderJob(template_path, replacements, output_path)
+            render_to_file(job, replace_placeholders, self.renderer)
             return True
         except Exception as e:
             print(f"Ошибка при обработке шаблона {template_path}: {e}")
             return False
 
-    def _replace_in_paragraph(self, paragraph, replacements):
-        """Заменяет текст в параграфе с сохранением форматирования"""
-        # Собираем весь текст параграфа
-        full_text = "".join(run.text for run in paragraph.runs)
-
-        # Проверяем, есть ли замены в тексте
-        text_changed = False
-        for key, value in replacements.items():
-            if key in full_text:
-                full_text = full_text.replace(key, value)
-                text_changed = True
-
-        # Если были замены, обновляем текст
-        if text_changed:
-            # Очищаем все runs
-            for run in paragraph.runs:
-                run.text = ""
-
-            # Добавляем новый текст в первый run
-            if paragraph.runs:
-                paragraph.runs[0].text = full_text
+    def convert_to_pdf(self, docx_files, cache_keys=None):
+        """Конвертирует DOCX файлы в PDF пакетами и возвращает число успешных
+
+        cache_keys - {docx_path: ключ кэша}, созданные PDF сохраняются в кэш.
+        """
+        pairs = [(docx_file, pdf_path_for(docx_file)) for docx_file in docx_files]
+
+        converted = 0
+        for docx_file, pdf_file, error in self.converter.convert_batch(pairs):
+            if error is None:
+                converted += 1
+                if cache_keys and docx_file in cache_keys:
+                    self.pdf_cache.store(cache_keys[docx_file], pdf_file)
+                print(f"  Создан PDF: {os.path.basename(pdf_file)}")
             else:
-                # Если нет runs, добавляем новый
-                paragraph.add_run(full_text)
+                print(f"  Ошибка при конвертации: {os.path.basename(docx_file)}")
+        return converted
+
+    def convert_combined(self, jobs, labels, cache_keys=None):
+        """Заполняет документы в памяти и конвертирует их общим документом
+
+        Письма и сертификаты пакета конвертируются за одно обращение к
+        конвертеру, PDF пакета делится по страницам между участниками.
+        Возвращает списки созданных благодарственных писем и сертификатов.
+        """
+        print(
+            f"Конвертация общим документом, пакетами по {self.combined_batch_size or len(jobs)}"
+        )
+        results, _ = convert_combined(
+            jobs,
+            self.converter,
+            self.combined_batch_size,
+            save_docx=not self.cleanup_docx,
+            limiter=self.render_limiter,
+        )
+        return self.collect_pdf_results(results, labels, cache_keys)
+
+    def render_overlay(self, jobs, labels, cache_keys=None):
+        """Создает PDF наложением текста на PDF шаблонов, без DOCX и конвертации
+
+        Возвращает списки созданных благодарственных писем и сертификатов.
+        """
+        print("Документы создаются наложением текста на PDF шаблонов")
+        results = self.overlay.render_jobs(jobs, self.render_limiter)
+        return self.collect_pdf_results(results, labels, cache_keys)
 
-    def cleanup_docx_files(self, directory):
-        """Удаляет все DOCX файлы в указанной директории"""
+    def collect_pdf_results(self, results, labels, cache_keys=None):
+        """Выводит результаты создания PDF и сохраняет новые PDF в кэш
+
+        Возвращает списки созданных благодарственных писем и сертификатов.
+        """
+        created = {"gratitude": [], "certificate": []}
+        for (job, error), (kind, participant_name) in zip(results, labels):
+            if kind == "gratitude":
+                print(f"Обработка: {participant_name}")
+
+            pdf_file = pdf_path_for(job.output_path)
+            if error is None:
+                created[kind].append(job.output_path)
+                if cache_keys and job.output_path in cache_keys:
+                    self.pdf_cache.store(cache_keys[job.output_path], pdf_file)
+                print(f"  Создан PDF: {os.path.basename(pdf_file)}")
+            else:
+                print(f"  Ошибка при создании {os.path.basename(pdf_file)}: {error}")
+        return created["gratitude"], created["certificate"]
+
+    def cleanup_docx_files(self, directory, docx_files=None):
+        """Удаляет все DOCX файлы в указанной директории
+
+        docx_files - удалить только эти файлы, без обхода директории.
+        """
         if not self.cleanup_docx:
             print("Удаление DOCX файлов отключено в настройках")
             return
 
+        if docx_files is None:
+            docx_files = [
+                os.path.join(root, file)
+                for root, dirs, files in os.walk(directory)
+                for file in files
+                if file.endswith(".docx")
+            ]
+
         deleted_count = 0
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                if file.endswith(".docx"):
-                    file_path = os.path.join(root, file)
-                    try:
-                        os.remove(file_path)
-                        deleted_count += 1
-                    except Exception as e:
-                        print(f"Ошибка при удалении {file}: {e}")
+        for file_path in docx_files:
+            try:
+                os.remove(file_path)
+                deleted_count += 1
+            except Exception as e:
+                print(f"Ошибка при удалении {os.path.basename(file_path)}: {e}")
 
         if deleted_count > 0:
             print(f"Удалено {deleted_count} временных DOCX файлов")
 
     def generate_documents(
-        self, excel_file, gratitude_template, certificate_template, output_dir
+        self,
+        excel_file,
+        gratitude_template,
+        certificate_template,
+        output_dir,
+        participants=None,
     ):
-        """Генерирует все документы"""
+        """Генерирует все документы
+
+        participants - уже подготовленный список Participant; если он не
+        задан, таблица участников читается из excel_file. При
+        stream_chunk_size > 0 участники обрабатываются частями: часть
+        заполняется, конвертируется и очищается до чтения следующей.
+        """
         print("Начало генерации документов...")
         print(
-            f"Настройки обработки: Удаление DOCX: {'Да' if self.cleanup_docx else 'Нет'}, Задержка: {self.delay_between_files} сек"
+            f"Настройки обработки: Удаление DOCX: {'Да' if self.cleanup_docx else 'Нет'}, Ограничение заполнения: {self.render_limiter.describe()}, Заполнение шаблонов: {self.renderer}"
         )
 
         # Создаем папки для выходных файлов
@@ -103,134 +181,246 @@ class DocumentGenerator:
         os.makedirs(gratitude_dir, exist_ok=True)
         os.makedirs(certificate_dir, exist_ok=True)
 
-        # Читаем данные из Excel
-        try:
-            df = pd.read_excel(excel_file)
-            print(f"Загружено {len(df)} записей из Excel файла")
-        except Exception as e:
-            print(f"Ошибка при чтении Excel файла: {e}")
-            return
-
-        gratitude_docx_files = []
-        certificate_docx_files = []
-
-        successful_gratitude = 0
-        successful_certificates = 0
-
-        for index, row in df.iterrows():
-            try:
-                # Извлекаем данные
-                participant_name = str(row["ФИО участника"]).strip()
-                report_title = str(row["Название доклада"]).strip()
-                supervisor_name = str(row["ФИО руководителя"]).strip()
-
-                print(f"Обработка: {participant_name}")
+        columns = ["ФИО участника", "Название доклада", "ФИО руководителя"]
+        if self.stream_chunk_size > 0:
+            print(
+                f"Потоковая обработка: частями по {self.stream_chunk_size} участников"
+            )
 
-                # Генерируем благодарственное письмо
-                gratitude_replacements = {
-                    "{ФИО_руководителя}": supervisor_name,
-                    "{ФИО_участника}": participant_name,
-                    "{Название_доклада}": report_title,
-                }
-
-                # Создаем безопасное имя файла
-                safe_supervisor_name = re.sub(r'[<>:"/\\|?*]', "_", supervisor_name)
-                gratitude_filename = f"Благодарность_{safe_supervisor_name.replace(' ', '_')}_{index+1}.docx"
-                gratitude_docx_path = os.path.join(gratitude_dir, gratitude_filename)
-
-                if self.process_template(
-                    gratitude_template, gratitude_docx_path, gratitude_replacements
-                ):
-                    gratitude_docx_files.append(gratitude_docx_path)
-                    successful_gratitude += 1
-                    print(f"  Создано благодарственное письмо")
-                else:
-                    print(f"  Ошибка при создании благодарственного письма")
-
-                # Генерируем сертификат
-                certificate_replacements = {
-                    "{ФИО_участника}": participant_name,
-                    "{Название_доклада}": report_title,
-                }
-
-                safe_participant_name = re.sub(r'[<>:"/\\|?*]', "_", participant_name)
-                certificate_filename = f"Сертификат_{safe_participant_name.replace(' ', '_')}_{index+1}.docx"
-                certificate_docx_path = os.path.join(
-                    certificate_dir, certificate_filename
+        # Читаем данные из Excel
+        if participants is not None:
+            chunks = iter(split_chunks(participants, self.stream_chunk_size))
+        elif self.stream_chunk_size > 0:
+            # Таблица не загружается целиком, части читаются по мере обработки
+            chunks = (
+                prepare_participants(df)
+                for df in iter_roster_chunks(
+                    excel_file, columns, self.stream_chunk_size
                 )
-
-                if self.process_template(
-                    certificate_template,
-                    certificate_docx_path,
-                    certificate_replacements,
-                ):
-                    certificate_docx_files.append(certificate_docx_path)
-                    successful_certificates += 1
-                    print(f"  Создан сертификат")
-                else:
-                    print(f"  Ошибка при создании сертификата")
-
-                # Задержка между обработкой участников
-                if self.delay_between_files > 0 and index < len(df) - 1:
-                    time.sleep(self.delay_between_files)
-
-            except Exception as e:
-                print(f"Ошибка при обработке строки {index}: {e}")
-                continue
-
-        # Конвертируем DOCX в PDF
-        print("\n" + "=" * 60)
-        print("Конвертация в PDF...")
-
-        # Благодарственные письма
-        print("\nКонвертация благодарственных писем:")
-        for docx_file in gratitude_docx_files:
-            pdf_file = docx_file.replace(".docx", ".pdf")
+            )
+        else:
             try:
-                convert(docx_file, pdf_file)
-                print(f"  Создан PDF: {os.path.basename(pdf_file)}")
-
-                # Задержка между конвертацией файлов
-                if (
-                    self.delay_between_files > 0
-                    and docx_file != gratitude_docx_files[-1]
-                ):
-                    time.sleep(self.delay_between_files)
-
+                df = load_roster(excel_file, columns, self.roster_cache)
+                print(f"Загружено {len(df)} записей из Excel файла")
             except Exception as e:
-                print(f"  Ошибка при конвертации: {os.path.basename(docx_file)}")
-
-        # Сертификаты
-        print("\nКонвертация сертификатов:")
-        for docx_file in certificate_docx_files:
-            pdf_file = docx_file.replace(".docx", ".pdf")
+                print(f"Ошибка при чтении Excel файла: {e}")
+                return
+            # Значения и имена файлов подготовлены сразу для всей таблицы
+            chunks = iter([prepare_participants(df)])
+
+        # Для частей хранятся только счетчики, списки файлов не растут
+        totals = Counter()
+        while True:
             try:
-                convert(docx_file, pdf_file)
-                print(f"  Создан PDF: {os.path.basename(pdf_file)}")
-
-                # Задержка между конвертацией файлов
-                if (
-                    self.delay_between_files > 0
-                    and docx_file != certificate_docx_files[-1]
-                ):
-                    time.sleep(self.delay_between_files)
-
+                chunk = next(chunks, None)
             except Exception as e:
-                print(f"  Ошибка при конвертации: {os.path.basename(docx_file)}")
+                print(f"Ошибка при чтении Excel файла: {e}")
+                break
+            if chunk is None:
+                break
+            totals.update(
+                self.generate_chunk(
+                    chunk,
+                    gratitude_template,
+                    certificate_template,
+                    gratitude_dir,
+                    certificate_dir,
+                )
+            )
+            if self.stream_chunk_size > 0:
+                # Документы python-docx связаны циклическими ссылками, память
+                # lxml части освобождается только сборщиком мусора
+                gc.collect()
 
         # Удаляем DOCX файлы после конвертации
         print("\nОчистка временных файлов...")
         self.cleanup_docx_files(gratitude_dir)
         self.cleanup_docx_files(certificate_dir)
 
+        if self.pdf_cache is not None:
+            evicted = self.pdf_cache.evict()
+            if evicted:
+                print(f"Удалено из кэша PDF: {evicted}")
+
         # Итоговая статистика
         print("\n" + "=" * 60)
         print("ГЕНЕРАЦИЯ ДОКУМЕНТОВ ЗАВЕРШЕНА!")
         print(f"Статистика:")
-        print(f"   Благодарственные письма: {successful_gratitude}/{len(df)}")
-        print(f"   Сертификаты: {successful_certificates}/{len(df)}")
+        print(
+            f"   Благодарственные письма: {totals['gratitude'] + totals['cached_gratitude']}/{totals['participants']}"
+        )
+        print(
+            f"   Сертификаты: {totals['certificates'] + totals['cached_certificates']}/{totals['participants']}"
+        )
+        print(
+            f"   PDF благодарственных писем: {totals['converted_gratitude']}/{totals['gratitude']}"
+        )
+        print(
+            f"   PDF сертификатов: {totals['converted_certificates']}/{totals['certificates']}"
+        )
+        if self.pdf_cache is not None:
+            print(
+                f"   PDF из кэша: {totals['cached_gratitude'] + totals['cached_certificates']}"
+            )
         print(f"   Результаты в папке: {output_dir}")
 
+    def generate_chunk(
+        self,
+        participants,
+        gratitude_template,
+        certificate_template,
+        gratitude_dir,
+        certificate_dir,
+    ):
+        """Заполняет и конвертирует документы части участников
+
+        В потоковом режиме DOCX части удаляются сразу после конвертации.
+        Возвращает Counter с числом участников, созданных, сконвертированных
+        и взятых из кэша документов.
+        """
+        gratitude_docx_files = []
+        certificate_docx_files = []
+
+        successful_gratitude = 0
+        successful_certificates = 0
+
+        # Готовим задания на заполнение: для каждого участника письмо и сертификат
+        jobs = []
+        labels = []
+
+        for participant in participants:
+            # Генерируем благодарственное письмо
+            gratitude_replacements = {
+                "{ФИО_руководителя}": participant.supervisor,
+                "{ФИО_участника}": participant.fio,
+                "{Название_доклада}": participant.paper_title,
+            }
+            gratitude_filename = f"Благодарность_{participant.safe_supervisor}_{participant.index+1}.docx"
+            gratitude_docx_path = os.path.join(gratitude_dir, gratitude_filename)
+
+            # Генерируем сертификат
+            certificate_replacements = {
+                "{ФИО_участника}": participant.fio,
+                "{Название_доклада}": participant.paper_title,
+            }
+            certificate_filename = (
+                f"Сертификат_{participant.safe_fio}_{participant.index+1}.docx"
+            )
+            certificate_docx_path = os.path.join(certificate_dir, certificate_filename)
+
+            jobs.append(
+                RenderJob(
+                    gratitude_template, gratitude_replacements, gratitude_docx_path
+                )
+            )
+            labels.append(("gratitude", participant.fio))
+            jobs.append(
+                RenderJob(
+                    certificate_template,
+                    certificate_replacements,
+                    certificate_docx_path,
+                )
+            )
+            labels.append(("certificate", participant.fio))
+
+        # PDF неизмененных документов берутся из кэша без заполнения и конвертации
+        cached = set()
+        cache_keys = {}
+        if self.pdf_cache is not None:
+            cached, cache_keys = self.pdf_cache.restore(jobs)
+            if cached:
+                print(f"Взято из кэша PDF: {len(cached)} из {len(jobs)}")
+            pending = [
+                (job, label)
+                for job, label in zip(jobs, labels)
+                if job.output_path not in cached
+            ]
+            jobs = [job for job, _ in pending]
+            labels = [label for _, label in pending]
+
+        cached_gratitude = sum(1 for path in cached if path.startswith(gratitude_dir))
+        cached_certificates = len(cached) - cached_gratitude
+
+        if self.overlay is not None or self.combined_conversion:
+            print("\n" + "=" * 60)
+            if self.overlay is not None:
+                with profiling.stage("documents_overlay"):
+                    created = self.render_overlay(jobs, labels, cache_keys)
+            else:
+                with profiling.stage("documents_combined_conversion"):
+                    created = self.convert_combined(jobs, labels, cache_keys)
+            gratitude_docx_files, certificate_docx_files = created
+            successful_gratitude = converted_gratitude = len(gratitude_docx_files)
+            successful_certificates = len(certificate_docx_files)
+            converted_certificates = successful_certificates
+        else:
+            if self.workers > 1:
+                print(f"Параллельное заполнение шаблонов: {self.workers} процессов")
+
+            with profiling.stage("documents_rendering"):
+                results = iter_render_jobs(
+                    jobs,
+                    replace_placeholders,
+                    self.renderer,
+                    self.workers,
+                    self.render_limiter,
+                )
+                for (job, error), (kind, participant_name) in zip(results, labels):
+                    if error is not None:
+                        print(
+                            f"Ошибка при обработке шаблона {job.template_path}: {error}"
+                        )
+
+                    if kind == "gratitude":
+                        print(f"Обработка: {participant_name}")
+                        if error is None:
+                            gratitude_docx_files.append(job.output_path)
+                            successful_gratitude += 1
+                            print(f"  Создано благодарственное письмо")
+                        else:
+                            print(f"  Ошибка при создании благодарственного письма")
+                        continue
+
+                    if error is None:
+                        certificate_docx_files.append(job.output_path)
+                        successful_certificates += 1
+                        print(f"  Создан сертификат")
+                    else:
+                        print(f"  Ошибка при создании сертификата")
+
+            # Конвертируем DOCX в PDF
+            print("\n" + "=" * 60)
+            print("Конвертация в PDF...")
+
+            with profiling.stage("documents_conversion"):
+                # Благодарственные письма
+                print("\nКонвертация благодарственных писем:")
+                converted_gratitude = self.convert_to_pdf(
+                    gratitude_docx_files, cache_keys
+                )
+
+                # Сертификаты
+                print("\nКонвертация сертификатов:")
+                converted_certificates = self.convert_to_pdf(
+                    certificate_docx_files, cache_keys
+                )
+
+            # В потоковом режиме DOCX части удаляются сразу после конвертации
+            if self.stream_chunk_size > 0 and self.cleanup_docx:
+                self.cleanup_docx_files(
+                    gratitude_dir, gratitude_docx_files + certificate_docx_files
+                )
+
+        return Counter(
+            participants=len(participants),
+            gratitude=successful_gratitude,
+            certificates=successful_certificates,
+            converted_gratitude=converted_gratitude,
+            converted_certificates=converted_certificates,
+            cached_gratitude=cached_gratitude,
+            cached_certificates=cached_certificates,
+        )
+
 
 class Config:
     """Класс для работы с конфигурационным файлом"""
@@ -308,7 +498,15 @@ def main():
     )
     OUTPUT_DIR = os.path.join(script_dir, config.get("paths", "output_dir"))
     CLEANUP_DOCX = config.getboolean("processing", "cleanup_docx", fallback=True)
-    DELAY_BETWEEN_FILES = config.getint("processing", "delay_between_files", fallback=1)
+    RENDER_LIMITER = create_rate_limiter(config, "render")
+    RENDERER = config.get("processing", "renderer", fallback="docx")
+    WORKERS = config.getint("processing", "workers", fallback=1)
+    ROSTER_CACHE = config.getboolean("processing", "roster_cache", fallback=True)
+    COMBINED_CONVERSION = config.getboolean(
+        "processing", "combined_conversion", fallback=False
+    )
+    COMBINED_BATCH_SIZE = config.getint("processing", "combined_batch_size", fallback=0)
+    STREAM_CHUNK_SIZE = config.getint("processing", "stream_chunk_size", fallback=0)
 
     print("\nПоиск необходимых файлов...")
 
@@ -338,24 +536,63 @@ def main():
 
     print("\nВсе файлы найдены! Начинаем обработку...")
 
-    time.sleep(1)
-
-    # Создаем генератор документов с настройками из конфига
-    generator = DocumentGenerator(
-        cleanup_docx=CLEANUP_DOCX, delay_between_files=DELAY_BETWEEN_FILES
-    )
-
-    # Генерируем документы
-    generator.generate_documents(
-        excel_file=EXCEL_FILE,
-        gratitude_template=GRATITUDE_TEMPLATE,
-        certificate_template=CERTIFICATE_TEMPLATE,
-        output_dir=OUTPUT_DIR,
-    )
+    # Профилирование этапов включается аргументом --profile или в [profiling]
+    profiling.start(config, OUTPUT_DIR, "blag_sert")
+
+    # Конвертер запускается один раз на весь запуск программы.
+    # Отчеты о времени пишутся при любом завершении, в том числе при ошибке
+    try:
+        with create_converter(config) as converter:
+            overlay = None
+            if RENDERER == "overlay":
+                try:
+                    overlay = create_overlay_renderer(
+                        config,
+                        converter,
+                        OUTPUT_DIR,
+                        [GRATITUDE_TEMPLATE, CERTIFICATE_TEMPLATE],
+                    )
+                except Exception as e:
+                    print(f"\nЗаполнение наложением недоступно: {e}")
+                    return
+
+            # Создаем генератор документов с настройками из конфига
+            generator = DocumentGenerator(
+                cleanup_docx=CLEANUP_DOCX,
+                render_limiter=RENDER_LIMITER,
+                renderer=RENDERER,
+                workers=WORKERS,
+                converter=converter,
+                pdf_cache=create_pdf_cache(
+                    config, OUTPUT_DIR, converter.name, RENDERER, overlay
+                ),
+                roster_cache=ROSTER_CACHE,
+                combined_conversion=COMBINED_CONVERSION,
+                combined_batch_size=COMBINED_BATCH_SIZE,
+                overlay=overlay,
+                stream_chunk_size=STREAM_CHUNK_SIZE,
+            )
+
+            # Генерируем документы
+            generator.generate_documents(
+                excel_file=EXCEL_FILE,
+                gratitude_template=GRATITUDE_TEMPLATE,
+                certificate_template=CERTIFICATE_TEMPLATE,
+                output_dir=OUTPUT_DIR,
+            )
+    finally:
+        report_path = metrics.write_reports(config, OUTPUT_DIR, "blag_sert")
+        if report_path:
+            print(f"\nОтчет о времени этапов: {report_path}")
+        profile_dir = profiling.finish()
+        if profile_dir:
+            print(f"Профили этапов: {profile_dir}")
 
-    print("\n" + "=" * 60)
-    input("Нажмите Enter для выхода...")
+        print("\n" + "=" * 60)
+        input("Нажмите Enter для выхода...")
 
 
 if __name__ == "__main__":
+    # Нужно для пула процессов в собранном исполняемом файле
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
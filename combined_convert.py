@@ -0,0 +1,222 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from PyPDF2 import PdfMerger, PdfReader, PdfWriter
+
+import metrics
+from docx_combine import CombinedDocument
+from docx_templates import load_template, replace_placeholders
+from pdf_cache import pdf_path_for
+
+
+def page_ranges(section_counts, page_count):
+    """Делит страницы общего PDF между документами, из которых он собран
+
+    Документы фиксированной верстки занимают по странице на раздел. Если
+    страниц больше, но у всех документов одинаковое число разделов и
+    страницы делятся поровну, каждому достается равная часть. Возвращает
+    список (начало, конец) или None, если разделить страницы нельзя.
+    """
+    if sum(section_counts) == page_count:
+        counts = section_counts
+    elif (
+        section_counts
+        and len(set(section_counts)) == 1
+        and page_count % len(section_counts) == 0
+    ):
+        counts = [page_count // len(section_counts)] * len(section_counts)
+    else:
+        return None
+
+    ranges = []
+    start = 0
+    for count in counts:
+        ranges.append((start, start + count))
+        start += count
+    return ranges
+
+
+def _render(job):
+    """Заполняет шаблон задания в памяти (всегда через python-docx)"""
+    return load_template(job.template_path).render(
+        job.replacements, replace_placeholders
+    )
+
+
+def _write_pages(reader, start, end, pdf_path):
+    writer = PdfWriter()
+    for page in reader.pages[start:end]:
+        writer.add_page(page)
+    with open(pdf_path, "wb") as file:
+        writer.write(file)
+
+
+class _Batch:
+    """Пакет документов, собранных в один DOCX для одной конвертации"""
+
+    def __init__(self):
+        self.combined = CombinedDocument()
+        self.jobs = []
+        self.section_counts = []
+
+    def add(self, job, document):
+        self.section_counts.append(len(document.sections))
+        self.combined.append(document)
+        self.jobs.append(job)
+
+    def to_bytes(self):
+        stream = io.BytesIO()
+        with metrics.timer("docx_save", len(self.jobs)):
+            self.combined.save(stream)
+        return stream.getvalue()
+
+
+def _convert_separately(jobs, converter, errors):
+    """Запасной путь: документы пакета конвертируются по одному"""
+    for job in jobs:
+        try:
+            stream = io.BytesIO()
+            document = _render(job)
+            with metrics.timer("docx_save"):
+                document.save(stream)
+            pdf_data = converter.convert_bytes(stream.getvalue(), job.output_path)
+            with open(pdf_path_for(job.output_path), "wb") as file:
+                file.write(pdf_data)
+            errors[job.output_path] = None
+        except Exception as e:
+            errors[job.output_path] = str(e)
+
+
+def _split_batch(batch, pdf_data, converter, errors):
+    """Раскладывает страницы PDF пакета по файлам участников
+
+    Возвращает True, если PDF пакета разделен и годится для общего PDF.
+    """
+    reader = PdfReader(io.BytesIO(pdf_data))
+    ranges = page_ranges(batch.section_counts, len(reader.pages))
+    if ranges is None:
+        print(
+            f"[ИНФО] Число страниц PDF ({len(reader.pages)}) не совпадает с "
+            f"документами пакета, конвертируем их по одному"
+        )
+        _convert_separately(batch.jobs, converter, errors)
+        return False
+
+    for job, (start, end) in zip(batch.jobs, ranges):
+        try:
+            with metrics.timer("pdf_split"):
+                _write_pages(reader, start, end, pdf_path_for(job.output_path))
+            errors[job.output_path] = None
+        except Exception as e:
+            errors[job.output_path] = str(e)
+    return True
+
+
+def convert_combined(
+    jobs,
+    converter,
+    batch_size=0,
+    save_docx=False,
+    combined_pdf_path=None,
+    limiter=None,
+    combined=None,
+    document_only=(),
+):
+    """Заполняет документы и конвертирует их пакетами, по одному DOCX на пакет
+
+    Вместо отдельной конвертации каждого документа все документы пакета
+    (batch_size штук, 0 - все сразу) собираются в один DOCX из разделов,
+    конвертируются за одно обращение к конвертеру, и PDF пакета делится
+    по страницам на файлы участников рядом с output_path заданий. Подходит
+    для документов фиксированной верстки (дипломы, сертификаты).
+
+    save_docx - сохранять ли заполненные DOCX отдельных документов.
+    combined_pdf_path - куда сохранить общий PDF; он составляется из PDF
+    пакетов без повторного объединения отдельных файлов.
+    Общий PDF создается, только если сконвертированы все документы.
+    combined (CombinedDocument) - общий DOCX, в который каждый документ
+    добавляется сразу после заполнения, в порядке заданий.
+    document_only - output_path заданий, которые только добавляются в
+    combined: их PDF уже есть (например, взят из кэша).
+
+    Возвращает список (задание, ошибка) в порядке заданий (без document_only)
+    и признак того, что общий PDF создан.
+    """
+    jobs = list(jobs)
+    converted_jobs = [job for job in jobs if job.output_path not in document_only]
+    batch_size = batch_size if batch_size > 0 else max(1, len(converted_jobs))
+    throttled = limiter is not None and limiter.enabled
+    errors = {}
+    batches = []
+    futures = []
+
+    with ThreadPoolExecutor(max_workers=max(1, converter.workers)) as executor:
+
+        def submit(batch):
+            # Следующий пакет заполняется, пока конвертируется текущий
+            batches.append(batch)
+            futures.append(
+                executor.submit(
+                    converter.convert_bytes,
+                    batch.to_bytes(),
+                    f"пакет из {len(batch.jobs)} документов",
+                )
+            )
+            batch.combined = None
+
+        batch = _Batch()
+        for job in jobs:
+            if throttled:
+                limiter.acquire()
+            try:
+                document = _render(job)
+                if combined is not None:
+                    with metrics.timer("docx_combine"):
+                        combined.append(document)
+                if job.output_path in document_only:
+                    continue
+                if save_docx:
+                    document.save(job.output_path)
+                batch.add(job, document)
+            except Exception as e:
+                if job.output_path in document_only:
+                    print(f"[ОШИБКА] Документ не добавлен в общий DOCX: {e}")
+                    continue
+                errors[job.output_path] = str(e)
+            if len(batch.jobs) >= batch_size:
+                submit(batch)
+                batch = _Batch()
+        if batch.jobs:
+            submit(batch)
+
+        batch_pdfs = []
+        for batch, future in zip(batches, futures):
+            try:
+                pdf_data = future.result()
+                if _split_batch(batch, pdf_data, converter, errors):
+                    batch_pdfs.append(pdf_data)
+            except Exception as e:
+                for job in batch.jobs:
+                    errors[job.output_path] = str(e)
+
+    combined_created = False
+    if combined_pdf_path and batch_pdfs and len(batch_pdfs) == len(batches):
+        try:
+            with metrics.timer("pdf_merge"):
+                if len(batch_pdfs) == 1:
+                    with open(combined_pdf_path, "wb") as file:
+                        file.write(batch_pdfs[0])
+                else:
+                    merger = PdfMerger()
+                    for pdf_data in batch_pdfs:
+                        merger.append(io.BytesIO(pdf_data))
+                    merger.write(combined_pdf_path)
+                    merger.close()
+            combined_created = True
+        except Exception as e:
+            print(f"[ОШИБКА] Ошибка при создании объединенного PDF: {e}")
+
+    results = [
+        (job, errors.get(job.output_path, "PDF не создан")) for job in converted_jobs
+    ]
+    return results, combined_created
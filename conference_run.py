@@ -0,0 +1,197 @@
+import os
+import multiprocessing
+import metrics
+import profiling
+from blag_sert import DocumentGenerator
+from diplomas_generator import DiplomaGenerator
+from e_mail_sender import (
+    get_external_file_path,
+    get_script_directory,
+    load_config,
+    missing_invitation_columns,
+    process_invitations,
+    wait_for_keypress,
+)
+from pdf_cache import create_pdf_cache
+from pdf_converters import create_converter
+from pdf_overlay import create_overlay_renderer
+from rate_limit import create_rate_limiter
+from roster import ROSTER_COLUMNS, load_roster, prepare_participants
+
+
+# Файлы из секции [files], нужные для каждого вида документов
+REQUIRED_FILES = {
+    "documents": ["excel_file", "gratitude_template", "certificate_template"],
+    "diplomas": ["excel_file", "winner_template"],
+    "invitations": ["excel_file", "invitation_template", "email_template"],
+}
+
+# Шаблоны, которые заполняются наложением при [processing] renderer = overlay
+OVERLAY_TEMPLATES = {
+    "documents": ["gratitude_template", "certificate_template"],
+    "diplomas": ["winner_template"],
+}
+
+
+def check_files(config, stages):
+    """Возвращает имена отсутствующих файлов для выбранных видов документов"""
+    missing_files = []
+    for stage in stages:
+        for option in REQUIRED_FILES[stage]:
+            filename = config.get("files", option)
+            path = get_external_file_path(filename)
+            if not os.path.exists(path) and filename not in missing_files:
+                missing_files.append(filename)
+    return missing_files
+
+
+def run_conference(config):
+    """Создает все документы конференции за один запуск
+
+    config.ini и таблица участников читаются один раз, участники
+    подготавливаются один раз, а все этапы используют общий пул
+    конвертеров и общий кэш скомпилированных шаблонов. Этапы выполняются
+    по очереди, каждый обходит подготовленный список участников целиком:
+    объединенная конвертация, общий PDF дипломов и асинхронная рассылка
+    работают со всеми документами своего этапа сразу. Этапы выбираются
+    в секции [orchestrator].
+    """
+    stages = [
+        stage
+        for stage in ("documents", "diplomas", "invitations")
+        if config.getboolean("orchestrator", stage, fallback=True)
+    ]
+    send_email = config.getboolean("orchestrator", "send_email", fallback=False)
+    if not stages:
+        print("Все этапы отключены в секции [orchestrator]")
+        return
+
+    missing_files = check_files(config, stages)
+    if missing_files:
+        print("Отсутствуют необходимые файлы:")
+        for file in missing_files:
+            print(f"   - {file}")
+        print(f"Убедитесь, что файлы находятся в папке: {get_script_directory()}")
+        return
+
+    excel_file = get_external_file_path(config.get("files", "excel_file"))
+    output_dir = get_external_file_path(config.get("paths", "output_dir"))
+    cleanup_docx = config.getboolean("processing", "cleanup_docx", fallback=True)
+    renderer = config.get("processing", "renderer", fallback="docx")
+
+    # Таблица читается и обрабатывается один раз для всех документов
+    print(f"Читаем файл: {excel_file}")
+    df = load_roster(
+        excel_file,
+        ROSTER_COLUMNS,
+        config.getboolean("processing", "roster_cache", fallback=True),
+    )
+    participants = prepare_participants(df)
+    print(f"Найдено {len(participants)} участников")
+    print(
+        f"Этапы (по очереди): {', '.join(stages)}, Рассылка: {'Да' if send_email else 'Нет'}"
+    )
+
+    # Профилирование этапов включается аргументом --profile или в [profiling]
+    profiling.start(config, output_dir, "conference_run")
+
+    # Конвертер запускается один раз на все документы.
+    # Отчеты о времени пишутся при любом завершении, в том числе при ошибке
+    try:
+        with create_converter(config) as converter:
+            overlay = None
+            if renderer == "overlay" and (
+                "documents" in stages or "diplomas" in stages
+            ):
+                overlay = create_overlay_renderer(
+                    config,
+                    converter,
+                    output_dir,
+                    [
+                        get_external_file_path(config.get("files", option))
+                        for stage, options in OVERLAY_TEMPLATES.items()
+                        if stage in stages
+                        for option in options
+                    ],
+                )
+
+            if "documents" in stages:
+                print("\n" + "=" * 80)
+                print("СЕРТИФИКАТЫ И БЛАГОДАРСТВЕННЫЕ ПИСЬМА")
+                print("=" * 80)
+                generator = DocumentGenerator(
+                    cleanup_docx=cleanup_docx,
+                    render_limiter=create_rate_limiter(config, "render"),
+                    renderer=renderer,
+                    workers=config.getint("processing", "workers", fallback=1),
+                    converter=converter,
+                    pdf_cache=create_pdf_cache(
+                        config, output_dir, converter.name, renderer, overlay
+                    ),
+                    combined_conversion=config.getboolean(
+                        "processing", "combined_conversion", fallback=False
+                    ),
+                    combined_batch_size=config.getint(
+                        "processing", "combined_batch_size", fallback=0
+                    ),
+                    overlay=overlay,
+                    stream_chunk_size=config.getint(
+                        "processing", "stream_chunk_size", fallback=0
+                    ),
+                )
+                generator.generate_documents(
+                    excel_file=excel_file,
+                    gratitude_template=get_external_file_path(
+                        config.get("files", "gratitude_template")
+                    ),
+                    certificate_template=get_external_file_path(
+                        config.get("files", "certificate_template")
+                    ),
+                    output_dir=output_dir,
+                    participants=participants,
+                )
+
+            if "diplomas" in stages:
+                print("\n" + "=" * 80)
+                print("ДИПЛОМЫ ПРИЗЕРОВ")
+                print("=" * 80)
+                # Настройки обработки генератор берет из переданной конфигурации
+                generator = DiplomaGenerator(converter=converter, overlay=overlay)
+                generator.generate_diplomas(config, participants)
+
+            if "invitations" in stages:
+                print("\n" + "=" * 80)
+                print("ПРИГЛАШЕНИЯ")
+                print("=" * 80)
+                missing_columns = missing_invitation_columns(df)
+                if missing_columns:
+                    print(f"В файле отсутствуют колонки: {missing_columns}")
+                else:
+                    process_invitations(config, participants, converter, send_email)
+    finally:
+        report_path = metrics.write_reports(config, output_dir, "conference_run")
+        if report_path:
+            print(f"\nОтчет о времени этапов: {report_path}")
+        profile_dir = profiling.finish()
+        if profile_dir:
+            print(f"Профили этапов: {profile_dir}")
+
+
+def main():
+    print("=" * 80)
+    print("    ПОДГОТОВКА ДОКУМЕНТОВ КОНФЕРЕНЦИИ")
+    print("=" * 80)
+
+    try:
+        run_conference(load_config())
+    except Exception as e:
+        print(f"Ошибка: {e}")
+
+    print("\n" + "=" * 80)
+    wait_for_keypress()
+
+
+if __name__ == "__main__":
+    # Нужно для пула процессов в собранном исполняемом файле
+    multiprocessing.freeze_support()
+    main()
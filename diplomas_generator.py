@@ -1,18 +1,47 @@
-import pandas as pd
-from docx import Document
-from docx2pdf import convert
 import os
-import re
 import sys
-import time
 import configparser
+import gc
+import multiprocessing
+from collections import Counter
 from PyPDF2 import PdfMerger
+from combined_convert import convert_combined
+import metrics
+import profiling
+from docx_combine import CombinedDocument
+from docx_templates import load_template, replace_placeholders
+from render_pool import RenderJob
+from pdf_converters import create_converter
+from rate_limit import RateLimiter, create_rate_limiter
+from pdf_cache import create_pdf_cache, pdf_path_for
+from pdf_overlay import create_overlay_renderer
+from roster import iter_roster_chunks, load_roster, prepare_participants, split_chunks
 
 
 class DiplomaGenerator:
-    def __init__(self, cleanup_docx=True, delay_between_files=1):
+    def __init__(
+        self,
+        cleanup_docx=True,
+        render_limiter=None,
+        renderer="docx",
+        workers=1,
+        converter=None,
+        combined_conversion=False,
+        combined_batch_size=0,
+        overlay=None,
+        stream_chunk_size=0,
+    ):
         self.cleanup_docx = cleanup_docx
-        self.delay_between_files = delay_between_files
+        self.render_limiter = render_limiter or RateLimiter()
+        self.renderer = renderer
+        self.workers = workers
+        self.converter = converter
+        self.combined_conversion = combined_conversion
+        self.combined_batch_size = combined_batch_size
+        # Общее заполнение наложением (OverlayRenderer), иначе создается свое
+        self.overlay = overlay
+        # Потоковая обработка частями по stream_chunk_size участников (0 - выключена)
+        self.stream_chunk_size = stream_chunk_size
 
     def load_config(self):
         """Загружает конфигурацию из config.ini"""
@@ -43,150 +72,312 @@ class DiplomaGenerator:
         script_dir = self.get_script_directory()
         return os.path.join(script_dir, filename)
 
-    def replace_text_in_paragraph(self, paragraph, replacements):
-        """Заменяет текст в параграфе с сохранением форматирования"""
-        for search_text, replace_text in replacements.items():
-            if search_text in paragraph.text:
-                # Сохраняем оригинальное форматирование
-                original_runs = paragraph.runs
-                if not original_runs:
-                    paragraph.text = paragraph.text.replace(search_text, replace_text)
-                    continue
-
-                # Собираем полный текст
-                full_text = ""
-                for run in original_runs:
-                    full_text += run.text
-
-                if search_text in full_text:
-                    # Очищаем параграф
-                    paragraph.clear()
-
-                    # Разделяем текст на части и добавляем с форматированием
-                    parts = full_text.split(search_text)
-
-                    for i, part in enumerate(parts):
-                        if part:
-                            new_run = paragraph.add_run(part)
-                            # Копируем форматирование из первого run
-                            first_run = original_runs[0]
-                            new_run.bold = first_run.bold
-                            new_run.italic = first_run.italic
-                            new_run.underline = first_run.underline
-                            if first_run.font.size:
-                                new_run.font.size = first_run.font.size
-                            if first_run.font.name:
-                                new_run.font.name = first_run.font.name
-
-                        if i < len(parts) - 1:
-                            new_run = paragraph.add_run(replace_text)
-                            # Копируем форматирование из первого run
-                            first_run = original_runs[0]
-                            new_run.bold = first_run.bold
-                            new_run.italic = first_run.italic
-                            new_run.underline = first_run.underline
-                            if first_run.font.size:
-                                new_run.font.size = first_run.font.size
-                            if first_run.font.name:
-                                new_run.font.name = first_run.font.name
-
     def create_diploma_from_template(self, template_path, replacements):
         """Создает заполненный диплом на основе шаблона"""
         try:
-            doc = Document(template_path)
-
-            # Замена в параграфах
-            for paragraph in doc.paragraphs:
-                self.replace_text_in_paragraph(paragraph, replacements)
-
-            # Замена в таблицах
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        for paragraph in cell.paragraphs:
-                            self.replace_text_in_paragraph(paragraph, replacements)
-
-            return doc
+            template = load_template(template_path, self.renderer)
+            return template.render(replacements, replace_placeholders)
         except Exception as e:
             print(f"[ОШИБКА] Ошибка при создании диплома: {e}")
             return None
 
+    def write_metrics(self):
+        """Сохраняет отчет о времени этапов запуска (секция [metrics])"""
+        try:
+            config = self.load_config()
+            output_dir = self.get_external_file_path(config.get("paths", "output_dir"))
+            report_path = metrics.write_reports(
+                config, output_dir, "diplomas_generator"
+            )
+        except Exception as e:
+            print(f"[ОШИБКА] Не удалось сохранить отчет о времени этапов: {e}")
+            return
+        if report_path:
+            print(f"[ИНФО] Отчет о времени этапов: {report_path}")
+
+    def start_profiling(self):
+        """Включает профилирование этапов (--profile или секция [profiling])"""
+        try:
+            config = self.load_config()
+            output_dir = self.get_external_file_path(config.get("paths", "output_dir"))
+            if profiling.start(config, output_dir, "diplomas_generator"):
+                print("[ИНФО] Профилирование этапов включено")
+        except Exception as e:
+            print(f"[ОШИБКА] Не удалось включить профилирование: {e}")
+
     def merge_pdfs(self, pdf_files, output_path):
         """Объединяет несколько PDF файлов в один"""
         try:
-            merger = PdfMerger()
+            with metrics.timer("pdf_merge"):
+                merger = PdfMerger()
 
-            for pdf_file in pdf_files:
-                if os.path.exists(pdf_file):
-                    merger.append(pdf_file)
+                for pdf_file in pdf_files:
+                    if os.path.exists(pdf_file):
+                        merger.append(pdf_file)
 
-            merger.write(output_path)
-            merger.close()
+                merger.write(output_path)
+                merger.close()
             return True
         except Exception as e:
             print(f"[ОШИБКА] Ошибка при объединении PDF файлов: {e}")
             return False
 
-    def merge_docx_files(self, docx_files, output_path):
-        """Объединяет несколько DOCX файлов в один"""
+    def add_to_combined(self, job, combined, save_docx=False):
+        """Заполняет диплом в памяти и сразу добавляет его в общий DOCX
+
+        save_docx - сохранить ли заполненный диплом и в отдельный файл.
+        """
+        template = load_template(job.template_path)
+        document = template.render(job.replacements, replace_placeholders)
+        if save_docx:
+            with metrics.timer("docx_save"):
+                document.save(job.output_path)
+        with metrics.timer("docx_combine"):
+            combined.append(document)
+
+    def add_cached_to_combined(self, job, combined):
+        """Добавляет в общий DOCX диплом, PDF которого взят из кэша"""
+        try:
+            self.add_to_combined(job, combined)
+        except Exception as e:
+            print(f"[ОШИБКА] Диплом не добавлен в общий DOCX: {e}")
+
+    def render_documents(self, jobs, cached, combined):
+        """Заполняет дипломы в DOCX файлы, добавляя каждый в общий DOCX
+
+        Дипломы из cached (PDF взят из кэша) только добавляются в общий DOCX.
+        Для остальных выдает (задание, ошибка) в порядке заданий.
+        """
+        throttled = self.render_limiter.enabled
+        for job in jobs:
+            if job.output_path in cached:
+                self.add_cached_to_combined(job, combined)
+                continue
+            if throttled:
+                self.render_limiter.acquire()
+            try:
+                self.add_to_combined(job, combined, save_docx=True)
+                yield job, None
+            except Exception as e:
+                yield job, str(e)
+
+    def render_and_convert(
+        self, jobs, labels, converter, pdf_cache, cache_keys, combined, cached
+    ):
+        """Заполняет дипломы в файлы DOCX и конвертирует их в PDF пакетами
+
+        jobs и labels - все дипломы части в порядке таблицы. Каждый
+        заполненный диплом сразу добавляется в combined, поэтому общий
+        DOCX не требует повторного чтения файлов. Возвращает список
+        созданных DOCX и множество сконвертированных.
+        """
+        individual_docx_files = []
+        with profiling.stage("diplomas_rendering"):
+            results = self.render_documents(jobs, cached, combined)
+            labels = [
+                label
+                for job, label in zip(jobs, labels)
+                if job.output_path not in cached
+            ]
+            # Имена призеров для сообщений о конвертации
+            participant_names = {}
+
+            for (job, error), (participant_name, prize_text) in zip(results, labels):
+                print(f"Обрабатываем: {participant_name} ({prize_text})")
+
+                if error is None:
+                    individual_docx_files.append(job.output_path)
+                    participant_names[job.output_path] = participant_name
+                    print(f"  [ИНФО] Создан файл: {os.path.basename(job.output_path)}")
+                else:
+                    print(f"[ОШИБКА] Ошибка при создании диплома: {error}")
+                    print(
+                        f"  [ОШИБКА] Ошибка при создании диплома для {participant_name}"
+                    )
+
+        # Конвертируем все дипломы в PDF крупными пакетами
+        print("\nКонвертация дипломов в PDF...")
+        pairs = [
+            (docx_path, pdf_path_for(docx_path)) for docx_path in individual_docx_files
+        ]
+        converted = set()
+        with profiling.stage("diplomas_conversion"):
+            for docx_path, pdf_path, error in converter.convert_batch(pairs):
+                if error is None:
+                    converted.add(docx_path)
+                    if docx_path in cache_keys:
+                        pdf_cache.store(cache_keys[docx_path], pdf_path)
+                    print(
+                        f"  [УСПЕХ] Созданы файлы: {os.path.basename(docx_path)} и {os.path.basename(pdf_path)}"
+                    )
+                else:
+                    print(
+                        f"  [ОШИБКА] Ошибка при создании PDF для {participant_names[docx_path]}: {error}"
+                    )
+
+        return individual_docx_files, converted
+
+    def convert_combined(
+        self,
+        jobs,
+        labels,
+        converter,
+        pdf_cache,
+        cache_keys,
+        combined_pdf_path,
+        combined,
+        cached,
+    ):
+        """Заполняет дипломы в памяти и конвертирует их общим документом
+
+        Все дипломы пакета конвертируются за одно обращение к конвертеру,
+        PDF пакета делится по страницам на дипломы участников. Каждый
+        заполненный диплом сразу добавляется и в combined (общий DOCX),
+        дипломы из cached только добавляются в него. Возвращает список
+        сохраненных DOCX, множество сконвертированных дипломов и признак
+        того, что общий PDF создан.
+        """
+        pending = [job for job in jobs if job.output_path not in cached]
+        print(
+            f"[ИНФО] Конвертация общим документом, пакетами по {self.combined_batch_size or len(pending)}"
+        )
+        results, combined_pdf_created = convert_combined(
+            jobs,
+            converter,
+            self.combined_batch_size,
+            save_docx=not self.cleanup_docx,
+            combined_pdf_path=combined_pdf_path,
+            limiter=self.render_limiter,
+            combined=combined,
+            document_only=cached,
+        )
+        labels = [
+            label for job, label in zip(jobs, labels) if job.output_path not in cached
+        ]
+        converted = self.collect_pdf_results(results, labels, pdf_cache, cache_keys)
+        individual_docx_files = []
+        if not self.cleanup_docx:
+            individual_docx_files = [
+                job.output_path for job in pending if os.path.exists(job.output_path)
+            ]
+        return individual_docx_files, converted, combined_pdf_created
+
+    def render_overlay(
+        self, jobs, labels, overlay, pdf_cache, cache_keys, combined, cached
+    ):
+        """Создает PDF дипломов наложением текста на PDF шаблона
+
+        Шаблон конвертируется один раз, DOCX дипломов не создаются.
+        Для общего DOCX каждый созданный диплом заполняется в памяти и
+        сразу добавляется в combined. Возвращает множество созданных
+        дипломов.
+        """
+        print("[ИНФО] Дипломы создаются наложением текста на PDF шаблона")
+        pending = [job for job in jobs if job.output_path not in cached]
+        results = iter(overlay.render_jobs(pending, self.render_limiter))
+
+        def ordered_results():
+            # Общий DOCX собирается в порядке таблицы, вместе с дипломами из кэша
+            for job in jobs:
+                if job.output_path in cached:
+                    self.add_cached_to_combined(job, combined)
+                    continue
+                job, error = next(results)
+                if error is None:
+                    try:
+                        self.add_to_combined(job, combined)
+                    except Exception as e:
+                        print(f"[ОШИБКА] Диплом не добавлен в общий DOCX: {e}")
+                yield job, error
+
+        labels = [
+            label for job, label in zip(jobs, labels) if job.output_path not in cached
+        ]
+        return self.collect_pdf_results(
+            ordered_results(), labels, pdf_cache, cache_keys
+        )
+
+    def collect_pdf_results(self, results, labels, pdf_cache, cache_keys):
+        """Выводит результаты создания PDF и сохраняет новые PDF в кэш
+
+        Возвращает множество output_path успешно созданных дипломов.
+        """
+        converted = set()
+        for (job, error), (participant_name, prize_text) in zip(results, labels):
+            print(f"Обрабатываем: {participant_name} ({prize_text})")
+
+            if error is None:
+                converted.add(job.output_path)
+                if job.output_path in cache_keys:
+                    pdf_cache.store(
+                        cache_keys[job.output_path], pdf_path_for(job.output_path)
+                    )
+                print(
+                    f"  [УСПЕХ] Создан файл: {os.path.basename(pdf_path_for(job.output_path))}"
+                )
+            else:
+                print(
+                    f"  [ОШИБКА] Ошибка при создании диплома для {participant_name}: {error}"
+                )
+        return converted
+
+    def save_combined_docx(self, combined, output_path):
+        """Сохраняет общий DOCX, собранный по ходу заполнения дипломов"""
         try:
-            if not docx_files:
-                return False
-
-            # Создаем новый документ для объединения
-            merged_doc = Document()
-
-            for i, docx_file in enumerate(docx_files):
-                if os.path.exists(docx_file):
-                    # Открываем каждый документ
-                    doc = Document(docx_file)
-
-                    # Для первого документа просто копируем содержимое
-                    if i == 0:
-                        for element in doc.element.body:
-                            merged_doc.element.body.append(element)
-                    else:
-                        # Добавляем разрыв страницы перед следующим документом
-                        merged_doc.add_page_break()
-
-                        # Копируем содержимое документа
-                        for element in doc.element.body:
-                            merged_doc.element.body.append(element)
-
-            merged_doc.save(output_path)
+            with metrics.timer("docx_save"):
+                combined.save(output_path)
             return True
 
         except Exception as e:
             print(f"[ОШИБКА] Ошибка при объединении DOCX файлов: {e}")
             return False
 
-    def cleanup_docx_files(self, directory):
-        """Удаляет все DOCX файлы в указанной директории"""
+    def cleanup_docx_files(self, directory, docx_files=None, keep=()):
+        """Удаляет все DOCX файлы в указанной директории
+
+        docx_files - удалить только эти файлы, без обхода директории.
+        keep - файлы, которые не удаляются при обходе (общий DOCX).
+        """
         if not self.cleanup_docx:
             print("[ИНФО] Удаление DOCX файлов отключено в настройках")
             return
 
+        if docx_files is None:
+            docx_files = [
+                os.path.join(root, file)
+                for root, dirs, files in os.walk(directory)
+                for file in files
+                if file.endswith(".docx") and os.path.join(root, file) not in keep
+            ]
+
         deleted_count = 0
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                if file.endswith(".docx"):
-                    file_path = os.path.join(root, file)
-                    try:
-                        os.remove(file_path)
-                        deleted_count += 1
-                    except Exception as e:
-                        print(f"[ОШИБКА] Ошибка при удалении {file}: {e}")
+        for file_path in docx_files:
+            try:
+                os.remove(file_path)
+                deleted_count += 1
+            except Exception as e:
+                print(
+                    f"[ОШИБКА] Ошибка при удалении {os.path.basename(file_path)}: {e}"
+                )
 
         if deleted_count > 0:
             print(f"[ИНФО] Удалено {deleted_count} временных DOCX файлов")
 
-    def generate_diplomas(self):
-        """Генерирует дипломы для призеров"""
+    def generate_diplomas(self, config=None, participants=None):
+        """Генерирует дипломы для призеров
+
+        config - уже загруженная конфигурация, participants - подготовленный
+        список Participant. Если они не заданы, config.ini и таблица
+        участников читаются заново. При stream_chunk_size > 0 участники
+        обрабатываются частями, для каждой части создаются свои общие
+        PDF и DOCX.
+        """
         print("Начало генерации дипломов...")
 
         # Загружаем конфигурацию
         try:
-            config = self.load_config()
+            if config is None:
+                config = self.load_config()
             excel_file = self.get_external_file_path(config.get("files", "excel_file"))
             diploma_template = self.get_external_file_path(
                 config.get("files", "winner_template")
@@ -195,25 +386,42 @@ class DiplomaGenerator:
             cleanup_docx = config.getboolean(
                 "processing", "cleanup_docx", fallback=True
             )
-            delay_between_files = config.getint(
-                "processing", "delay_between_files", fallback=1
+            render_limiter = create_rate_limiter(config, "render")
+            renderer = config.get("processing", "renderer", fallback="docx")
+            workers = config.getint("processing", "workers", fallback=1)
+            roster_cache = config.getboolean(
+                "processing", "roster_cache", fallback=True
+            )
+            combined_conversion = config.getboolean(
+                "processing", "combined_conversion", fallback=False
+            )
+            combined_batch_size = config.getint(
+                "processing", "combined_batch_size", fallback=0
+            )
+            stream_chunk_size = config.getint(
+                "processing", "stream_chunk_size", fallback=0
             )
 
             # Обновляем настройки из конфига
             self.cleanup_docx = cleanup_docx
-            self.delay_between_files = delay_between_files
+            self.render_limiter = render_limiter
+            self.renderer = renderer
+            self.workers = workers
+            self.combined_conversion = combined_conversion
+            self.combined_batch_size = combined_batch_size
+            self.stream_chunk_size = stream_chunk_size
 
         except Exception as e:
             print(f"[ОШИБКА] Ошибка загрузки конфигурации: {e}")
             return
 
         print(
-            f"[ИНФО] Настройки обработки: Удаление DOCX: {'Да' if self.cleanup_docx else 'Нет'}, Задержка: {self.delay_between_files} сек"
+            f"[ИНФО] Настройки обработки: Удаление DOCX: {'Да' if self.cleanup_docx else 'Нет'}, Ограничение заполнения: {self.render_limiter.describe()}, Заполнение шаблонов: {self.renderer}"
         )
 
         # Проверяем существование файлов
         missing_files = []
-        if not os.path.exists(excel_file):
+        if participants is None and not os.path.exists(excel_file):
             missing_files.append(config.get("files", "excel_file"))
         if not os.path.exists(diploma_template):
             missing_files.append(config.get("files", "winner_template"))
@@ -231,108 +439,260 @@ class DiplomaGenerator:
         winners_dir = os.path.join(output_dir, "Дипломы_призеров")
         os.makedirs(winners_dir, exist_ok=True)
 
+        columns = ["ФИО участника", "Название доклада", "ФИО руководителя", "Призер"]
+        if self.stream_chunk_size > 0:
+            print(
+                f"[ИНФО] Потоковая обработка: частями по {self.stream_chunk_size} участников"
+            )
+
         # Читаем данные из Excel
+        if participants is not None:
+            chunks = iter(split_chunks(participants, self.stream_chunk_size))
+        elif self.stream_chunk_size > 0:
+            # Таблица не загружается целиком, части читаются по мере обработки
+            chunks = (
+                prepare_participants(df)
+                for df in iter_roster_chunks(
+                    excel_file, columns, self.stream_chunk_size
+                )
+            )
+        else:
+            try:
+                df = load_roster(excel_file, columns, roster_cache)
+                print(f"[УСПЕХ] Загружено {len(df)} записей из Excel файла")
+            except Exception as e:
+                print(f"[ОШИБКА] Ошибка при чтении Excel файла: {e}")
+                return
+            chunks = iter([prepare_participants(df)])
+
+        # Конвертер, заполнение наложением и кэш PDF создаются при первой
+        # части с призерами
+        converter = None
+        overlay = None
+        pdf_cache = None
+        # Для частей хранятся только счетчики, списки файлов не растут
+        totals = Counter()
+        parts = []
         try:
-            df = pd.read_excel(excel_file)
-            print(f"[УСПЕХ] Загружено {len(df)} записей из Excel файла")
-        except Exception as e:
-            print(f"[ОШИБКА] Ошибка при чтении Excel файла: {e}")
-            return
+            while True:
+                try:
+                    chunk = next(chunks, None)
+                except Exception as e:
+                    print(f"[ОШИБКА] Ошибка при чтении Excel файла: {e}")
+                    break
+                if chunk is None:
+                    break
+
+                # Фильтруем призеров
+                prize_winners = [
+                    participant for participant in chunk if participant.prize
+                ]
+                totals["winners"] += len(prize_winners)
+                if not prize_winners:
+                    continue
 
-        # Фильтруем призеров
-        prize_winners = df[df["Призер"].isin([1, 2, 3])]
-        print(f"[ИНФО] Найдено {len(prize_winners)} призеров")
+                if converter is None:
+                    # Конвертер запускается один раз для всех дипломов
+                    converter = self.converter or create_converter(config)
+                    if self.renderer == "overlay":
+                        try:
+                            overlay = self.overlay or create_overlay_renderer(
+                                config, converter, output_dir, [diploma_template]
+                            )
+                        except Exception as e:
+                            print(f"[ОШИБКА] Заполнение наложением недоступно: {e}")
+                            return
+                    # Кэш не используется, если DOCX нужно сохранить и объединить
+                    if self.cleanup_docx:
+                        pdf_cache = create_pdf_cache(
+                            config, output_dir, converter.name, self.renderer, overlay
+                        )
 
-        if len(prize_winners) == 0:
+                # В потоковом режиме общие PDF и DOCX создаются для каждой части
+                combined_name = "Все_дипломы_призеров"
+                if self.stream_chunk_size > 0:
+                    combined_name = f"{combined_name}_{len(parts) + 1:03d}"
+                parts.append(combined_name)
+
+                totals.update(
+                    self.create_diplomas(
+                        prize_winners,
+                        diploma_template,
+                        winners_dir,
+                        combined_name,
+                        converter,
+                        overlay,
+                        pdf_cache,
+                    )
+                )
+                if self.stream_chunk_size > 0:
+                    # Документы python-docx связаны циклическими ссылками, память
+                    # lxml части освобождается только сборщиком мусора
+                    gc.collect()
+        finally:
+            if converter is not None and converter is not self.converter:
+                converter.close()
+
+        if totals["winners"] == 0:
             print(
                 "[ОШИБКА] Призеры не найдены. Проверьте столбец 'Призер' в Excel файле."
             )
             return
 
-        successful_diplomas = 0
-        individual_pdf_files = []
-        individual_docx_files = []
+        if pdf_cache is not None:
+            evicted = pdf_cache.evict()
+            if evicted:
+                print(f"[ИНФО] Удалено из кэша PDF: {evicted}")
+
+        # Итоговая статистика
+        print("\n" + "=" * 60)
+        print("ГЕНЕРАЦИЯ ДИПЛОМОВ ЗАВЕРШЕНА!")
+        print(f"Статистика:")
+        print(f"   Обработано призеров: {totals['diplomas']}/{totals['winners']}")
+        print(f"   Создано DOCX файлов: {totals['docx_files']}")
+        print(f"   Создано PDF файлов: {totals['diplomas']}")
+        if pdf_cache is not None:
+            print(f"   Взято из кэша PDF: {totals['cached']}")
+        print(f"   Удаление DOCX: {'Включено' if self.cleanup_docx else 'Отключено'}")
+        print(f"   Результаты в папке: {winners_dir}")
+        if self.stream_chunk_size > 0:
+            print(f"   Объединенные PDF и DOCX по частям: {len(parts)}")
+        else:
+            print(f"   Объединенный PDF: Все_дипломы_призеров.pdf")
+            print(f"   Объединенный DOCX: Все_дипломы_призеров.docx")
 
+    def create_diplomas(
+        self,
+        prize_winners,
+        diploma_template,
+        winners_dir,
+        combined_name,
+        converter,
+        overlay,
+        pdf_cache,
+    ):
+        """Создает дипломы призеров части таблицы и объединяет их
+
+        Общие PDF и DOCX сохраняются в winners_dir под именем combined_name.
+        Возвращает Counter с числом созданных дипломов, DOCX файлов и
+        дипломов, взятых из кэша.
+        """
+        print(f"[ИНФО] Найдено {len(prize_winners)} призеров")
         print("\nСоздание индивидуальных дипломов...")
 
-        for index, row in prize_winners.iterrows():
-            try:
-                # Извлекаем данные
-                participant_name = str(row["ФИО участника"]).strip()
-                report_title = str(row["Название доклада"]).strip()
-                supervisor_name = str(row["ФИО руководителя"]).strip()
-                prize_level = int(row["Призер"])
-
-                # Определяем место
-                prize_text = {1: "I место", 2: "II место", 3: "III место"}.get(
-                    prize_level, ""
-                )
+        # Готовим задания на заполнение дипломов
+        jobs = []
+        labels = []
+
+        # Значения, места и имена файлов подготовлены сразу для всей таблицы
+        for participant in prize_winners:
+            # Подготовка замен
+            replacements = {
+                "{ФИО_участника}": participant.fio,
+                "{Название_доклада}": participant.paper_title,
+                "{ФИО_руководителя}": participant.supervisor,
+            }
+            individual_docx_path = os.path.join(
+                winners_dir, f"Диплом_{participant.safe_fio}.docx"
+            )
 
-                print(f"Обрабатываем: {participant_name} ({prize_text})")
+            jobs.append(RenderJob(diploma_template, replacements, individual_docx_path))
+            labels.append((participant.fio, participant.prize_text))
 
-                # Подготовка замен
-                replacements = {
-                    "{ФИО_участника}": participant_name,
-                    "{Название_доклада}": report_title,
-                    "{ФИО_руководителя}": supervisor_name,
-                }
-
-                # Создаем безопасное имя файла
-                safe_name = re.sub(r'[<>:"/\\|?*]', "_", participant_name)
-                individual_docx_path = os.path.join(
-                    winners_dir, f"Диплом_{safe_name.replace(' ', '_')}.docx"
+        if self.workers > 1 or self.renderer == "zip":
+            # Общий DOCX собирается из документов python-docx в памяти
+            print(
+                "[ИНФО] Дипломы заполняются в основном процессе через python-docx,"
+                " чтобы сразу добавлять их в общий DOCX"
+            )
+
+        # PDF неизмененных дипломов берутся из кэша без конвертации, а в общий
+        # DOCX они заполняются только в памяти
+        cached = set()
+        cache_keys = {}
+        if pdf_cache is not None:
+            cached, cache_keys = pdf_cache.restore(jobs)
+            if cached:
+                print(f"[ИНФО] Взято из кэша PDF: {len(cached)} из {len(jobs)}")
+
+        combined_pdf_path = os.path.join(winners_dir, f"{combined_name}.pdf")
+        combined_docx_path = os.path.join(winners_dir, f"{combined_name}.docx")
+        combined = CombinedDocument()
+        combined_pdf_created = False
+        if self.renderer == "overlay":
+            individual_docx_files = []
+            with profiling.stage("diplomas_overlay"):
+                converted = self.render_overlay(
+                    jobs, labels, overlay, pdf_cache, cache_keys, combined, cached
                 )
-                individual_pdf_path = os.path.join(
-                    winners_dir, f"Диплом_{safe_name.replace(' ', '_')}.pdf"
+        elif self.combined_conversion:
+            # Общий PDF собирается из пакетов сразу, если в него не входят
+            # дипломы из кэша
+            with profiling.stage("diplomas_combined_conversion"):
+                (
+                    individual_docx_files,
+                    converted,
+                    combined_pdf_created,
+                ) = self.convert_combined(
+                    jobs,
+                    labels,
+                    converter,
+                    pdf_cache,
+                    cache_keys,
+                    None if cached else combined_pdf_path,
+                    combined,
+                    cached,
                 )
-
-                # Создаем индивидуальный диплом
-                individual_doc = self.create_diploma_from_template(
-                    diploma_template, replacements
+        else:
+            individual_docx_files, converted = self.render_and_convert(
+                jobs, labels, converter, pdf_cache, cache_keys, combined, cached
+            )
+        converted |= cached
+
+        # PDF объединяются в порядке строк таблицы, включая взятые из кэша
+        individual_pdf_files = [
+            pdf_path_for(job.output_path)
+            for job in jobs
+            if job.output_path in converted
+        ]
+        successful_diplomas = len(individual_pdf_files)
+
+        # Общий DOCX уже собран в памяти по ходу заполнения дипломов
+        if combined.count:
+            print("\nСохранение общего DOCX...")
+
+            with profiling.stage("diplomas_combined_docx"):
+                built = self.save_combined_docx(combined, combined_docx_path)
+            if built:
+                print(
+                    f"  [УСПЕХ] Создан объединенный DOCX: {os.path.basename(combined_docx_path)}"
                 )
+                print(f"  [ИНФО] Объединено дипломов: {combined.count}")
+            else:
+                print(f"  [ОШИБКА] Ошибка при создании объединенного DOCX")
 
-                if individual_doc:
-                    # Сохраняем DOCX
-                    individual_doc.save(individual_docx_path)
-                    individual_docx_files.append(individual_docx_path)
-
-                    # Конвертируем в PDF
-                    try:
-                        convert(individual_docx_path, individual_pdf_path)
-                        individual_pdf_files.append(individual_pdf_path)
-                        successful_diplomas += 1
-                        print(
-                            f"  [УСПЕХ] Созданы файлы: {os.path.basename(individual_docx_path)} и {os.path.basename(individual_pdf_path)}"
-                        )
-
-                    except Exception as e:
-                        print(
-                            f"  [ОШИБКА] Ошибка при создании PDF для {participant_name}: {e}"
-                        )
-                else:
-                    print(
-                        f"  [ОШИБКА] Ошибка при создании диплома для {participant_name}"
-                    )
-
-                # Задержка между обработкой участников
-                if self.delay_between_files > 0 and index < len(prize_winners) - 1:
-                    time.sleep(self.delay_between_files)
-
-            except Exception as e:
-                print(f"[ОШИБКА] Ошибка при обработке строки {index}: {e}")
-                continue
-
-        # Удаляем DOCX файлы если включено в настройках
+        # Удаляем DOCX файлы если включено в настройках. В потоковом режиме
+        # удаляются только DOCX этой части, без обхода всей папки
         if self.cleanup_docx:
             print("\n🧹 Очистка временных DOCX файлов...")
-            self.cleanup_docx_files(winners_dir)
+            self.cleanup_docx_files(
+                winners_dir,
+                individual_docx_files if self.stream_chunk_size > 0 else None,
+                keep=[combined_docx_path],
+            )
 
         # Объединяем индивидуальные PDF файлы в один общий
-        if individual_pdf_files:
+        if combined_pdf_created:
+            print(
+                f"\n  [УСПЕХ] Создан объединенный PDF: {os.path.basename(combined_pdf_path)}"
+            )
+            print(f"  [ИНФО] Объединено дипломов: {successful_diplomas}")
+        elif individual_pdf_files:
             print("\nОбъединение индивидуальных PDF файлов...")
-            combined_pdf_path = os.path.join(winners_dir, "Все_дипломы_призеров.pdf")
 
-            if self.merge_pdfs(individual_pdf_files, combined_pdf_path):
+            with profiling.stage("diplomas_pdf_merge"):
+                merged = self.merge_pdfs(individual_pdf_files, combined_pdf_path)
+            if merged:
                 print(
                     f"  [УСПЕХ] Создан объединенный PDF: {os.path.basename(combined_pdf_path)}"
                 )
@@ -340,33 +700,11 @@ class DiplomaGenerator:
             else:
                 print(f"  [ОШИБКА] Ошибка при создании объединенного PDF")
 
-        # Объединяем индивидуальные DOCX файлы в один общий (только если не удалены)
-        if individual_docx_files and not self.cleanup_docx:
-            print("\nОбъединение индивидуальных DOCX файлов...")
-            combined_docx_path = os.path.join(winners_dir, "Все_дипломы_призеров.docx")
-
-            if self.merge_docx_files(individual_docx_files, combined_docx_path):
-                print(
-                    f"  [УСПЕХ] Создан объединенный DOCX: {os.path.basename(combined_docx_path)}"
-                )
-                print(f"  [ИНФО] Объединено DOCX файлов: {len(individual_docx_files)}")
-            else:
-                print(f"  [ОШИБКА] Ошибка при создании объединенного DOCX")
-        elif self.cleanup_docx:
-            print("\n[ИНФО] Объединение DOCX пропущено - файлы удалены по настройкам")
-
-        # Итоговая статистика
-        print("\n" + "=" * 60)
-        print("ГЕНЕРАЦИЯ ДИПЛОМОВ ЗАВЕРШЕНА!")
-        print(f"Статистика:")
-        print(f"   Обработано призеров: {successful_diplomas}/{len(prize_winners)}")
-        print(f"   Создано DOCX файлов: {len(individual_docx_files)}")
-        print(f"   Создано PDF файлов: {len(individual_pdf_files)}")
-        print(f"   Удаление DOCX: {'Включено' if self.cleanup_docx else 'Отключено'}")
-        print(f"   Результаты в папке: {winners_dir}")
-        print(f"   Объединенный PDF: Все_дипломы_призеров.pdf")
-        if not self.cleanup_docx:
-            print(f"   Объединенный DOCX: Все_дипломы_призеров.docx")
+        return Counter(
+            diplomas=successful_diplomas,
+            docx_files=len(individual_docx_files),
+            cached=len(cached),
+        )
 
 
 def main():
@@ -376,12 +714,22 @@ def main():
 
     generator = DiplomaGenerator()
 
-    # Запускаем генерацию дипломов
-    generator.generate_diplomas()
+    # Запускаем генерацию дипломов. Отчеты о времени пишутся при любом
+    # завершении, в том числе при ошибке
+    generator.start_profiling()
+    try:
+        generator.generate_diplomas()
+    finally:
+        generator.write_metrics()
+        profile_dir = profiling.finish()
+        if profile_dir:
+            print(f"[ИНФО] Профили этапов: {profile_dir}")
 
     print("\n" + "=" * 60)
     input("Нажмите Enter для выхода...")
 
 
 if __name__ == "__main__":
+    # Нужно для пула процессов в собранном исполняемом файле
+    multiprocessing.freeze_support()
     main()
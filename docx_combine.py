@@ -0,0 +1,135 @@
+import copy
+import io
+import re
+
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.packuri import PackURI
+from docx.opc.part import Part
+from docx.oxml.ns import qn
+from docx.parts.hdrftr import FooterPart, HeaderPart
+
+
+# Атрибуты со ссылками на связи части (r:id, r:embed, r:link и другие)
+RELATIONSHIP_NAMESPACE = (
+    "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+)
+
+# Идентификаторы рисунков должны быть уникальны во всем документе
+DRAWING_ID_TAG = qn("wp:docPr")
+
+
+class CombinedDocument:
+    """Общий DOCX, собираемый из заполненных документов в памяти
+
+    Первый документ становится основой, тела следующих добавляются в конец
+    отдельными разделами: параметры страницы, колонтитулы и изображения
+    каждого документа переносятся вместе с ним. Одинаковые изображения
+    (например, подпись или логотип шаблона) хранятся в результате один раз.
+    Добавленные документы не изменяются, их можно использовать дальше
+    (например, одновременно собирать в пакет для конвертации).
+    """
+
+    def __init__(self):
+        self.document = None
+        self.count = 0
+        self._next_drawing_id = 1
+
+    @staticmethod
+    def _body(document):
+        # Элемент части, а не document.element: после deepcopy документа
+        # сохраняется именно дерево части
+        return document.part.element.body
+
+    def append(self, document):
+        """Добавляет заполненный документ (python-docx Document)"""
+        self.count += 1
+        if self.document is None:
+            self.document = copy.deepcopy(document)
+            self._renumber_drawings(self._body(self.document))
+            return
+
+        target = self.document.part
+        body = self._body(self.document)
+        final_sectPr = body.find(qn("w:sectPr"))
+        self._close_section(body, final_sectPr)
+
+        source_body = self._body(document)
+        relationships = {}
+        for child in source_body:
+            if child.tag == qn("w:sectPr"):
+                continue
+            element = copy.deepcopy(child)
+            self._import_relationships(element, document.part, target, relationships)
+            self._renumber_drawings(element)
+            final_sectPr.addprevious(element)
+
+        # Последний раздел общего документа получает параметры добавленного
+        source_sectPr = source_body.find(qn("w:sectPr"))
+        if source_sectPr is not None:
+            sectPr = copy.deepcopy(source_sectPr)
+            self._import_relationships(sectPr, document.part, target, relationships)
+            body.replace(final_sectPr, sectPr)
+
+    @staticmethod
+    def _close_section(body, sectPr):
+        """Завершает текущий раздел перед добавлением следующего документа
+
+        Параметры раздела переносятся в последний параграф, а если
+        документ заканчивается таблицей - в новый пустой параграф.
+        """
+        last = sectPr.getprevious()
+        if (
+            last is None
+            or last.tag != qn("w:p")
+            or last.find(f"{qn('w:pPr')}/{qn('w:sectPr')}") is not None
+        ):
+            last = body.makeelement(qn("w:p"), {})
+            sectPr.addprevious(last)
+        last.get_or_add_pPr().append(copy.deepcopy(sectPr))
+
+    def _renumber_drawings(self, element):
+        for drawing in element.iter(DRAWING_ID_TAG):
+            drawing.set("id", str(self._next_drawing_id))
+            self._next_drawing_id += 1
+
+    def _import_relationships(self, element, source_part, target_part, mapping):
+        """Заменяет ссылки на связи исходной части связями общего документа"""
+        for node in element.iter():
+            for name, value in node.attrib.items():
+                if not name.startswith(RELATIONSHIP_NAMESPACE):
+                    continue
+                if value not in mapping:
+                    mapping[value] = self._import_relationship(
+                        source_part.rels[value], target_part
+                    )
+                node.set(name, mapping[value])
+
+    def _import_relationship(self, rel, target_part):
+        """Переносит одну связь в общий документ и возвращает ее новый rId"""
+        if rel.is_external:
+            return target_part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+
+        package = target_part.package
+        source = rel.target_part
+        if rel.reltype == RT.IMAGE:
+            # Повторяющиеся изображения определяются по хешу и не дублируются
+            image_part = package.get_or_add_image_part(io.BytesIO(source.blob))
+            return target_part.relate_to(image_part, RT.IMAGE)
+
+        partname = package.next_partname(
+            re.sub(r"\d*(\.\w+)$", r"%d\1", str(source.partname))
+        )
+        if rel.reltype in (RT.HEADER, RT.FOOTER):
+            part_class = HeaderPart if rel.reltype == RT.HEADER else FooterPart
+            element = copy.deepcopy(source.element)
+            part = part_class(partname, source.content_type, element, package)
+            self._import_relationships(element, source, part, {})
+        else:
+            # Прочие части (диаграммы, внедренные объекты) копируются как есть
+            part = Part(PackURI(partname), source.content_type, source.blob, package)
+        return target_part.relate_to(part, rel.reltype)
+
+    def save(self, path_or_stream):
+        if self.document is None:
+            raise ValueError("Нет документов для объединения")
+        self.document.save(path_or_stream)
@@ -0,0 +1,254 @@
+import copy
+import functools
+import os
+import re
+from collections import namedtuple
+
+from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+
+import metrics
+
+
+# Плейсхолдеры в шаблонах имеют вид {Имя_поля}
+PLACEHOLDER_PATTERN = re.compile(r"\{[^{}]+\}")
+
+# Положение плейсхолдера в шаблоне:
+#   part        - имя части документа ("word/document.xml", "word/header1.xml")
+#   path        - индексы элементов от корня части до параграфа
+#   placeholder - текст плейсхолдера
+PlaceholderLocation = namedtuple("PlaceholderLocation", ["part", "path", "placeholder"])
+
+# Связи основной части документа с колонтитулами всех разделов
+STORY_RELTYPES = (RT.HEADER, RT.FOOTER)
+
+
+@functools.lru_cache(maxsize=64)
+def _substitution_pattern(placeholders):
+    """Регулярное выражение, находящее любой из плейсхолдеров за один проход
+
+    Более длинные плейсхолдеры идут первыми, чтобы {Название_доклада*}
+    не распознавался как {Название_доклада} с лишней звездочкой.
+    """
+    ordered = sorted(placeholders, key=len, reverse=True)
+    return re.compile("|".join(re.escape(placeholder) for placeholder in ordered))
+
+
+def _paragraph_text_nodes(p):
+    """Элементы w:t параграфа (без вложенных параграфов надписей)"""
+    nodes = []
+    for t in p.iter(qn("w:t")):
+        owner = t.getparent()
+        while owner is not None and owner.tag != qn("w:p"):
+            owner = owner.getparent()
+        if owner is p:
+            nodes.append(t)
+    return nodes
+
+
+def replace_placeholders(paragraph, replacements, alignments=None):
+    """Заменяет все плейсхолдеры параграфа за один проход
+
+    Текст вне плейсхолдеров остается в своих runs вместе с их
+    форматированием, значение получает форматирование run, в котором
+    начинается плейсхолдер (даже если Word разбил его на несколько runs).
+    alignments - {плейсхолдер: выравнивание} для параграфов, в которых
+    он встретился (при нескольких побеждает последний в словаре).
+    Возвращает список найденных плейсхолдеров.
+    """
+    if not replacements:
+        return []
+    p = paragraph._p
+    nodes = _paragraph_text_nodes(p)
+    texts = [t.text or "" for t in nodes]
+    full_text = "".join(texts)
+    pattern = _substitution_pattern(tuple(sorted(replacements)))
+    matches = list(pattern.finditer(full_text))
+    if not matches:
+        return []
+
+    # Границы текста каждого w:t в общем тексте параграфа
+    bounds = []
+    offset = 0
+    for text in texts:
+        bounds.append((offset, offset + len(text)))
+        offset += len(text)
+
+    parts = [[] for _ in nodes]
+
+    def keep(start, end):
+        """Оставляет текст [start, end) в тех w:t, где он был"""
+        for index, (node_start, node_end) in enumerate(bounds):
+            low, high = max(start, node_start), min(end, node_end)
+            if low < high:
+                parts[index].append(full_text[low:high])
+
+    position = 0
+    for match in matches:
+        keep(position, match.start())
+        owner = next(
+            index
+            for index, (node_start, node_end) in enumerate(bounds)
+            if node_start <= match.start() < node_end
+        )
+        parts[owner].append(replacements[match.group()])
+        position = match.end()
+    keep(position, len(full_text))
+
+    for node, node_parts in zip(nodes, parts):
+        text = "".join(node_parts)
+        node.text = text
+        if text != text.strip():
+            node.set(qn("xml:space"), "preserve")
+
+    found = [match.group() for match in matches]
+    if alignments:
+        for placeholder, alignment in alignments.items():
+            if placeholder in found:
+                paragraph.alignment = alignment
+    return found
+
+
+def part_name(part):
+    """Имя части пакета так, как оно записано в DOCX архиве"""
+    return str(part.partname).lstrip("/")
+
+
+def iter_story_parts(document):
+    """Обходит части документа с текстом: основную и все колонтитулы
+
+    Возвращает пары (имя части, корневой элемент). Колонтитулы берутся
+    из связей документа, поэтому учитываются и колонтитулы первой
+    страницы, и четных страниц всех разделов.
+    """
+    main = document.part
+    yield part_name(main), main.element
+    for rel in main.rels.values():
+        if not rel.is_external and rel.reltype in STORY_RELTYPES:
+            yield part_name(rel.target_part), rel.target_part.element
+
+
+def element_path(root, element):
+    """Возвращает индексы элементов от root до element"""
+    path = []
+    while element is not root:
+        parent = element.getparent()
+        path.append(parent.index(element))
+        element = parent
+    return tuple(reversed(path))
+
+
+def resolve_path(root, path):
+    """Находит элемент по индексам от root"""
+    element = root
+    for index in path:
+        element = element[index]
+    return element
+
+
+def find_placeholder_paragraphs(root):
+    """Находит параграфы части, содержащие плейсхолдеры
+
+    Обходятся все w:p части: параграфы тела, вложенных таблиц любой
+    глубины и надписей. Возвращает список (путь, плейсхолдеры).
+    """
+    found = []
+    for p in root.iter(qn("w:p")):
+        text = "".join(t.text or "" for t in _paragraph_text_nodes(p))
+        placeholders = PLACEHOLDER_PATTERN.findall(text)
+        if placeholders:
+            found.append((element_path(root, p), placeholders))
+    return found
+
+
+class CompiledTemplate:
+    """Шаблон DOCX, разобранный один раз и заполняемый многократно
+
+    При создании шаблон читается с диска и в нем находятся все параграфы
+    с плейсхолдерами. Для каждого участника создается копия дерева документа
+    в памяти, и замены выполняются только в найденных параграфах.
+    """
+
+    def __init__(self, template_path):
+        self.template_path = template_path
+        # Исходный документ только разбирается и копируется. Обертки python-docx
+        # (например, тело документа) у него не запрашиваются: lxml копирует
+        # элементы без учета memo, и после deepcopy они указывали бы на чужое дерево
+        self._source = Document(template_path)
+        self.locations = []
+        # Индекс: {имя части: [пути к параграфам с плейсхолдерами]}
+        self.index = {}
+        self._compile()
+
+    def _compile(self):
+        """Находит параграфы шаблона, содержащие плейсхолдеры"""
+        for name, root in iter_story_parts(self._source):
+            for path, placeholders in find_placeholder_paragraphs(root):
+                self.index.setdefault(name, []).append(path)
+                self.locations.extend(
+                    PlaceholderLocation(name, path, placeholder)
+                    for placeholder in placeholders
+                )
+
+    @property
+    def placeholders(self):
+        """Множество плейсхолдеров, найденных в шаблоне"""
+        return {location.placeholder for location in self.locations}
+
+    def placeholder_paragraphs(self):
+        """Возвращает текст каждого параграфа шаблона с плейсхолдерами"""
+        roots = dict(iter_story_parts(self._source))
+        for name, paths in self.index.items():
+            for path in paths:
+                p = resolve_path(roots[name], path)
+                yield "".join(t.text or "" for t in _paragraph_text_nodes(p))
+
+    def render(self, replacements, replace_paragraph):
+        """Создает заполненную копию шаблона
+
+        replace_paragraph(paragraph, replacements) выполняет замену в одном
+        параграфе и вызывается только для параграфов с плейсхолдерами.
+        """
+        with metrics.timer("substitution"):
+            document = copy.deepcopy(self._source)
+            roots = dict(iter_story_parts(document))
+            for name, paths in self.index.items():
+                for path in paths:
+                    paragraph = Paragraph(resolve_path(roots[name], path), None)
+                    replace_paragraph(paragraph, replacements)
+        return document
+
+
+_template_cache = {}
+
+# Доступные способы заполнения шаблонов ([processing] renderer в config.ini)
+RENDERERS = ("docx", "zip")
+
+
+def load_template(template_path, renderer="docx"):
+    """Возвращает скомпилированный шаблон, загружая его с диска один раз
+
+    Шаблон разбирается при первом обращении и хранится в кэше модуля,
+    render() создает для каждого документа копию в памяти, поэтому
+    вызывающему коду не нужно хранить шаблоны самому.
+    renderer="docx" использует объектную модель python-docx,
+    renderer="zip" заполняет XML части напрямую внутри DOCX архива.
+    """
+    if renderer not in RENDERERS:
+        raise ValueError(f"Неизвестный способ заполнения шаблонов: {renderer}")
+
+    key = (os.path.abspath(template_path), renderer)
+    template = _template_cache.get(key)
+    if template is None:
+        with metrics.timer("template_open"):
+            if renderer == "zip":
+                # Импорт здесь: docx_zip использует обход частей из этого модуля
+                from docx_zip import ZipTemplate
+
+                template = ZipTemplate(template_path)
+            else:
+                template = CompiledTemplate(template_path)
+        _template_cache[key] = template
+    return template
@@ -0,0 +1,221 @@
+import copy
+import re
+import struct
+import zipfile
+import zlib
+
+from docx.oxml.parser import parse_xml
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+import metrics
+from docx_templates import find_placeholder_paragraphs, resolve_path
+
+
+# Части документа, в которых могут находиться плейсхолдеры
+TEXT_PART_PATTERN = re.compile(r"^word/(document|header\d*|footer\d*)\.xml$")
+
+# Заголовки записей ZIP архива (формат описан в APPNOTE.TXT)
+LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+END_OF_ARCHIVE = struct.Struct("<4s4H2LH")
+
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8_NAME = 0x800
+
+
+class ZipMember:
+    """Запись ZIP архива с уже сжатыми данными"""
+
+    def __init__(self, info, data, crc, file_size):
+        self.filename = info.filename
+        self.name_bytes = info.filename.encode("utf-8")
+        self.flag_bits = (info.flag_bits & ~FLAG_DATA_DESCRIPTOR) | (
+            FLAG_UTF8_NAME if not info.filename.isascii() else 0
+        )
+        self.compress_type = info.compress_type
+        self.external_attr = info.external_attr
+        self.dos_time, self.dos_date = _dos_datetime(info.date_time)
+        self.data = data
+        self.crc = crc
+        self.file_size = file_size
+
+    def local_header(self):
+        return LOCAL_HEADER.pack(
+            b"PK\x03\x04",
+            20,
+            0,
+            self.flag_bits,
+            self.compress_type,
+            self.dos_time,
+            self.dos_date,
+            self.crc,
+            len(self.data),
+            self.file_size,
+            len(self.name_bytes),
+            0,
+        )
+
+    def central_header(self, offset):
+        return CENTRAL_HEADER.pack(
+            b"PK\x01\x02",
+            20,
+            0,
+            20,
+            0,
+            self.flag_bits,
+            self.compress_type,
+            self.dos_time,
+            self.dos_date,
+            self.crc,
+            len(self.data),
+            self.file_size,
+            len(self.name_bytes),
+            0,
+            0,
+            0,
+            0,
+            self.external_attr,
+            offset,
+        )
+
+
+def _dos_datetime(date_time):
+    """Переводит дату и время в формат MS-DOS, используемый в ZIP"""
+    year, month, day, hour, minute, second = date_time
+    dos_time = (hour << 11) | (minute << 5) | (second // 2)
+    dos_date = ((year - 1980) << 9) | (month << 5) | day
+    return dos_time, dos_date
+
+
+def _read_raw_member(file, info):
+    """Читает сжатые данные записи архива без распаковки"""
+    file.seek(info.header_offset)
+    header = file.read(LOCAL_HEADER.size)
+    name_length, extra_length = struct.unpack("<2H", header[26:30])
+    file.seek(info.header_offset + LOCAL_HEADER.size + name_length + extra_length)
+    return file.read(info.compress_size)
+
+
+def _deflate(data):
+    """Сжимает данные алгоритмом deflate без заголовка zlib"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _write_archive(stream, members):
+    """Записывает ZIP архив из подготовленных записей"""
+    offsets = []
+    position = 0
+    for member in members:
+        offsets.append(position)
+        header = member.local_header()
+        stream.write(header)
+        stream.write(member.name_bytes)
+        stream.write(member.data)
+        position += len(header) + len(member.name_bytes) + len(member.data)
+
+    central_directory_offset = position
+    central_directory_size = 0
+    for member, offset in zip(members, offsets):
+        header = member.central_header(offset)
+        stream.write(header)
+        stream.write(member.name_bytes)
+        central_directory_size += len(header) + len(member.name_bytes)
+
+    stream.write(
+        END_OF_ARCHIVE.pack(
+            b"PK\x05\x06",
+            0,
+            0,
+            len(members),
+            len(members),
+            central_directory_size,
+            central_directory_offset,
+            0,
+        )
+    )
+
+
+class RenderedDocx:
+    """Заполненный документ в виде готового DOCX архива"""
+
+    def __init__(self, members):
+        self._members = members
+
+    def save(self, path_or_stream):
+        """Сохраняет документ в файл или поток"""
+        if hasattr(path_or_stream, "write"):
+            _write_archive(path_or_stream, self._members)
+        else:
+            with open(path_or_stream, "wb") as file:
+                _write_archive(file, self._members)
+
+
+class ZipTemplate:
+    """Шаблон DOCX, заполняемый на уровне ZIP архива
+
+    Разбираются только word/document.xml и колонтитулы с плейсхолдерами,
+    остальные записи (изображения, шрифты, стили) копируются в результат
+    побайтно, без распаковки и повторного сжатия. Интерфейс совпадает
+    с CompiledTemplate, поэтому генераторы могут использовать любой из них.
+    """
+
+    def __init__(self, template_path):
+        self.template_path = template_path
+        self._members = []
+        self._text_parts = {}
+        # Индекс: {имя части: [пути к параграфам с плейсхолдерами]}
+        self.index = {}
+
+        with zipfile.ZipFile(template_path) as archive, open(
+            template_path, "rb"
+        ) as file:
+            for info in archive.infolist():
+                if TEXT_PART_PATTERN.match(info.filename):
+                    root = parse_xml(archive.read(info))
+                    paths = [path for path, _ in find_placeholder_paragraphs(root)]
+                    if paths:
+                        self._text_parts[info.filename] = (info, root, paths)
+                        self.index[info.filename] = paths
+                        self._members.append(info.filename)
+                        continue
+
+                member = ZipMember(
+                    info,
+                    _read_raw_member(file, info),
+                    info.CRC,
+                    info.file_size,
+                )
+                self._members.append(member)
+
+    def _render_part(self, info, root, paths, replacements, replace_paragraph):
+        """Заполняет одну XML часть и возвращает ее сжатую запись"""
+        root = copy.deepcopy(root)
+        for path in paths:
+            replace_paragraph(Paragraph(resolve_path(root, path), None), replacements)
+
+        xml = etree.tostring(
+            root, encoding="UTF-8", xml_declaration=True, standalone=True
+        )
+        rendered_info = zipfile.ZipInfo(info.filename, info.date_time)
+        rendered_info.compress_type = zipfile.ZIP_DEFLATED
+        rendered_info.external_attr = info.external_attr
+        return ZipMember(rendered_info, _deflate(xml), zlib.crc32(xml), len(xml))
+
+    def render(self, replacements, replace_paragraph):
+        """Создает заполненный документ
+
+        replace_paragraph(paragraph, replacements) вызывается только для
+        параграфов с плейсхолдерами, как и в CompiledTemplate.
+        """
+        members = []
+        with metrics.timer("substitution"):
+            for member in self._members:
+                if isinstance(member, str):
+                    info, root, paths = self._text_parts[member]
+                    member = self._render_part(
+                        info, root, paths, replacements, replace_paragraph
+                    )
+                members.append(member)
+        return RenderedDocx(members)
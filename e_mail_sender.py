@@ -1,15 +1,25 @@
-import pandas as pd
-import smtplib
+import asyncio
+import html
+import io
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
-from docx import Document
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 import os
-import time
-from comtypes import client
 import configparser
 import sys
+import metrics
+import profiling
+from docx_templates import load_template, replace_placeholders
+from hashing import content_hash, file_digest
+from pdf_converters import create_converter
+from pipeline import PipelineStage, run_pipeline
+from roster import load_roster, prepare_participants
+from send_ledger import open_ledger
+from smtp_mailer import create_mailer
 
 
 def get_script_directory():
@@ -64,162 +74,212 @@ def check_required_files(config):
     return missing_files
 
 
-def docx_to_pdf(docx_path, pdf_path):
-    """Конвертирует DOCX в PDF используя Word"""
-    try:
-        word = client.CreateObject("Word.Application")
-        word.Visible = False
+# Колонки таблицы участников, нужные для приглашений
+INVITATION_COLUMNS = ["ФИО участника", "Название доклада", "e-mail"]
+
+
+def missing_invitation_columns(df):
+    """Возвращает колонки для приглашений, которых нет в таблице"""
+    return [column for column in INVITATION_COLUMNS if column not in df.columns]
 
-        doc = word.Documents.Open(docx_path)
-        doc.SaveAs(pdf_path, FileFormat=17)
-        doc.Close()
-        word.Quit()
+
+def docx_to_pdf(docx_path, pdf_path, converter):
+    """Конвертирует DOCX в PDF через общий пул конвертеров"""
+    try:
+        converter.convert(docx_path, pdf_path)
         return True
     except Exception as e:
         print(f"Ошибка конвертации в PDF: {e}")
         return False
 
 
-def replace_text_keeping_formatting(paragraph, search_text, replace_text):
-    """Заменяет текст в параграфе, сохраняя форматирование"""
-    if search_text in paragraph.text:
-        original_runs = paragraph.runs
-        if not original_runs:
-            paragraph.text = paragraph.text.replace(search_text, replace_text)
-            return
+# Выравнивание параграфов приглашения по подставленному в них значению
+INVITATION_ALIGNMENTS = {
+    "{ФИО_участника}": WD_ALIGN_PARAGRAPH.CENTER,
+    "{Название_доклада*}": WD_ALIGN_PARAGRAPH.JUSTIFY,
+    "{Название_доклада}": WD_ALIGN_PARAGRAPH.JUSTIFY,
+}
 
-        full_text = ""
-        for run in original_runs:
-            full_text += run.text
-
-        if search_text in full_text:
-            p = paragraph._element
-            p.clear()
-
-            parts = full_text.split(search_text)
-
-            for i, part in enumerate(parts):
-                if part:
-                    new_run = paragraph.add_run(part)
-                    if original_runs:
-                        first_run = original_runs[0]
-                        new_run.bold = first_run.bold
-                        new_run.italic = first_run.italic
-                        new_run.underline = first_run.underline
-                        if first_run.font.size:
-                            new_run.font.size = first_run.font.size
-                        if first_run.font.name:
-                            new_run.font.name = first_run.font.name
-
-                if i < len(parts) - 1:
-                    new_run = paragraph.add_run(replace_text)
-                    if original_runs:
-                        first_run = original_runs[0]
-                        new_run.bold = first_run.bold
-                        new_run.italic = first_run.italic
-                        new_run.underline = first_run.underline
-                        if first_run.font.size:
-                            new_run.font.size = first_run.font.size
-                        if first_run.font.name:
-                            new_run.font.name = first_run.font.name
 
+def fill_invitation_paragraph(paragraph, replacements):
+    """Заполняет параграф приглашения и выравнивает его по содержимому"""
+    replace_placeholders(paragraph, replacements, INVITATION_ALIGNMENTS)
 
-def create_personalized_invitation(
-    template_path, output_dir, fio, paper_title, cleanup_docx=True
+
+class InvitationTask:
+    """Данные одного участника, проходящие через этапы рассылки"""
+
+    def __init__(self, row_number, fio, paper_title, email, key=None):
+        self.row_number = row_number
+        self.fio = fio
+        self.paper_title = paper_title
+        self.email = email
+        # Хеш содержимого письма для журнала рассылки
+        self.key = key
+        # PDF, подготовленный в прошлом запуске и еще не отправленный
+        self.resumed = False
+        self.docx_path = None
+        self.pdf_path = None
+        # Содержимое документов в режиме обработки в памяти
+        self.docx_data = None
+        self.pdf_data = None
+
+
+def invitation_path(output_dir, fio, extension):
+    """Возвращает путь к файлу приглашения участника, создавая папку"""
+    script_dir = get_script_directory()
+    output_dir_full = os.path.join(script_dir, output_dir, "Приглашения")
+    os.makedirs(output_dir_full, exist_ok=True)
+    return os.path.join(
+        output_dir_full, f"Приглашение_{fio.replace(' ', '_')}{extension}"
+    )
+
+
+def render_invitation(template_path, fio, paper_title, renderer="docx"):
+    """Заполняет шаблон приглашения и возвращает документ"""
+    template = load_template(template_path, renderer)
+    replacements = {
+        "{ФИО_участника}": fio,
+        "{Название_доклада}": paper_title,
+        "{Название_доклада*}": paper_title,
+    }
+    return template.render(replacements, fill_invitation_paragraph)
+
+
+def render_invitation_docx(
+    template_path, output_dir, fio, paper_title, renderer="docx"
 ):
-    """Создает персонализированное приглашение в PDF"""
+    """Заполняет шаблон приглашения и сохраняет DOCX, возвращает путь к нему"""
+    doc = render_invitation(template_path, fio, paper_title, renderer)
+    docx_path = invitation_path(output_dir, fio, ".docx")
+    with metrics.timer("docx_save"):
+        doc.save(docx_path)
+    return docx_path
+
+
+def render_invitation_bytes(template_path, fio, paper_title, renderer="docx"):
+    """Заполняет шаблон приглашения и возвращает содержимое DOCX"""
+    doc = render_invitation(template_path, fio, paper_title, renderer)
+    stream = io.BytesIO()
+    with metrics.timer("docx_save"):
+        doc.save(stream)
+    return stream.getvalue()
+
+
+def convert_invitation_bytes(docx_data, fio, converter):
+    """Конвертирует DOCX приглашения из памяти, возвращает содержимое PDF"""
     try:
-        doc = Document(template_path)
-
-        # Обрабатываем все параграфы
-        for paragraph in doc.paragraphs:
-            # Заменяем ФИО_участника и выравниваем по центру
-            if "{ФИО_участника}" in paragraph.text:
-                replace_text_keeping_formatting(paragraph, "{ФИО_участника}", fio)
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-            # Заменяем Название_доклада и выравниваем по ширине
-            if "{Название_доклада*}" in paragraph.text:
-                replace_text_keeping_formatting(
-                    paragraph, "{Название_доклада*}", paper_title
-                )
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-            elif "{Название_доклада}" in paragraph.text:
-                replace_text_keeping_formatting(
-                    paragraph, "{Название_доклада}", paper_title
-                )
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        # Обрабатываем таблицы
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    for paragraph in cell.paragraphs:
-                        if "{ФИО_участника}" in paragraph.text:
-                            replace_text_keeping_formatting(
-                                paragraph,
-                                "{ФИО_участника}",
-                                fio,
-                            )
-                            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        return converter.convert_bytes(docx_data, f"приглашение {fio}")
+    except Exception as e:
+        print(f"Ошибка конвертации: {e}")
+        return None
 
-                        if "{Название_доклада*}" in paragraph.text:
-                            replace_text_keeping_formatting(
-                                paragraph, "{Название_доклада*}", paper_title
-                            )
-                            paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-                        elif "{Название_доклада}" in paragraph.text:
-                            replace_text_keeping_formatting(
-                                paragraph, "{Название_доклада}", paper_title
-                            )
-                            paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
 
-        script_dir = get_script_directory()
-        output_dir_full = os.path.join(script_dir, output_dir, "Приглашения")
-        os.makedirs(output_dir_full, exist_ok=True)
+def archive_invitation_pdf(output_dir, fio, pdf_data):
+    """Сохраняет копию PDF приглашения в output_dir, возвращает путь"""
+    pdf_path = invitation_path(output_dir, fio, ".pdf")
+    with open(pdf_path, "wb") as file:
+        file.write(pdf_data)
+    return pdf_path
 
-        temp_docx = os.path.join(
-            output_dir_full, f"Приглашение_{fio.replace(' ', '_')}.docx"
-        )
-        doc.save(temp_docx)
 
-        pdf_path = os.path.join(
-            output_dir_full, f"Приглашение_{fio.replace(' ', '_')}.pdf"
-        )
+def convert_invitation(docx_path, converter, cleanup_docx=True):
+    """Конвертирует DOCX приглашения в PDF, возвращает путь к PDF или None"""
+    pdf_path = os.path.splitext(docx_path)[0] + ".pdf"
 
-        if docx_to_pdf(os.path.abspath(temp_docx), os.path.abspath(pdf_path)):
-            # Удаляем временный DOCX файл если включено в настройках
-            if cleanup_docx:
-                os.remove(temp_docx)
-            return pdf_path
-        else:
-            return None
+    if docx_to_pdf(os.path.abspath(docx_path), os.path.abspath(pdf_path), converter):
+        # Удаляем временный DOCX файл если включено в настройках
+        if cleanup_docx:
+            os.remove(docx_path)
+        return pdf_path
+    return None
+
+
+def create_personalized_invitation(
+    template_path,
+    output_dir,
+    fio,
+    paper_title,
+    converter,
+    cleanup_docx=True,
+    renderer="docx",
+):
+    """Создает персонализированное приглашение в PDF"""
+    try:
+        docx_path = render_invitation_docx(
+            template_path, output_dir, fio, paper_title, renderer
+        )
+        return convert_invitation(docx_path, converter, cleanup_docx)
 
     except Exception as e:
         print(f"Ошибка создания приглашения для {fio}: {e}")
         return None
 
 
+class EmailTemplate:
+    """HTML шаблон письма, разобранный на текст и места подстановки
+
+    Файл читается один раз, дальше письмо собирается одним join из
+    готовых фрагментов и экранированных значений {fio} и {paper_title}.
+    """
+
+    SLOT_PATTERN = re.compile(r"\{(fio|paper_title)\}")
+
+    def __init__(self, text):
+        # Четные элементы - текст шаблона, нечетные - имена подстановок
+        self.parts = self.SLOT_PATTERN.split(text)
+
+    def render(self, **values):
+        """Собирает письмо, экранируя значения для HTML"""
+        escaped = {name: html.escape(value) for name, value in values.items()}
+        parts = list(self.parts)
+        for index in range(1, len(parts), 2):
+            parts[index] = escaped[parts[index]]
+        return "".join(parts)
+
+
+_email_templates = {}
+_email_templates_lock = threading.Lock()
+
+
 def load_email_template(config):
-    """Загружает HTML шаблон письма из файла"""
+    """Загружает и разбирает HTML шаблон письма (один раз на файл)"""
     script_dir = get_script_directory()
     email_template_filename = config.get("files", "email_template")
     template_path = os.path.join(script_dir, email_template_filename)
 
-    with open(template_path, "r", encoding="utf-8") as file:
-        return file.read()
+    with _email_templates_lock:
+        template = _email_templates.get(template_path)
+        if template is None:
+            with open(template_path, "r", encoding="utf-8") as file:
+                template = EmailTemplate(file.read())
+            _email_templates[template_path] = template
+    return template
 
 
 def create_email_body(fio, paper_title, config):
     """Создает тело письма из шаблона"""
     template = load_email_template(config)
-    return template.replace("{fio}", fio).replace("{paper_title}", paper_title)
+    return template.render(fio=fio, paper_title=paper_title)
 
 
 def send_email_simple(
-    sender_email, sender_password, recipient_email, fio, paper_title, pdf_path, config
+    sender_email,
+    sender_password,
+    recipient_email,
+    fio,
+    paper_title,
+    pdf_path,
+    config,
+    mailer=None,
+    pdf_data=None,
 ):
-    """Упрощенная функция отправки письма"""
+    """Упрощенная функция отправки письма
+
+    mailer - общий пул SMTP сессий (SmtpMailer). Без него для письма
+    открывается отдельное соединение, как раньше. pdf_data - содержимое
+    PDF в памяти, при нем файл pdf_path не читается.
+    """
     try:
         msg = MIMEMultipart()
         msg["From"] = sender_email
@@ -231,25 +291,23 @@ def send_email_simple(
         msg.attach(MIMEText(html_body, "html", "utf-8"))
 
         # Прикрепляем PDF файл
-        with open(pdf_path, "rb") as file:
-            attachment = MIMEApplication(file.read(), _subtype="pdf")
-            attachment.add_header(
-                "Content-Disposition",
-                "attachment",
-                filename=f"Приглашение_на_конференцию_{fio.replace(' ', '_')}.pdf",
-            )
-            msg.attach(attachment)
-
-        # Получаем SMTP настройки из конфига
-        smtp_server = config.get("email", "smtp_server")
-        smtp_port = config.getint("email", "smtp_port")
+        if pdf_data is None:
+            with open(pdf_path, "rb") as file:
+                pdf_data = file.read()
+        attachment = MIMEApplication(pdf_data, _subtype="pdf")
+        attachment.add_header(
+            "Content-Disposition",
+            "attachment",
+            filename=f"Приглашение_на_конференцию_{fio.replace(' ', '_')}.pdf",
+        )
+        msg.attach(attachment)
 
-        # Отправляем письмо
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        server.send_message(msg)
-        server.quit()
+        # Отправляем письмо через уже авторизованную сессию
+        if mailer is None:
+            with create_mailer(config, sender_email, sender_password) as single:
+                single.send(msg)
+        else:
+            mailer.send(msg)
 
         return True
 
@@ -258,6 +316,159 @@ def send_email_simple(
         return False
 
 
+async def send_invitations_async(
+    outbox, sender_email, sender_password, config, mailer, concurrency, on_sent=None
+):
+    """Отправляет письма параллельно, не более concurrency одновременно
+
+    outbox - список (email, fio, paper_title, pdf_path, pdf_data). Каждая отправка
+    выполняется в своем потоке через общий пул SMTP сессий, поэтому
+    несколько сессий передают письма одновременно. on_sent(номер письма
+    в outbox) вызывается сразу после его отправки, например чтобы
+    записать ее в журнал до окончания всей рассылки. Возвращает список
+    (email, успех) в порядке outbox.
+    """
+    loop = asyncio.get_running_loop()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+
+        async def send_one(position, email, fio, paper_title, pdf_path, pdf_data):
+            sent = await loop.run_in_executor(
+                executor,
+                send_email_simple,
+                sender_email,
+                sender_password,
+                email,
+                fio,
+                paper_title,
+                pdf_path,
+                config,
+                mailer,
+                pdf_data,
+            )
+            if sent:
+                if on_sent is not None:
+                    on_sent(position)
+                print(f"   Письмо отправлено: {email}")
+            else:
+                print(f"   Ошибка отправки письма: {email}")
+            return email, sent
+
+        return await asyncio.gather(
+            *(send_one(position, *item) for position, item in enumerate(outbox))
+        )
+
+
+def run_invitation_pipeline(
+    tasks,
+    template_file,
+    output_dir,
+    converter,
+    mailer,
+    sender_email,
+    sender_password,
+    config,
+    cleanup_docx=True,
+    renderer="docx",
+    in_memory=False,
+    archive_pdf=True,
+    ledger=None,
+):
+    """Обрабатывает приглашения потоковым конвейером
+
+    Заполнение шаблона, конвертация в PDF и отправка письма идут
+    одновременно: пока одно приглашение конвертируется, следующее уже
+    заполняется, а предыдущее отправляется. Число потоков каждого этапа
+    и размер очередей между ними задаются в секции [pipeline].
+    Возвращает список PipelineResult в порядке tasks.
+    """
+
+    def render(task):
+        print(f"Обрабатываем: {task.fio}")
+        if task.resumed:
+            return task
+        if in_memory:
+            task.docx_data = render_invitation_bytes(
+                template_file, task.fio, task.paper_title, renderer
+            )
+        else:
+            task.docx_path = render_invitation_docx(
+                template_file, output_dir, task.fio, task.paper_title, renderer
+            )
+        if ledger is not None:
+            ledger.mark(task.email, task.key, "rendered", task.docx_path)
+        return task
+
+    def convert(task):
+        if task.resumed:
+            print(f"   PDF из прошлого запуска: {describe_pdf(task.pdf_path)}")
+            return task
+        if in_memory:
+            task.pdf_data = convert_invitation_bytes(
+                task.docx_data, task.fio, converter
+            )
+            task.docx_data = None
+            if task.pdf_data and archive_pdf:
+                task.pdf_path = archive_invitation_pdf(
+                    output_dir, task.fio, task.pdf_data
+                )
+            elif task.pdf_data and ledger is not None:
+                task.pdf_path = ledger.store_pdf(task.email, task.key, task.pdf_data)
+            created = task.pdf_data is not None
+        else:
+            task.pdf_path = convert_invitation(
+                task.docx_path, converter, cleanup_docx
+            )
+            created = task.pdf_path is not None
+        if not created:
+            raise RuntimeError("Ошибка создания PDF")
+        if ledger is not None:
+            ledger.mark(task.email, task.key, "converted", task.pdf_path)
+        print(f"   PDF создан: {describe_pdf(task.pdf_path)}")
+        return task
+
+    def send(task):
+        if not send_email_simple(
+            sender_email,
+            sender_password,
+            task.email,
+            task.fio,
+            task.paper_title,
+            task.pdf_path,
+            config,
+            mailer,
+            task.pdf_data,
+        ):
+            raise RuntimeError("Ошибка отправки письма")
+        if ledger is not None:
+            ledger.mark(task.email, task.key, "sent")
+        print(f"   Письмо отправлено: {task.email}")
+        # Отправленный PDF больше не нужен, освобождаем память
+        task.pdf_data = None
+        return task
+
+    stages = [
+        PipelineStage(
+            "render", render, config.getint("pipeline", "render_workers", fallback=1)
+        ),
+        PipelineStage(
+            "convert",
+            convert,
+            config.getint("pipeline", "convert_workers", fallback=1),
+        ),
+        PipelineStage(
+            "send", send, config.getint("pipeline", "send_workers", fallback=2)
+        ),
+    ]
+    queue_size = config.getint("pipeline", "queue_size", fallback=8)
+    return run_pipeline(tasks, stages, queue_size)
+
+
+def describe_pdf(pdf_path):
+    """Возвращает имя PDF для вывода (или пометку, что он только в памяти)"""
+    return os.path.basename(pdf_path) if pdf_path else "в памяти"
+
+
 def wait_for_keypress():
     """Ожидает нажатия любой клавиши перед закрытием консоли"""
     print("\n" + "=" * 80)
@@ -270,26 +481,276 @@ def wait_for_keypress():
         input()
 
 
+def process_invitations(config, participants, converter, send=True):
+    """Создает приглашения участникам и рассылает их
+
+    participants - список Participant, converter - общий пул конвертеров.
+    При send=False создаются только PDF приглашений (письма не отправляются).
+    """
+    # Получаем настройки обработки
+    cleanup_docx = config.getboolean("processing", "cleanup_docx", fallback=True)
+    renderer = config.get("processing", "renderer", fallback="docx")
+    if renderer == "overlay":
+        # Наложение на PDF используется для сертификатов и дипломов,
+        # приглашения заполняются в DOCX
+        renderer = "docx"
+    in_memory = config.getboolean("processing", "in_memory", fallback=False)
+    archive_pdf = config.getboolean("processing", "archive_pdf", fallback=True)
+    async_send = send and config.getboolean("email", "async_send", fallback=False)
+    concurrency = max(1, config.getint("email", "concurrency", fallback=4))
+    use_pipeline = send and config.getboolean("pipeline", "enabled", fallback=False)
+    send_workers = max(1, config.getint("pipeline", "send_workers", fallback=2))
+
+    print(
+        f"Настройки обработки: Удаление DOCX: {'Да' if cleanup_docx else 'Нет'}, Заполнение шаблонов: {renderer}"
+    )
+    if in_memory:
+        print(
+            f"Обработка в памяти: Да, Сохранение PDF: {'Да' if archive_pdf else 'Нет'}"
+        )
+    if not send:
+        # Без рассылки PDF нужно сохранить, иначе их некуда передать
+        archive_pdf = True
+        print("Рассылка отключена: создаются только PDF приглашений")
+
+    template_file = get_external_file_path(config.get("files", "invitation_template"))
+    sender_email = config.get("email", "sender_email")
+    sender_password = config.get("email", "sender_password")
+    output_dir = get_external_file_path(config.get("paths", "output_dir"))
+
+    mailer = None
+    ledger = None
+    try:
+        # SMTP сессии открываются один раз на всю рассылку
+        if send:
+            if use_pipeline:
+                sessions = send_workers
+            elif async_send:
+                sessions = concurrency
+            else:
+                sessions = None
+            mailer = create_mailer(config, sender_email, sender_password, sessions)
+            print(
+                f"SMTP сессий: {mailer.sessions}, Ограничение отправки: {mailer.limiter.describe()}"
+            )
+
+        # Журнал рассылки: при повторном запуске отправленные письма пропускаются.
+        # Письмо считается новым, если изменились шаблоны или данные участника
+        ledger = open_ledger(config, output_dir)
+        templates_digest = content_hash(
+            file_digest(template_file),
+            file_digest(get_external_file_path(config.get("files", "email_template"))),
+        )
+
+        # Счетчики
+        pdf_created = 0
+        emails_sent = 0
+        emails_failed = 0
+        errors = 0
+        already_sent = 0
+
+        # При асинхронной отправке письма копятся здесь и уходят параллельно
+        outbox = []
+        outbox_keys = []
+
+        # В режиме конвейера строки сначала собираются, затем обрабатываются
+        tasks = []
+
+        print("Начинаем обработку...")
+
+        # Значения подготовлены сразу для всей таблицы
+        with profiling.stage("invitations"):
+            for participant in participants:
+                index = participant.index
+                fio = participant.fio
+                paper_title = participant.paper_title
+                email = participant.email
+                try:
+                    # Пропускаем пустые строки
+                    if not participant.complete:
+                        print(f"Строка {index+1}: пропущена (неполные данные)")
+                        errors += 1
+                        continue
+
+                    key = content_hash(templates_digest, fio, paper_title)
+                    if ledger.is_sent(email, key):
+                        already_sent += 1
+                        print(f"Строка {index+1}: уже отправлено ранее ({email})")
+                        continue
+                    resumed_pdf = ledger.converted_pdf(email, key)
+
+                    if use_pipeline:
+                        task = InvitationTask(index + 1, fio, paper_title, email, key)
+                        if resumed_pdf:
+                            task.resumed = True
+                            task.pdf_path = resumed_pdf
+                        tasks.append(task)
+                        continue
+
+                    print(f"Обрабатываем: {fio}")
+
+                    # Создаем персонализированное приглашение в PDF
+                    pdf_data = None
+                    if resumed_pdf:
+                        pdf_path = resumed_pdf
+                        created = True
+                    elif in_memory:
+                        docx_data = render_invitation_bytes(
+                            template_file, fio, paper_title, renderer
+                        )
+                        ledger.mark(email, key, "rendered")
+                        pdf_data = convert_invitation_bytes(docx_data, fio, converter)
+                        pdf_path = None
+                        if pdf_data and archive_pdf:
+                            pdf_path = archive_invitation_pdf(output_dir, fio, pdf_data)
+                        elif pdf_data:
+                            # Без копии в output_dir PDF хранится в папке журнала,
+                            # чтобы повторный запуск не создавал его заново
+                            pdf_path = ledger.store_pdf(email, key, pdf_data)
+                        created = pdf_data is not None
+                    else:
+                        docx_path = render_invitation_docx(
+                            template_file, output_dir, fio, paper_title, renderer
+                        )
+                        ledger.mark(email, key, "rendered", docx_path)
+                        pdf_path = convert_invitation(
+                            docx_path, converter, cleanup_docx
+                        )
+                        created = bool(pdf_path) and os.path.exists(pdf_path)
+
+                    if created:
+                        if resumed_pdf:
+                            print(
+                                f"   PDF из прошлого запуска: {describe_pdf(pdf_path)}"
+                            )
+                        else:
+                            pdf_created += 1
+                            ledger.mark(email, key, "converted", pdf_path)
+                            print(f"   PDF создан: {describe_pdf(pdf_path)}")
+
+                        if not send:
+                            continue
+
+                        if async_send:
+                            outbox.append((email, fio, paper_title, pdf_path, pdf_data))
+                            outbox_keys.append(key)
+
+                        # Отправляем письмо упрощенным способом
+                        elif send_email_simple(
+                            sender_email,
+                            sender_password,
+                            email,
+                            fio,
+                            paper_title,
+                            pdf_path,
+                            config,
+                            mailer,
+                            pdf_data,
+                        ):
+                            emails_sent += 1
+                            ledger.mark(email, key, "sent")
+                            print(f"   Письмо отправлено: {email}")
+                        else:
+                            emails_failed += 1
+                            print(f"   Ошибка отправки письма")
+
+                    else:
+                        errors += 1
+                        print(f"   Ошибка создания PDF")
+
+                except Exception as e:
+                    errors += 1
+                    print(f"Ошибка обработки строки {index+1}: {e}")
+
+        if tasks:
+            print(f"\nКонвейерная обработка {len(tasks)} приглашений...")
+            with profiling.stage("invitations_pipeline"):
+                results = run_invitation_pipeline(
+                    tasks,
+                    template_file,
+                    output_dir,
+                    converter,
+                    mailer,
+                    sender_email,
+                    sender_password,
+                    config,
+                    cleanup_docx,
+                    renderer,
+                    in_memory,
+                    archive_pdf,
+                    ledger,
+                )
+            for task, failed_stage, error in results:
+                if failed_stage in (None, "send") and not task.resumed:
+                    pdf_created += 1
+                if failed_stage is None:
+                    emails_sent += 1
+                elif failed_stage == "send":
+                    emails_failed += 1
+                    print(f"Строка {task.row_number}: {error}")
+                else:
+                    errors += 1
+                    print(f"Ошибка обработки строки {task.row_number}: {error}")
+
+        if outbox:
+            print(
+                f"\nАсинхронная отправка {len(outbox)} писем, одновременно до {concurrency}..."
+            )
+            with profiling.stage("invitations_async_send"):
+                results = asyncio.run(
+                    send_invitations_async(
+                        outbox,
+                        sender_email,
+                        sender_password,
+                        config,
+                        mailer,
+                        concurrency,
+                        # Каждое письмо отмечается в журнале сразу после
+                        # отправки, чтобы прерванный запуск не повторял его
+                        lambda position: ledger.mark(
+                            outbox[position][0], outbox_keys[position], "sent"
+                        ),
+                    )
+                )
+            for email, sent in results:
+                if sent:
+                    emails_sent += 1
+                else:
+                    emails_failed += 1
+
+        # Итоги
+        invitations_dir = os.path.join(output_dir, "Приглашения")
+        print(f"\n{'='*80}")
+        print("ИТОГИ РАССЫЛКИ:" if send else "ИТОГИ ПОДГОТОВКИ ПРИГЛАШЕНИЙ:")
+        print(f"   Создано PDF файлов: {pdf_created}")
+        print(f"   Успешно отправлено: {emails_sent}")
+        print(f"   Не отправлено: {emails_failed}")
+        print(f"   Ошибок обработки: {errors}")
+        print(f"   Пропущено (отправлено ранее): {already_sent}")
+        print(f"   Всего участников: {len(participants)}")
+        print(f"   Удаление DOCX: {'Включено' if cleanup_docx else 'Отключено'}")
+        print(f"   PDF файлы сохранены в: {invitations_dir}")
+        print(f"{'='*80}")
+
+    finally:
+        if mailer is not None:
+            mailer.close()
+        if ledger is not None:
+            ledger.close()
+
+
 def main():
     """Основная функция"""
     print("=" * 80)
     print("    РАССЫЛКА ПРИГЛАШЕНИЙ")
     print("=" * 80)
 
+    output_dir = None
+    converter = None
     try:
         # Загружаем конфигурацию
         config = load_config()
 
-        # Получаем настройки обработки
-        cleanup_docx = config.getboolean("processing", "cleanup_docx", fallback=True)
-        delay_between_files = config.getint(
-            "processing", "delay_between_files", fallback=2
-        )
-
-        print(
-            f"Настройки обработки: Удаление DOCX: {'Да' if cleanup_docx else 'Нет'}, Задержка: {delay_between_files} сек"
-        )
-
         # Проверяем наличие файлов
         missing_files = check_required_files(config)
         if missing_files:
@@ -297,7 +758,6 @@ def main():
             for file in missing_files:
                 print(f"   - {file}")
             print(f"Убедитесь, что файлы находятся в папке: {get_script_directory()}")
-            wait_for_keypress()
             return
 
         # Получаем полные пути к файлам
@@ -305,9 +765,10 @@ def main():
         template_file = get_external_file_path(
             config.get("files", "invitation_template")
         )
-        sender_email = config.get("email", "sender_email")
-        sender_password = config.get("email", "sender_password")
+
         output_dir = get_external_file_path(config.get("paths", "output_dir"))
+        # Профилирование этапов включается аргументом --profile или в [profiling]
+        profiling.start(config, output_dir, "e_mail_sender")
 
         print(f"Рабочая директория: {get_script_directory()}")
         print(f"Excel файл: {excel_file}")
@@ -315,104 +776,43 @@ def main():
 
         # Читаем Excel файл
         print(f"Читаем файл: {excel_file}")
-        df = pd.read_excel(excel_file)
+        df = load_roster(
+            excel_file,
+            INVITATION_COLUMNS,
+            config.getboolean("processing", "roster_cache", fallback=True),
+        )
         print(f"Найдено {len(df)} участников")
 
         # Проверяем колонки
-        required_columns = ["ФИО участника", "Название доклада", "e-mail"]
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        missing_columns = missing_invitation_columns(df)
         if missing_columns:
             print(f"В файле отсутствуют колонки: {missing_columns}")
             print(f"   Найдены колонки: {list(df.columns)}")
-            wait_for_keypress()
             return
 
-        # Счетчики
-        pdf_created = 0
-        emails_sent = 0
-        emails_failed = 0
-        errors = 0
-
-        print("Начинаем обработку...")
-
-        for index, row in df.iterrows():
-            try:
-                # Извлекаем данные
-                fio = (
-                    str(row["ФИО участника"]).strip()
-                    if pd.notna(row["ФИО участника"])
-                    else ""
-                )
-                paper_title = (
-                    str(row["Название доклада"]).strip()
-                    if pd.notna(row["Название доклада"])
-                    else ""
-                )
-                email = str(row["e-mail"]).strip() if pd.notna(row["e-mail"]) else ""
-
-                # Пропускаем пустые строки
-                if not all([fio, paper_title, email]):
-                    print(f"Строка {index+1}: пропущена (неполные данные)")
-                    errors += 1
-                    continue
-
-                print(f"Обрабатываем: {fio}")
-
-                # Создаем персонализированное приглашение в PDF
-                pdf_path = create_personalized_invitation(
-                    template_file, output_dir, fio, paper_title, cleanup_docx
-                )
-
-                if pdf_path and os.path.exists(pdf_path):
-                    pdf_created += 1
-                    print(f"   PDF создан: {os.path.basename(pdf_path)}")
-
-                    # Отправляем письмо упрощенным способом
-                    if send_email_simple(
-                        sender_email,
-                        sender_password,
-                        email,
-                        fio,
-                        paper_title,
-                        pdf_path,
-                        config,
-                    ):
-                        emails_sent += 1
-                        print(f"   Письмо отправлено: {email}")
-                    else:
-                        emails_failed += 1
-                        print(f"   Ошибка отправки письма")
-
-                    # Задержка между отправками
-                    if delay_between_files > 0 and index < len(df) - 1:
-                        time.sleep(delay_between_files)
-
-                else:
-                    errors += 1
-                    print(f"   Ошибка создания PDF")
-
-            except Exception as e:
-                errors += 1
-                print(f"Ошибка обработки строки {index+1}: {e}")
-
-        # Итоги
-        invitations_dir = os.path.join(output_dir, "Приглашения")
-        print(f"\n{'='*80}")
-        print("ИТОГИ РАССЫЛКИ:")
-        print(f"   Создано PDF файлов: {pdf_created}")
-        print(f"   Успешно отправлено: {emails_sent}")
-        print(f"   Не отправлено: {emails_failed}")
-        print(f"   Ошибок обработки: {errors}")
-        print(f"   Всего участников: {len(df)}")
-        print(f"   Удаление DOCX: {'Включено' if cleanup_docx else 'Отключено'}")
-        print(f"   PDF файлы сохранены в: {invitations_dir}")
-        print(f"{'='*80}")
+        # Конвертер запускается один раз на всю рассылку
+        converter = create_converter(config)
+        process_invitations(config, prepare_participants(df), converter)
 
     except Exception as e:
         print(f"Ошибка: {e}")
+    finally:
+        if converter is not None:
+            converter.close()
+        # Отчеты о времени пишутся при любом завершении, в том числе при ошибке
+        if output_dir is not None:
+            try:
+                report_path = metrics.write_reports(config, output_dir, "e_mail_sender")
+                if report_path:
+                    print(f"Отчет о времени этапов: {report_path}")
+            except Exception as e:
+                print(f"Не удалось сохранить отчет о времени этапов: {e}")
+        profile_dir = profiling.finish()
+        if profile_dir:
+            print(f"Профили этапов: {profile_dir}")
 
-    # Ожидаем нажатия клавиши перед закрытием
-    wait_for_keypress()
+        # Ожидаем нажатия клавиши перед закрытием
+        wait_for_keypress()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,23 @@
+import hashlib
+
+
+def file_digest(path):
+    """Возвращает SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_hash(*parts):
+    """Возвращает SHA-256 набора значений
+
+    Значения приводятся к строкам и разделяются нулевым байтом, поэтому
+    ("ab", "c") и ("a", "bc") дают разные хеши.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
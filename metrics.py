@@ -0,0 +1,262 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Границы корзин гистограммы длительности одной операции, секунды
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Префикс имен метрик в файле для Prometheus
+PROMETHEUS_PREFIX = "conference"
+
+
+class StageStats:
+    """Накопленная статистика одного этапа: число операций, ошибок и длительности"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        # Границы работы этапа по часам, для расчета пропускной способности
+        self.first_start = None
+        self.last_end = None
+
+    def observe(self, seconds, count=1, errors=0, end=None):
+        """Добавляет операцию длительностью seconds
+
+        count > 1 означает пакет из count документов: в гистограмму
+        попадает средняя длительность одного документа.
+        """
+        end = time.time() if end is None else end
+        count = max(1, count)
+        per_item = seconds / count
+        self.count += count
+        self.errors += errors
+        self.total += seconds
+        self.min = per_item if self.min is None else min(self.min, per_item)
+        self.max = max(self.max, per_item)
+        self.buckets[bisect.bisect_left(BUCKETS, per_item)] += count
+        start = end - seconds
+        if self.first_start is None or start < self.first_start:
+            self.first_start = start
+        if self.last_end is None or end > self.last_end:
+            self.last_end = end
+
+    def merge(self, other):
+        """Добавляет статистику, собранную в другом процессе"""
+        self.count += other.count
+        self.errors += other.errors
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        if other.first_start is not None and (
+            self.first_start is None or other.first_start < self.first_start
+        ):
+            self.first_start = other.first_start
+        if other.last_end is not None and (
+            self.last_end is None or other.last_end > self.last_end
+        ):
+            self.last_end = other.last_end
+
+    def throughput(self):
+        """Операций в секунду за время от первой до последней операции этапа"""
+        if self.first_start is None or self.last_end <= self.first_start:
+            return 0.0
+        return self.count / (self.last_end - self.first_start)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_seconds": round(self.total, 6),
+            "mean_seconds": round(self.total / self.count, 6) if self.count else 0.0,
+            "min_seconds": round(self.min or 0.0, 6),
+            "max_seconds": round(self.max, 6),
+            "throughput_per_second": round(self.throughput(), 3),
+            "histogram": {
+                _bucket_label(index): count
+                for index, count in enumerate(self.buckets)
+            },
+        }
+
+
+def _bucket_label(index):
+    return str(BUCKETS[index]) if index < len(BUCKETS) else "+Inf"
+
+
+class MetricsRegistry:
+    """Статистика этапов одного запуска программы
+
+    Потокобезопасна: этапы могут выполняться в разных потоках конвейера.
+    Статистику из процессов-исполнителей передают через drain() и merge().
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, count=1, errors=0):
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = StageStats()
+            stats.observe(seconds, count, errors)
+
+    @contextmanager
+    def timer(self, stage, count=1):
+        """Измеряет длительность блока, исключение считается ошибкой этапа"""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(stage, time.perf_counter() - start, count, errors=count)
+            raise
+        self.observe(stage, time.perf_counter() - start, count)
+
+    def drain(self):
+        """Возвращает накопленную статистику и начинает сбор заново"""
+        with self._lock:
+            stages = self._stages
+            self._stages = {}
+        return stages
+
+    def merge(self, stages):
+        with self._lock:
+            for stage, other in stages.items():
+                stats = self._stages.get(stage)
+                if stats is None:
+                    stats = self._stages[stage] = StageStats()
+                stats.merge(other)
+
+    def report(self, program):
+        """Отчет в виде словаря для JSON"""
+        finished = time.time()
+        with self._lock:
+            stages = sorted(
+                self._stages.items(), key=lambda item: item[1].first_start or 0
+            )
+            return {
+                "program": program,
+                "started": _timestamp(self.started),
+                "finished": _timestamp(finished),
+                "duration_seconds": round(finished - self.started, 3),
+                "stages": {stage: stats.to_dict() for stage, stats in stages},
+            }
+
+    def prometheus(self, program):
+        """Отчет в текстовом формате Prometheus (для textfile collector)"""
+        report = self.report(program)
+        name = f"{PROMETHEUS_PREFIX}_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Длительность операции этапа",
+            f"# TYPE {name} histogram",
+        ]
+        for stage, stats in report["stages"].items():
+            labels = f'program="{program}",stage="{stage}"'
+            cumulative = 0
+            for le, count in stats["histogram"].items():
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {stats['total_seconds']}")
+            lines.append(f"{name}_count{{{labels}}} {stats['count']}")
+
+        for metric, key, kind, description in (
+            ("stage_errors_total", "errors", "counter", "Число ошибок этапа"),
+            (
+                "stage_throughput_per_second",
+                "throughput_per_second",
+                "gauge",
+                "Операций этапа в секунду",
+            ),
+        ):
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}_{metric} {description}")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{metric} {kind}")
+            for stage, stats in report["stages"].items():
+                lines.append(
+                    f'{PROMETHEUS_PREFIX}_{metric}{{program="{program}",stage="{stage}"}}'
+                    f" {stats[key]}"
+                )
+
+        name = f"{PROMETHEUS_PREFIX}_run_duration_seconds"
+        lines.append(f"# HELP {name} Длительность запуска программы")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f'{name}{{program="{program}"}} {report["duration_seconds"]}')
+        return "\n".join(lines) + "\n", report
+
+
+def _timestamp(value):
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(value))
+
+
+def _write_atomic(path, text):
+    # Prometheus не должен прочитать наполовину записанный файл
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(text)
+    os.replace(temp_path, path)
+
+
+# Общая статистика процесса, в нее пишут все модули
+_registry = MetricsRegistry()
+
+
+def observe(stage, seconds, count=1, errors=0):
+    """Добавляет в статистику этапа уже измеренную операцию"""
+    _registry.observe(stage, seconds, count, errors)
+
+
+def timer(stage, count=1):
+    """Контекстный менеджер для измерения блока кода как операции этапа"""
+    return _registry.timer(stage, count)
+
+
+def timed(stage):
+    """Декоратор: каждый вызов функции считается операцией этапа"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _registry.timer(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def drain():
+    return _registry.drain()
+
+
+def merge(stages):
+    _registry.merge(stages)
+
+
+def write_reports(config, output_dir, program):
+    """Сохраняет отчет о запуске в JSON и в файл для Prometheus
+
+    Настройки - секция [metrics]. Возвращает путь к JSON отчету или None,
+    если отчеты отключены.
+    """
+    if not config.getboolean("metrics", "enabled", fallback=True):
+        return None
+    directory = os.path.join(
+        output_dir, config.get("metrics", "directory", fallback="metrics")
+    )
+    os.makedirs(directory, exist_ok=True)
+
+    text, report = _registry.prometheus(program)
+    json_path = os.path.join(directory, f"{program}.json")
+    _write_atomic(json_path, json.dumps(report, ensure_ascii=False, indent=2))
+    _write_atomic(os.path.join(directory, f"{program}.prom"), text)
+    return json_path
@@ -0,0 +1,149 @@
+import os
+import shutil
+import threading
+
+from hashing import content_hash, file_digest
+
+
+def pdf_path_for(docx_path):
+    """Путь к PDF, который конвертер создает для DOCX"""
+    return os.path.splitext(docx_path)[0] + ".pdf"
+
+
+class PdfCache:
+    """Кэш готовых PDF, адресуемый по содержимому документа
+
+    Ключ - хеш файла шаблона, значений подстановок и версии конвертера,
+    поэтому после правки одной строки таблицы заново заполняется и
+    конвертируется только она. Размер кэша ограничен max_bytes: при
+    превышении удаляются давно не использованные файлы (LRU по времени
+    последнего обращения).
+    """
+
+    def __init__(self, directory, max_bytes=0, version="", overlay=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version
+        # При заполнении наложением в ключ входят и настройки наложения шаблона
+        self.overlay = overlay
+        self.hits = 0
+        self.misses = 0
+        self._digests = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _template_digest(self, template_path):
+        """Хеш шаблона, пересчитывается только при изменении файла"""
+        stat = os.stat(template_path)
+        signature = (os.path.abspath(template_path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            digest = self._digests.get(signature)
+        if digest is None:
+            digest = file_digest(template_path)
+            with self._lock:
+                self._digests[signature] = digest
+        return digest
+
+    def key(self, template_path, replacements):
+        """Возвращает ключ документа по шаблону и значениям подстановок"""
+        parts = [self.version, self._template_digest(template_path)]
+        if self.overlay is not None:
+            parts.append(self.overlay.digest(template_path))
+        for placeholder, value in sorted(replacements.items()):
+            parts.extend((placeholder, value))
+        return content_hash(*parts)
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.pdf")
+
+    def fetch(self, key, pdf_path):
+        """Копирует PDF из кэша в pdf_path, возвращает True при попадании"""
+        entry = self._entry_path(key)
+        try:
+            shutil.copyfile(entry, pdf_path)
+            # Время обращения определяет порядок вытеснения
+            os.utime(entry)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key, pdf_path):
+        """Сохраняет созданный PDF в кэш"""
+        entry = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        temp_path = f"{entry}.{threading.get_ident()}.tmp"
+        shutil.copyfile(pdf_path, temp_path)
+        os.replace(temp_path, entry)
+
+    def restore(self, jobs):
+        """Восстанавливает из кэша PDF для заданий на заполнение
+
+        Возвращает множество output_path восстановленных заданий и словарь
+        {output_path: ключ} для остальных, чтобы сохранить их PDF после
+        конвертации.
+        """
+        restored = set()
+        keys = {}
+        for job in jobs:
+            key = self.key(job.template_path, job.replacements)
+            if self.fetch(key, pdf_path_for(job.output_path)):
+                restored.add(job.output_path)
+            else:
+                keys[job.output_path] = key
+        return restored, keys
+
+    def evict(self):
+        """Удаляет давно не использованные PDF сверх max_bytes, возвращает их число"""
+        if self.max_bytes <= 0:
+            return 0
+
+        entries = []
+        total = 0
+        for root, dirs, files in os.walk(self.directory):
+            for file in files:
+                path = os.path.join(root, file)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+def create_pdf_cache(
+    config, output_dir, converter_name="", renderer="docx", overlay=None
+):
+    """Создает кэш PDF по секции [cache] конфигурации (или None, если он отключен)
+
+    В версию ключа входят конвертер и способ заполнения шаблонов, а также
+    [cache] converter_version, которую стоит менять после обновления
+    Word или LibreOffice. overlay - заполнение наложением (OverlayRenderer),
+    его поля, шрифт и фон шаблона тоже входят в ключ.
+    """
+    if not config.getboolean("cache", "enabled", fallback=True):
+        return None
+    directory = config.get("cache", "directory", fallback="pdf_cache")
+    max_size_mb = config.getint("cache", "max_size_mb", fallback=500)
+    converter_version = config.get("cache", "converter_version", fallback="")
+    return PdfCache(
+        os.path.join(output_dir, directory),
+        max_size_mb * 1024 * 1024,
+        version=f"{converter_name}:{converter_version}:{renderer}",
+        overlay=overlay,
+    )
@@ -0,0 +1,574 @@
+import io
+import os
+import queue
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from rate_limit import RateLimiter, create_rate_limiter
+
+
+class ConversionError(Exception):
+    """Ошибка конвертации DOCX в PDF"""
+
+
+def memory_temp_dir():
+    """Папка для временных файлов в оперативной памяти (tmpfs)
+
+    На Linux это /dev/shm, на остальных системах - обычная временная папка.
+    """
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+class ConverterWorker:
+    """Долгоживущий исполнитель конвертации (один экземпляр Word/LibreOffice)"""
+
+    def start(self):
+        """Запускает исполнителя"""
+
+    def stop(self):
+        """Останавливает исполнителя"""
+
+    def is_alive(self):
+        """Проверяет, что исполнитель готов принимать документы"""
+        return True
+
+    def is_failure(self, error):
+        """Отличает сбой исполнителя от ошибки в самом документе
+
+        Сбой (процесс завершился, нет связи, истекло время ожидания)
+        устраняется перезапуском исполнителя. Ошибка документа повторилась
+        бы и с новым исполнителем, поэтому перезапуск для нее не нужен.
+        """
+        return isinstance(error, (ConnectionError, TimeoutError)) or not self.is_alive()
+
+    def convert(self, docx_path, pdf_path):
+        """Конвертирует один документ"""
+        raise NotImplementedError
+
+    def convert_bytes(self, docx_data):
+        """Конвертирует DOCX из памяти и возвращает содержимое PDF
+
+        Исполнителям, которым нужен путь к файлу, документ передается
+        через временную папку в оперативной памяти.
+        """
+        with tempfile.TemporaryDirectory(dir=memory_temp_dir()) as temp_dir:
+            docx_path = os.path.join(temp_dir, "document.docx")
+            pdf_path = os.path.join(temp_dir, "document.pdf")
+            with open(docx_path, "wb") as file:
+                file.write(docx_data)
+            self.convert(docx_path, pdf_path)
+            with open(pdf_path, "rb") as file:
+                return file.read()
+
+    def convert_many(self, pairs):
+        """Конвертирует пакет документов и возвращает ошибки по каждому
+
+        pairs - список (docx_path, pdf_path), результат - список текстов
+        ошибок в том же порядке (None для успешно сконвертированных).
+        """
+        errors = []
+        for docx_path, pdf_path in pairs:
+            try:
+                self.convert(docx_path, pdf_path)
+                errors.append(None)
+            except Exception as e:
+                errors.append(str(e))
+        return errors
+
+
+class WordWorker(ConverterWorker):
+    """Экземпляр Microsoft Word, управляемый через COM (только Windows)
+
+    Объект Word принадлежит апартаменту COM создавшего его потока, а
+    конвертацию вызывают разные потоки (пулы convert_batch и общей
+    конвертации). Поэтому у каждого экземпляра свой поток: он создает
+    Word и выполняет все обращения к нему, остальные потоки передают
+    вызовы через очередь и ждут результата не дольше call_timeout секунд.
+    """
+
+    def __init__(self, call_timeout=300):
+        self.call_timeout = call_timeout
+        self.word = None
+        self._calls = None
+        self._thread = None
+
+    def _serve(self, calls, comtypes):
+        """Поток экземпляра: однопоточный апартамент COM и очередь вызовов"""
+        comtypes.CoInitialize()
+        try:
+            while True:
+                call = calls.get()
+                if call is None:
+                    break
+                function, result = call
+                try:
+                    result.put((function(), None))
+                except Exception as e:
+                    result.put((None, e))
+        finally:
+            comtypes.CoUninitialize()
+
+    def _call(self, function, timeout=None):
+        """Выполняет function() в потоке экземпляра и возвращает результат"""
+        if self._thread is None or not self._thread.is_alive():
+            raise ConversionError("Поток Word не запущен")
+        result = queue.Queue(maxsize=1)
+        self._calls.put((function, result))
+        try:
+            value, error = result.get(timeout=timeout or self.call_timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                f"Word не ответил за {timeout or self.call_timeout} сек"
+            ) from None
+        if error is not None:
+            raise error
+        return value
+
+    def start(self):
+        # Импорт здесь, чтобы без comtypes ошибка возникла сразу
+        import comtypes
+
+        self._calls = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._serve,
+            args=(self._calls, comtypes),
+            name="word",
+            daemon=True,
+        )
+        self._thread.start()
+        self._call(self._create)
+
+    def _create(self):
+        from comtypes import client
+
+        self.word = client.CreateObject("Word.Application")
+        self.word.Visible = False
+        self.word.DisplayAlerts = 0
+
+    def _quit(self):
+        if self.word is not None:
+            self.word.Quit()
+            self.word = None
+
+    def stop(self):
+        if self._thread is None:
+            return
+        try:
+            self._call(self._quit, timeout=30)
+        except Exception:
+            # Зависший Word не закрывается, его поток завершится вместе с программой
+            pass
+        self._calls.put(None)
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def is_alive(self):
+        if self.word is None:
+            return False
+        try:
+            # Любое обращение к зависшему или закрытому Word вызывает ошибку
+            self._call(lambda: self.word.Documents.Count, timeout=30)
+            return True
+        except Exception:
+            return False
+
+    def _convert(self, docx_path, pdf_path):
+        doc = self.word.Documents.Open(os.path.abspath(docx_path), ReadOnly=True)
+        try:
+            doc.SaveAs(os.path.abspath(pdf_path), FileFormat=17)
+        finally:
+            doc.Close(False)
+
+    def convert(self, docx_path, pdf_path):
+        self._call(lambda: self._convert(docx_path, pdf_path))
+
+
+class LibreOfficeWorker(ConverterWorker):
+    """Фоновый LibreOffice, запущенный через unoserver"""
+
+    def __init__(self, port, uno_port, command="unoserver", startup_timeout=60):
+        self.port = port
+        self.uno_port = uno_port
+        self.command = command
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.client = None
+
+    def start(self):
+        from unoserver.client import UnoClient
+
+        self.process = subprocess.Popen(
+            [
+                self.command,
+                "--interface",
+                "127.0.0.1",
+                "--port",
+                str(self.port),
+                "--uno-port",
+                str(self.uno_port),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        # Ждем, пока сервер начнет принимать подключения
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise ConversionError(
+                    f"unoserver завершился при запуске (код {self.process.returncode})"
+                )
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=1):
+                    break
+            except OSError:
+                time.sleep(0.5)
+        else:
+            self.stop()
+            raise ConversionError(
+                f"unoserver не запустился за {self.startup_timeout} сек"
+            )
+
+        self.client = UnoClient(server="127.0.0.1", port=str(self.port))
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+        self.client = None
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def convert(self, docx_path, pdf_path):
+        self.client.convert(
+            inpath=os.path.abspath(docx_path),
+            outpath=os.path.abspath(pdf_path),
+            convert_to="pdf",
+        )
+
+    def convert_bytes(self, docx_data):
+        # unoserver принимает и возвращает содержимое файлов напрямую
+        return self.client.convert(indata=docx_data, convert_to="pdf")
+
+
+class Docx2PdfWorker(ConverterWorker):
+    """Прежний способ: docx2pdf запускает конвертер для каждого файла"""
+
+    def convert(self, docx_path, pdf_path):
+        from docx2pdf import convert
+
+        convert(docx_path, pdf_path)
+
+    def convert_many(self, pairs):
+        # docx2pdf конвертирует целую папку за один запуск Word,
+        # поэтому пакет собирается во временной папке
+        from docx2pdf import convert
+
+        errors = []
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_dir = os.path.join(temp_dir, "docx")
+            output_dir = os.path.join(temp_dir, "pdf")
+            os.makedirs(input_dir)
+            os.makedirs(output_dir)
+
+            for number, (docx_path, _) in enumerate(pairs):
+                shutil.copyfile(docx_path, os.path.join(input_dir, f"{number}.docx"))
+
+            convert(input_dir, output_dir)
+
+            for number, (docx_path, pdf_path) in enumerate(pairs):
+                converted_path = os.path.join(output_dir, f"{number}.pdf")
+                if os.path.exists(converted_path):
+                    shutil.move(converted_path, pdf_path)
+                    errors.append(None)
+                else:
+                    errors.append("PDF не создан")
+        return errors
+
+
+def count_docx_sections(docx_path):
+    """Возвращает число разделов документа (не меньше одного)
+
+    docx_path - путь к файлу или открытый двоичный поток.
+    """
+    with zipfile.ZipFile(docx_path) as archive:
+        xml = archive.read("word/document.xml")
+    return max(1, len(re.findall(rb"<w:sectPr\b", xml)))
+
+
+def build_placeholder_pdf(page_count):
+    """Создает простой PDF с заданным числом пустых страниц A4"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Дерево страниц заполняется после создания страниц
+    ]
+    page_numbers = []
+    for _ in range(page_count):
+        page_numbers.append(len(objects) + 1)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] >>")
+    kids = " ".join(f"{number} 0 R" for number in page_numbers)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>".encode()
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode()
+    output += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref_offset}\n%%EOF\n"
+    ).encode()
+    return bytes(output)
+
+
+class FakeWorker(ConverterWorker):
+    """Конвертер для тестов: без внешних программ создает PDF-заглушку
+
+    В PDF столько страниц, сколько разделов в документе, поэтому
+    объединение и разбиение PDF ведут себя как с настоящим конвертером.
+    """
+
+    def convert(self, docx_path, pdf_path):
+        pages = count_docx_sections(docx_path)
+        with open(pdf_path, "wb") as file:
+            file.write(build_placeholder_pdf(pages))
+
+    def convert_bytes(self, docx_data):
+        return build_placeholder_pdf(count_docx_sections(io.BytesIO(docx_data)))
+
+
+class PdfConverter:
+    """Пул долгоживущих исполнителей конвертации DOCX в PDF
+
+    Исполнители запускаются при первом обращении и используются повторно.
+    Перед каждой конвертацией исполнитель проверяется и при необходимости
+    перезапускается, а после recycle_after документов заменяется новым,
+    чтобы не накапливались утечки памяти Word/LibreOffice.
+    """
+
+    def __init__(
+        self,
+        worker_factory,
+        workers=1,
+        recycle_after=200,
+        batch_size=50,
+        name="",
+        limiter=None,
+    ):
+        self.worker_factory = worker_factory
+        self.workers = max(1, workers)
+        self.recycle_after = recycle_after
+        self.batch_size = max(1, batch_size)
+        self.name = name
+        self.limiter = limiter or RateLimiter()
+        self._idle = queue.LifoQueue()
+        self._documents = {}
+        self._lock = threading.Lock()
+        for index in range(self.workers):
+            self._idle.put((index, None))
+
+    def _acquire(self):
+        """Берет свободного исполнителя, при необходимости запуская его"""
+        index, worker = self._idle.get()
+        try:
+            if worker is not None and not worker.is_alive():
+                print(f"[ИНФО] Перезапуск конвертера {self.name} #{index + 1}")
+                worker.stop()
+                worker = None
+            if worker is None:
+                worker = self.worker_factory(index)
+                worker.start()
+                self._documents[index] = 0
+        except Exception:
+            self._idle.put((index, None))
+            raise
+        return index, worker
+
+    def _release(self, index, worker):
+        """Возвращает исполнителя в пул, заменяя его после recycle_after документов"""
+        if (
+            worker is not None
+            and self.recycle_after > 0
+            and self._documents[index] >= self.recycle_after
+        ):
+            worker.stop()
+            worker = None
+        self._idle.put((index, worker))
+
+    def _run(self, action, name):
+        """Выполняет action(worker), повторяя попытку после сбоя исполнителя
+
+        Ошибка в документе сразу вызывает ConversionError, исполнитель
+        остается в пуле. После сбоя исполнителя (см. is_failure) он
+        перезапускается, и документ конвертируется еще раз.
+        """
+        self.limiter.acquire()
+        for attempt in range(2):
+            index, worker = self._acquire()
+            try:
+                with metrics.timer("pdf_conversion"):
+                    result = action(worker)
+            except Exception as e:
+                if not worker.is_failure(e):
+                    self._documents[index] += 1
+                    self._release(index, worker)
+                    raise ConversionError(
+                        f"Не удалось конвертировать {name}: {e}"
+                    ) from e
+                # Исполнитель завис или завершился: останавливаем и пробуем с новым
+                worker.stop()
+                self._release(index, None)
+                if attempt == 1:
+                    raise ConversionError(
+                        f"Не удалось конвертировать {name}: {e}"
+                    ) from e
+            else:
+                self._documents[index] += 1
+                self._release(index, worker)
+                return result
+
+    def convert(self, docx_path, pdf_path):
+        """Конвертирует DOCX в PDF"""
+        self._run(
+            lambda worker: worker.convert(docx_path, pdf_path),
+            os.path.basename(docx_path),
+        )
+
+    def convert_bytes(self, docx_data, name="документ"):
+        """Конвертирует DOCX из памяти и возвращает содержимое PDF"""
+        return self._run(lambda worker: worker.convert_bytes(docx_data), name)
+
+    def _convert_chunk(self, chunk):
+        """Отдает пакет документов одному исполнителю"""
+        self.limiter.acquire(len(chunk))
+        try:
+            index, worker = self._acquire()
+        except Exception as e:
+            return [str(e)] * len(chunk)
+
+        start = time.perf_counter()
+        try:
+            errors = worker.convert_many(chunk)
+        except Exception as e:
+            metrics.observe(
+                "pdf_conversion", time.perf_counter() - start, len(chunk), len(chunk)
+            )
+            if worker.is_failure(e):
+                worker.stop()
+                worker = None
+            self._release(index, worker)
+            return [str(e)] * len(chunk)
+        # Ошибки отдельных документов пакета не вызывают исключения
+        metrics.observe(
+            "pdf_conversion",
+            time.perf_counter() - start,
+            len(chunk),
+            sum(error is not None for error in errors),
+        )
+
+        self._documents[index] += len(chunk)
+        self._release(index, worker)
+        return errors
+
+    def convert_batch(self, pairs, chunk_size=None):
+        """Конвертирует набор документов крупными пакетами
+
+        pairs - список (docx_path, pdf_path). Документы делятся на пакеты
+        по chunk_size (по умолчанию batch_size), пакеты распределяются между
+        исполнителями пула. Возвращает список (docx_path, pdf_path, ошибка)
+        в исходном порядке, ошибка равна None при успешной конвертации.
+        """
+        pairs = list(pairs)
+        chunk_size = chunk_size or self.batch_size
+        chunks = [pairs[i : i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+
+        if self.workers > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                chunk_errors = list(executor.map(self._convert_chunk, chunks))
+        else:
+            chunk_errors = [self._convert_chunk(chunk) for chunk in chunks]
+
+        results = []
+        for chunk, errors in zip(chunks, chunk_errors):
+            for (docx_path, pdf_path), error in zip(chunk, errors):
+                results.append((docx_path, pdf_path, error))
+        return results
+
+    def close(self):
+        """Останавливает всех исполнителей"""
+        with self._lock:
+            workers = []
+            while not self._idle.empty():
+                workers.append(self._idle.get_nowait())
+            for index, worker in workers:
+                if worker is not None:
+                    worker.stop()
+                self._idle.put((index, None))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Доступные способы конвертации ([converter] backend в config.ini)
+BACKENDS = ("word", "libreoffice", "docx2pdf", "fake")
+
+
+def default_backend():
+    """Word на Windows, LibreOffice на остальных системах"""
+    return "word" if sys.platform == "win32" else "libreoffice"
+
+
+def create_converter(config):
+    """Создает пул конвертеров по секции [converter] конфигурации"""
+    backend = config.get("converter", "backend", fallback="") or default_backend()
+    workers = config.getint("converter", "workers", fallback=1)
+    recycle_after = config.getint("converter", "recycle_after", fallback=200)
+    batch_size = config.getint("converter", "batch_size", fallback=50)
+
+    if backend == "word":
+        factory = lambda index: WordWorker()
+    elif backend == "libreoffice":
+        port = config.getint("converter", "unoserver_port", fallback=2003)
+        command = config.get("converter", "unoserver_command", fallback="unoserver")
+        factory = lambda index: LibreOfficeWorker(
+            port + 2 * index, port + 2 * index + 1, command
+        )
+    elif backend == "docx2pdf":
+        factory = lambda index: Docx2PdfWorker()
+    elif backend == "fake":
+        factory = lambda index: FakeWorker()
+    else:
+        raise ValueError(f"Неизвестный конвертер PDF: {backend}")
+
+    return PdfConverter(
+        factory,
+        workers,
+        recycle_after,
+        batch_size,
+        name=backend,
+        limiter=create_rate_limiter(config, "convert"),
+    )
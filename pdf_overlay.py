@@ -0,0 +1,421 @@
+import functools
+import hashlib
+import io
+import os
+import sys
+import threading
+from collections import namedtuple
+
+from PyPDF2 import PdfReader, PdfWriter
+
+import metrics
+from docx_templates import PLACEHOLDER_PATTERN, load_template, replace_placeholders
+from hashing import content_hash, file_digest
+from pdf_cache import pdf_path_for
+
+
+# Поле шаблона: левый край области и базовая линия первой строки в пунктах
+# от левого нижнего угла страницы, ширина области, наибольший размер шрифта,
+# выравнивание и наибольшее число строк
+OverlayField = namedtuple("OverlayField", ["x", "y", "width", "size", "align", "lines"])
+
+ALIGNMENTS = ("left", "center", "right")
+
+# Шрифты с кириллицей, которые ищутся, если в [overlay] font ничего не задано:
+# сначала шрифты Windows и macOS, затем распространенные шрифты Linux
+FONT_CANDIDATES = (
+    "times.ttf",
+    "Times New Roman.ttf",
+    "arial.ttf",
+    "Arial.ttf",
+    "DejaVuSerif.ttf",
+    "LiberationSerif-Regular.ttf",
+    "DejaVuSans.ttf",
+)
+
+
+def _require_reportlab():
+    """Проверяет, что установлен reportlab (нужен только для этого режима)"""
+    try:
+        import reportlab  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError(
+            "Для заполнения наложением нужен пакет reportlab: pip install reportlab"
+        ) from e
+
+
+def parse_field(value):
+    """Разбирает описание поля: x, y, ширина, размер[, выравнивание[, строк]]"""
+    parts = [part.strip() for part in value.split(",")]
+    if not 4 <= len(parts) <= 6:
+        raise ValueError(f"Неверное описание поля: {value}")
+    x, y, width, size = (float(part) for part in parts[:4])
+    align = parts[4].lower() if len(parts) > 4 else "center"
+    if align not in ALIGNMENTS:
+        raise ValueError(f"Неизвестное выравнивание: {align}")
+    lines = int(parts[5]) if len(parts) > 5 else 1
+    return OverlayField(x, y, width, size, align, max(1, lines))
+
+
+def wrap_text(text, font_name, size, width, max_lines):
+    """Разбивает текст по словам на строки не шире width
+
+    Возвращает список строк или None, если строк получается больше
+    max_lines или одно слово не помещается в строку.
+    """
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    lines = []
+    current = ""
+    for word in text.split():
+        candidate = f"{current} {word}" if current else word
+        if current and stringWidth(candidate, font_name, size) > width:
+            lines.append(current)
+            candidate = word
+        if stringWidth(candidate, font_name, size) > width:
+            return None
+        current = candidate
+    if current:
+        lines.append(current)
+    return lines if len(lines) <= max_lines else None
+
+
+def fit_text(text, font_name, field, min_size):
+    """Подбирает размер шрифта, при котором текст помещается в поле
+
+    Размер уменьшается от заданного в поле до min_size. Возвращает
+    (размер, строки). Если текст не помещается в поле и минимальным
+    шрифтом, возникает ValueError: документ с ним не создается, а в списке
+    ошибок видно, для какого поля нужно увеличить область.
+    """
+    size = field.size
+    while True:
+        lines = wrap_text(text, font_name, size, field.width, field.lines)
+        if lines is not None:
+            return size, lines
+        if size <= min_size:
+            raise ValueError(
+                f"Текст не помещается в поле ({field.lines} стр. шириной"
+                f" {field.width:g} пт) даже шрифтом {min_size:g}: {text}"
+            )
+        size = max(min_size, size - 0.5)
+
+
+def inline_placeholders(source):
+    """Плейсхолдеры шаблона, стоящие в одном параграфе с другим текстом
+
+    При создании фона плейсхолдер заменяется пустой строкой, поэтому
+    окружающий текст (например, кавычки в «{Название_доклада}») остался бы
+    на фоне, а значение вывелось бы в отдельном поле.
+    """
+    inline = set()
+    for text in source.placeholder_paragraphs():
+        if PLACEHOLDER_PATTERN.sub("", text).strip():
+            inline.update(PLACEHOLDER_PATTERN.findall(text))
+    return inline
+
+
+def font_directories():
+    """Системные папки шрифтов текущей платформы"""
+    home = os.path.expanduser("~")
+    if sys.platform == "win32":
+        windows = os.environ.get("WINDIR", r"C:\Windows")
+        local = os.environ.get("LOCALAPPDATA", os.path.join(home, "AppData", "Local"))
+        return [
+            os.path.join(windows, "Fonts"),
+            os.path.join(local, "Microsoft", "Windows", "Fonts"),
+        ]
+    if sys.platform == "darwin":
+        return [
+            "/System/Library/Fonts",
+            "/Library/Fonts",
+            os.path.join(home, "Library", "Fonts"),
+        ]
+    return [
+        "/usr/share/fonts",
+        "/usr/local/share/fonts",
+        os.path.join(home, ".local", "share", "fonts"),
+        os.path.join(home, ".fonts"),
+    ]
+
+
+@functools.lru_cache(maxsize=1)
+def _system_fonts():
+    """Файлы шрифтов в системных папках: {имя файла в нижнем регистре: путь}"""
+    fonts = {}
+    for directory in font_directories():
+        for root, dirs, files in os.walk(directory):
+            for file in files:
+                fonts.setdefault(file.lower(), os.path.join(root, file))
+    return fonts
+
+
+def resolve_font(font):
+    """Находит файл шрифта TrueType
+
+    Существующий путь используется как есть, имя файла ищется в системных
+    папках шрифтов. Пустое значение - первый найденный шрифт из
+    FONT_CANDIDATES. Если шрифт не найден, возникает RuntimeError.
+    """
+    if font and os.path.isfile(font):
+        return font
+    names = [os.path.basename(font)] if font else FONT_CANDIDATES
+    for name in names:
+        path = _system_fonts().get(name.lower())
+        if path is not None:
+            return path
+    if font:
+        raise RuntimeError(
+            f"Шрифт {font} не найден: укажите в [overlay] font путь"
+            " к файлу TrueType с кириллицей"
+        )
+    raise RuntimeError(
+        "Не найден шрифт с кириллицей: укажите в [overlay] font путь"
+        " к файлу TrueType"
+    )
+
+
+_fonts = {}
+_fonts_lock = threading.Lock()
+
+
+def register_font(font):
+    """Регистрирует шрифт TrueType в reportlab и возвращает его имя
+
+    Файл шрифта ищется через resolve_font один раз для каждого значения
+    настройки. Если шрифт не найден или не читается, возникает RuntimeError.
+    """
+    with _fonts_lock:
+        name = _fonts.get(font)
+        if name is None:
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.ttfonts import TTFError, TTFont
+
+            path = resolve_font(font)
+            name = f"Overlay{len(_fonts) + 1}"
+            try:
+                pdfmetrics.registerFont(TTFont(name, path))
+            except TTFError as e:
+                raise RuntimeError(f"Не удалось загрузить шрифт {path}: {e}") from e
+            _fonts[font] = name
+    return name
+
+
+class OverlayTemplate:
+    """Фон шаблона в PDF и поля, в которые выводится текст участника"""
+
+    def __init__(self, background, fields, font_name, min_font_size, line_spacing):
+        self.background = background
+        self.fields = fields
+        self.font_name = font_name
+        self.min_font_size = min_font_size
+        self.line_spacing = line_spacing
+        box = PdfReader(io.BytesIO(background)).pages[0].mediabox
+        self.page_size = (float(box.width), float(box.height))
+
+    def overlay(self, replacements):
+        """Создает страницу PDF только с текстом участника"""
+        from reportlab.pdfgen import canvas
+
+        stream = io.BytesIO()
+        page = canvas.Canvas(stream, pagesize=self.page_size)
+        for placeholder, field in self.fields.items():
+            text = replacements.get(placeholder, "")
+            if not text:
+                continue
+            size, lines = fit_text(text, self.font_name, field, self.min_font_size)
+            page.setFont(self.font_name, size)
+            y = field.y
+            for line in lines:
+                if field.align == "left":
+                    page.drawString(field.x, y, line)
+                elif field.align == "right":
+                    page.drawRightString(field.x + field.width, y, line)
+                else:
+                    page.drawCentredString(field.x + field.width / 2, y, line)
+                y -= size * self.line_spacing
+        page.showPage()
+        page.save()
+        return stream.getvalue()
+
+    def render(self, replacements, pdf_path):
+        """Накладывает текст на первую страницу фона и сохраняет PDF"""
+        with metrics.timer("overlay_render"):
+            background = PdfReader(io.BytesIO(self.background))
+            overlay = PdfReader(io.BytesIO(self.overlay(replacements)))
+            writer = PdfWriter()
+            for number, page in enumerate(background.pages):
+                if number == 0:
+                    page.merge_page(overlay.pages[0])
+                writer.add_page(page)
+            with open(pdf_path, "wb") as file:
+                writer.write(file)
+
+
+class OverlayRenderer:
+    """Заполнение документов наложением текста на PDF шаблона
+
+    Каждый шаблон с пустыми плейсхолдерами конвертируется в PDF один раз
+    (фон сохраняется в directory и используется в следующих запусках),
+    а PDF участника собирается из фона и страницы с его текстом без
+    обращения к конвертеру. Положение полей задается в секции
+    [overlay:<имя файла шаблона>] конфигурации.
+    """
+
+    def __init__(self, config, converter, directory):
+        _require_reportlab()
+        self.config = config
+        self.converter = converter
+        self.directory = directory
+        self.font = config.get("overlay", "font", fallback="")
+        self.min_font_size = float(config.get("overlay", "min_font_size", fallback="8"))
+        self.line_spacing = float(config.get("overlay", "line_spacing", fallback="1.2"))
+        self._templates = {}
+        self._layouts = {}
+        self._digests = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _background(self, template_path, source):
+        """PDF шаблона без значений плейсхолдеров, конвертируется один раз"""
+        key = content_hash(self.converter.name, file_digest(template_path))
+        path = os.path.join(self.directory, f"{key}.pdf")
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                return file.read()
+
+        stream = io.BytesIO()
+        blank = {placeholder: "" for placeholder in source.placeholders}
+        source.render(blank, replace_placeholders).save(stream)
+        data = self.converter.convert_bytes(
+            stream.getvalue(), os.path.basename(template_path)
+        )
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+        return data
+
+    def layout(self, template_path):
+        """Проверяет разметку шаблона
+
+        Возвращает (поля, имя шрифта, файл шрифта, минимальный размер).
+
+        Наложение возможно, только если каждый плейсхолдер шаблона стоит
+        в отдельном параграфе и положение его поля измерено и задано
+        в секции [overlay:<имя файла шаблона>]. Иначе возникает ValueError.
+        """
+        name = os.path.basename(template_path)
+        section = f"overlay:{name}"
+        source = load_template(template_path)
+        values = {
+            placeholder: self.config.get(
+                section, placeholder.strip("{}"), fallback=None
+            )
+            for placeholder in sorted(source.placeholders)
+        }
+        missing = [
+            placeholder for placeholder, value in values.items() if value is None
+        ]
+        if len(missing) == len(values):
+            raise ValueError(
+                f"Для шаблона {name} не задано положение полей: нет секции [{section}]"
+            )
+        if missing:
+            raise ValueError(
+                f"В секции [{section}] не задано положение полей: {', '.join(missing)}"
+            )
+
+        inline = inline_placeholders(source)
+        if inline:
+            raise ValueError(
+                f"В шаблоне {name} плейсхолдеры {', '.join(sorted(inline))} стоят"
+                " в одном параграфе с другим текстом: для заполнения наложением"
+                " каждый плейсхолдер должен быть отдельным параграфом"
+            )
+
+        fields = {
+            placeholder: parse_field(value) for placeholder, value in values.items()
+        }
+        font = self.config.get(section, "font", fallback=self.font)
+        min_font_size = float(
+            self.config.get(section, "min_font_size", fallback=self.min_font_size)
+        )
+        return fields, register_font(font), resolve_font(font), min_font_size
+
+    def prepare(self, template_paths):
+        """Проверяет разметку шаблонов до начала работы"""
+        with self._lock:
+            for template_path in template_paths:
+                if template_path not in self._layouts:
+                    self._layouts[template_path] = self.layout(template_path)
+
+    def template(self, template_path):
+        """Возвращает подготовленный шаблон (фон конвертируется при первом вызове)"""
+        with self._lock:
+            template = self._templates.get(template_path)
+            if template is None:
+                layout = self._layouts.get(template_path)
+                if layout is None:
+                    layout = self._layouts[template_path] = self.layout(template_path)
+                fields, font_name, _, min_font_size = layout
+                template = OverlayTemplate(
+                    self._background(template_path, load_template(template_path)),
+                    fields,
+                    font_name,
+                    min_font_size,
+                    self.line_spacing,
+                )
+                self._templates[template_path] = template
+        return template
+
+    def digest(self, template_path):
+        """Хеш настроек наложения шаблона для ключа кэша PDF
+
+        Учитываются поля, файл шрифта, минимальный размер шрифта,
+        межстрочный интервал и содержимое PDF фона.
+        """
+        template = self.template(template_path)
+        with self._lock:
+            digest = self._digests.get(template_path)
+            if digest is None:
+                fields, _, font_path, _ = self._layouts[template_path]
+                digest = content_hash(
+                    sorted(fields.items()),
+                    file_digest(font_path),
+                    template.min_font_size,
+                    template.line_spacing,
+                    hashlib.sha256(template.background).hexdigest(),
+                )
+                self._digests[template_path] = digest
+        return digest
+
+    def render_jobs(self, jobs, limiter=None):
+        """Создает PDF по заданиям и возвращает (задание, ошибка)
+
+        PDF сохраняется рядом с output_path задания, DOCX не создается.
+        Результаты выдаются в порядке заданий, ошибка равна None при успехе.
+        """
+        throttled = limiter is not None and limiter.enabled
+        for job in jobs:
+            if throttled:
+                limiter.acquire()
+            try:
+                template = self.template(job.template_path)
+                template.render(job.replacements, pdf_path_for(job.output_path))
+                yield job, None
+            except Exception as e:
+                yield job, str(e)
+
+
+def create_overlay_renderer(config, converter, output_dir, template_paths):
+    """Создает заполнение наложением по секции [overlay] конфигурации
+
+    Разметка и шрифты шаблонов template_paths проверяются сразу: если
+    для шаблона нет измеренных полей, возникает ValueError, а если не
+    найден шрифт - RuntimeError, до создания первого документа.
+    """
+    directory = config.get("overlay", "directory", fallback="overlay_backgrounds")
+    renderer = OverlayRenderer(config, converter, os.path.join(output_dir, directory))
+    renderer.prepare(template_paths)
+    return renderer
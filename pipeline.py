@@ -0,0 +1,77 @@
+import queue
+import threading
+from collections import namedtuple
+
+
+# Этап конвейера: имя, функция обработки элемента и число потоков
+PipelineStage = namedtuple("PipelineStage", ["name", "func", "workers"])
+
+# Результат обработки элемента: на каком этапе он остановился и почему
+PipelineResult = namedtuple("PipelineResult", ["item", "failed_stage", "error"])
+
+_STOP = object()
+
+
+def run_pipeline(items, stages, queue_size=8):
+    """Пропускает элементы через этапы, выполняемые одновременно
+
+    Каждый этап обслуживают свои потоки, между этапами стоят очереди
+    ограниченного размера: если следующий этап не успевает, предыдущий
+    ждет, и в памяти находится не больше queue_size элементов на этап.
+    Функция этапа получает элемент и возвращает его (возможно, измененным)
+    для следующего этапа, либо вызывает исключение - тогда элемент
+    дальше не передается. Возвращает список PipelineResult в порядке items.
+    """
+    queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in stages]
+    results = {}
+    results_lock = threading.Lock()
+
+    def work(stage_index, stage):
+        source = queues[stage_index]
+        is_last = stage_index == len(stages) - 1
+        while True:
+            entry = source.get()
+            if entry is _STOP:
+                return
+            position, item = entry
+            try:
+                item = stage.func(item)
+            except Exception as e:
+                with results_lock:
+                    results[position] = PipelineResult(item, stage.name, str(e))
+                continue
+            if is_last:
+                with results_lock:
+                    results[position] = PipelineResult(item, None, None)
+            else:
+                queues[stage_index + 1].put((position, item))
+
+    threads = []
+    for stage_index, stage in enumerate(stages):
+        stage_threads = [
+            threading.Thread(
+                target=work,
+                args=(stage_index, stage),
+                name=f"pipeline-{stage.name}-{number}",
+                daemon=True,
+            )
+            for number in range(max(1, stage.workers))
+        ]
+        for thread in stage_threads:
+            thread.start()
+        threads.append(stage_threads)
+
+    count = 0
+    for position, item in enumerate(items):
+        queues[0].put((position, item))
+        count += 1
+
+    # Останавливаем этапы по очереди: следующий этап получает сигнал
+    # только после того, как предыдущий передал ему все элементы
+    for stage_index, stage_threads in enumerate(threads):
+        for _ in stage_threads:
+            queues[stage_index].put(_STOP)
+        for thread in stage_threads:
+            thread.join()
+
+    return [results[position] for position in range(count)]
@@ -0,0 +1,175 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+# Аргумент командной строки, включающий профилирование
+PROFILE_ARGUMENT = "--profile"
+
+# Пустой контекст для этапов, когда профилирование выключено
+_NO_PROFILING = nullcontext()
+
+# Выделения памяти самого профилировщика в отчет не попадают
+_MEMORY_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, cProfile.__file__),
+    tracemalloc.Filter(False, __file__),
+)
+
+
+class Profiler:
+    """Профилирование этапов запуска через cProfile и tracemalloc
+
+    Для каждого этапа в папку directory сохраняются:
+    <программа>_<этап>.prof - профиль для pstats/snakeviz,
+    <программа>_<этап>_calls.txt - функции с наибольшим временем,
+    <программа>_<этап>_memory.txt - места наибольших выделений памяти.
+    cProfile видит только поток, в котором выполняется этап: работа
+    процессов-исполнителей и потоков конвейера в профиль не попадает.
+    """
+
+    def __init__(self, directory, program, top=30, frames=1):
+        self.directory = directory
+        self.program = program
+        self.top = top
+        self.summary = []
+        self._active = False
+        self._names = set()
+        self._started_tracing = not tracemalloc.is_tracing()
+        os.makedirs(directory, exist_ok=True)
+        if self._started_tracing:
+            tracemalloc.start(frames)
+
+    @contextmanager
+    def stage(self, name):
+        # Вложенный этап входит в профиль внешнего: cProfile не может
+        # профилировать два этапа одновременно
+        if self._active:
+            yield
+            return
+
+        profile = cProfile.Profile()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        self._active = True
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - start
+            self._active = False
+            _, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            self._dump(self._unique(name), profile, before, after, elapsed, peak)
+
+    def _unique(self, name):
+        # Повторный этап с тем же именем сохраняется под номером
+        unique, number = name, 1
+        while unique in self._names:
+            number += 1
+            unique = f"{name}_{number}"
+        self._names.add(unique)
+        return unique
+
+    def _dump(self, name, profile, before, after, elapsed, peak):
+        base = os.path.join(self.directory, f"{self.program}_{name}")
+        profile.dump_stats(f"{base}.prof")
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream).strip_dirs()
+        stream.write(f"Этап {name}: {elapsed:.3f} с\n")
+        stats.sort_stats("cumulative").print_stats(self.top)
+        stats.sort_stats("tottime").print_stats(self.top)
+        with open(f"{base}_calls.txt", "w", encoding="utf-8") as file:
+            file.write(stream.getvalue())
+
+        differences = after.filter_traces(_MEMORY_FILTERS).compare_to(
+            before.filter_traces(_MEMORY_FILTERS), "lineno"
+        )
+        with open(f"{base}_memory.txt", "w", encoding="utf-8") as file:
+            file.write(f"Этап {name}: пик памяти {peak / 1024 / 1024:.1f} МБ\n")
+            file.write(f"Наибольшие выделения памяти за этап (top {self.top}):\n")
+            for difference in differences[: self.top]:
+                file.write(f"{difference}\n")
+
+        self.summary.append((name, elapsed, peak))
+
+    def close(self):
+        """Объединяет профили этапов и сохраняет сводку, возвращает папку"""
+        if self._started_tracing:
+            tracemalloc.stop()
+        if not self.summary:
+            return self.directory
+
+        paths = [
+            os.path.join(self.directory, f"{self.program}_{name}.prof")
+            for name, _, _ in self.summary
+        ]
+        pstats.Stats(*paths).dump_stats(
+            os.path.join(self.directory, f"{self.program}.prof")
+        )
+        with open(
+            os.path.join(self.directory, f"{self.program}_summary.txt"),
+            "w",
+            encoding="utf-8",
+        ) as file:
+            file.write(f"{'Этап':<32} {'Секунд':>10} {'Пик памяти, МБ':>16}\n")
+            for name, elapsed, peak in self.summary:
+                file.write(f"{name:<32} {elapsed:>10.3f} {peak / 1024 / 1024:>16.1f}\n")
+        return self.directory
+
+
+# Профилировщик процесса, None - профилирование выключено
+_profiler = None
+
+
+def requested(config):
+    """Включено ли профилирование: аргумент --profile или [profiling] enabled"""
+    return PROFILE_ARGUMENT in sys.argv[1:] or config.getboolean(
+        "profiling", "enabled", fallback=False
+    )
+
+
+def start(config, output_dir, program):
+    """Включает профилирование запуска, если оно запрошено
+
+    Настройки - секция [profiling]. Профили сохраняются в папку
+    directory внутри output_dir. Возвращает Profiler или None.
+    """
+    global _profiler
+    if not requested(config):
+        return None
+    directory = config.get("profiling", "directory", fallback="profiles")
+    _profiler = Profiler(
+        os.path.join(output_dir, directory),
+        program,
+        top=config.getint("profiling", "top", fallback=30),
+        frames=config.getint("profiling", "traceback_frames", fallback=1),
+    )
+    return _profiler
+
+
+def stage(name):
+    """Контекстный менеджер этапа: профилирует блок, если профилирование включено
+
+    Без профилирования возвращает пустой контекст и ничего не измеряет.
+    """
+    if _profiler is None:
+        return _NO_PROFILING
+    return _profiler.stage(name)
+
+
+def finish():
+    """Завершает профилирование, возвращает папку с профилями или None"""
+    global _profiler
+    if _profiler is None:
+        return None
+    profiler, _profiler = _profiler, None
+    return profiler.close()
@@ -0,0 +1,128 @@
+import smtplib
+import threading
+import time
+
+
+# Коды SMTP, которыми сервер просит отправлять медленнее
+SMTP_THROTTLING_CODES = (421, 450, 451)
+
+# Наибольшая пауза после просьбы сервера подождать, секунд
+MAX_BACKOFF = 60.0
+
+
+class RateLimiter:
+    """Ограничитель скорости по алгоритму token bucket
+
+    rate - число операций в секунду (0 - без ограничений), burst - сколько
+    операций можно выполнить подряд без ожидания. Скорость адаптивная:
+    on_throttle() снижает ее вдвое (но не ниже min_rate), а каждый
+    on_success() постепенно возвращает ее к исходному значению.
+    Без ограничения скорости (rate = 0) on_throttle() делает паузу
+    backoff секунд, удваивая ее с каждой попыткой.
+    """
+
+    def __init__(self, rate=0.0, burst=1, min_rate=None, name="", backoff=5.0):
+        self.max_rate = max(0.0, rate)
+        self.rate = self.max_rate
+        self.burst = max(1, burst)
+        self.min_rate = min_rate if min_rate is not None else self.max_rate / 10
+        self.name = name
+        self.backoff = max(0.0, backoff)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_rate > 0
+
+    def describe(self):
+        """Возвращает описание ограничения для вывода настроек"""
+        if not self.enabled:
+            return "нет"
+        return f"{self.max_rate:g}/сек"
+
+    def _refill(self, now):
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """Ждет, пока можно выполнить операцию (или tokens операций)"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Пакет больше burst пропускаем при полном ведре, уходя в минус
+            needed = min(tokens, self.burst)
+            wait = max(0.0, (needed - self._tokens) / self.rate)
+            self._tokens -= tokens
+            self._updated = now
+
+        if wait > 0:
+            time.sleep(wait)
+
+    def on_success(self):
+        """Плавно повышает скорость после успешной операции"""
+        if not self.enabled or self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def on_throttle(self, attempt=0):
+        """Снижает скорость вдвое, когда сервер просит подождать
+
+        attempt - номер повторной попытки (с нуля), от него зависит пауза
+        при выключенном ограничении скорости.
+        """
+        if not self.enabled:
+            wait = min(MAX_BACKOFF, self.backoff * 2**attempt)
+            print(f"[ИНФО] Сервер просит подождать ({self.name}): пауза {wait:g} сек")
+            time.sleep(wait)
+            return
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+        print(
+            f"[ИНФО] Сервер просит снизить скорость ({self.name}): {self.rate:.3g}/сек"
+        )
+
+
+def is_throttling_error(error):
+    """Проверяет, что ошибка SMTP означает временное ограничение сервера"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return any(
+            code in SMTP_THROTTLING_CODES for code, _ in error.recipients.values()
+        )
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code in SMTP_THROTTLING_CODES
+    return False
+
+
+def create_rate_limiter(config, stage):
+    """Создает ограничитель этапа по секции [rate_limits] конфигурации
+
+    stage - "render", "convert" или "smtp". Для локальных этапов
+    ограничения по умолчанию нет. Для SMTP без явной настройки
+    используется прежний параметр [processing] delay_between_files.
+    """
+    fallback = "0"
+    if stage == "smtp":
+        delay = config.getint("processing", "delay_between_files", fallback=0)
+        if delay > 0:
+            fallback = str(1 / delay)
+
+    rate = float(config.get("rate_limits", stage, fallback=fallback) or 0)
+    burst = config.getint("rate_limits", f"{stage}_burst", fallback=1)
+    min_rate = config.get("rate_limits", f"{stage}_min", fallback=None)
+    backoff = float(config.get("rate_limits", f"{stage}_backoff", fallback="5") or 0)
+    return RateLimiter(
+        rate,
+        burst,
+        float(min_rate) if min_rate else None,
+        name=stage,
+        backoff=backoff,
+    )
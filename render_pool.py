@@ -0,0 +1,96 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+from docx_templates import load_template
+
+
+# Задание на заполнение одного документа
+RenderJob = namedtuple("RenderJob", ["template_path", "replacements", "output_path"])
+
+# Настройки процесса-исполнителя, задаются один раз при его запуске
+_worker_replace_paragraph = None
+_worker_renderer = "docx"
+
+
+def render_to_file(job, replace_paragraph, renderer="docx"):
+    """Заполняет шаблон по заданию и сохраняет документ"""
+    template = load_template(job.template_path, renderer)
+    document = template.render(job.replacements, replace_paragraph)
+    with metrics.timer("docx_save"):
+        document.save(job.output_path)
+
+
+def _init_worker(replace_paragraph, renderer):
+    """Сохраняет настройки в процессе-исполнителе"""
+    global _worker_replace_paragraph, _worker_renderer
+    _worker_replace_paragraph = replace_paragraph
+    _worker_renderer = renderer
+    # При запуске через fork процесс получает копию статистики основного,
+    # она не должна попасть в отчет второй раз
+    metrics.drain()
+
+
+def _run_job(job):
+    """Выполняет задание в процессе-исполнителе
+
+    Возвращает текст ошибки и статистику этапов, собранную в процессе,
+    чтобы она попала в отчет основного процесса.
+    """
+    try:
+        render_to_file(job, _worker_replace_paragraph, _worker_renderer)
+        error = None
+    except Exception as e:
+        error = str(e)
+    return error, metrics.drain()
+
+
+def _collect(outcome):
+    """Переносит статистику процесса-исполнителя и возвращает ошибку"""
+    error, stages = outcome
+    metrics.merge(stages)
+    return error
+
+
+def iter_render_jobs(
+    jobs, replace_paragraph, renderer="docx", workers=1, limiter=None
+):
+    """Заполняет документы по заданиям и возвращает (задание, ошибка)
+
+    Результаты выдаются в порядке заданий, ошибка равна None при успехе.
+    При workers > 1 задания распределяются по пулу процессов, каждый из
+    которых компилирует шаблоны один раз и обрабатывает свою часть строк.
+    limiter (RateLimiter) ограничивает скорость запуска заданий.
+    """
+    throttled = limiter is not None and limiter.enabled
+
+    if workers <= 1:
+        for job in jobs:
+            if throttled:
+                limiter.acquire()
+            try:
+                render_to_file(job, replace_paragraph, renderer)
+                yield job, None
+            except Exception as e:
+                yield job, str(e)
+        return
+
+    # Крупные порции уменьшают накладные расходы на передачу заданий
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(replace_paragraph, renderer),
+    ) as executor:
+        if not throttled:
+            outcomes = executor.map(_run_job, jobs, chunksize=chunksize)
+            for job, outcome in zip(jobs, outcomes):
+                yield job, _collect(outcome)
+            return
+
+        futures = []
+        for job in jobs:
+            limiter.acquire()
+            futures.append(executor.submit(_run_job, job))
+        for job, future in zip(jobs, futures):
+            yield job, _collect(future.result())
@@ -0,0 +1,310 @@
+import os
+import pickle
+from collections import namedtuple
+
+import pandas as pd
+
+import metrics
+from hashing import file_digest
+
+
+# Колонки таблицы участников, которые используют программы
+ROSTER_COLUMNS = (
+    "ФИО участника",
+    "Название доклада",
+    "ФИО руководителя",
+    "e-mail",
+    "Призер",
+)
+
+# Версия формата файла кэша, меняется при изменении его структуры
+CACHE_FORMAT = 1
+
+
+def sidecar_path(path):
+    """Путь к файлу кэша разобранной таблицы рядом с самой таблицей"""
+    directory, filename = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, f".{filename}.roster.pkl")
+
+
+def _read_table(path, columns):
+    """Читает из файла таблицы только указанные колонки"""
+    extension = os.path.splitext(path)[1].lower()
+    wanted = set(columns)
+
+    if extension == ".csv":
+        return pd.read_csv(path, usecols=lambda column: column in wanted)
+    if extension == ".parquet":
+        # В Parquet колонки хранятся отдельно, лишние не читаются вовсе
+        import pyarrow.parquet as pq
+
+        available = pq.read_schema(path).names
+        return pd.read_parquet(
+            path, columns=[column for column in available if column in wanted]
+        )
+    return pd.read_excel(path, usecols=lambda column: column in wanted)
+
+
+def _project(frame, columns):
+    """Оставляет в таблице только запрошенные колонки, которые в ней есть"""
+    return frame[[column for column in frame.columns if column in columns]]
+
+
+def _load_sidecar(cache_path):
+    try:
+        with open(cache_path, "rb") as file:
+            cached = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(cached, dict) or cached.get("format") != CACHE_FORMAT:
+        return None
+    return cached
+
+
+def _save_sidecar(cache_path, cached):
+    temp_path = f"{cache_path}.tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            pickle.dump(cached, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        # Без кэша программа работает, просто медленнее при следующем запуске
+        print(f"[ИНФО] Не удалось сохранить кэш таблицы участников: {e}")
+
+
+@metrics.timed("roster_load")
+def load_roster(path, columns=ROSTER_COLUMNS, use_cache=True):
+    """Загружает таблицу участников (Excel, CSV или Parquet)
+
+    Читаются только нужные колонки. Разобранная таблица сохраняется в файл
+    рядом с исходной и при следующих запусках загружается из него. Кэш
+    считается устаревшим, если у таблицы изменилось время изменения или
+    размер и при этом изменилось ее содержимое (хеш).
+    """
+    columns = list(columns)
+    if not use_cache:
+        return _read_table(path, columns)
+
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cache_path = sidecar_path(path)
+    cached = _load_sidecar(cache_path)
+
+    if cached is not None and set(columns) <= set(cached["columns"]):
+        if cached["signature"] == signature:
+            return _project(cached["frame"], columns)
+
+        # Файл сохранен заново, но мог не измениться (например, скопирован)
+        digest = file_digest(path)
+        if cached["digest"] == digest:
+            cached["signature"] = signature
+            _save_sidecar(cache_path, cached)
+            return _project(cached["frame"], columns)
+    else:
+        digest = file_digest(path)
+
+    # Кэшируются все известные колонки, чтобы его могли использовать все программы
+    read_columns = list(dict.fromkeys(columns + list(ROSTER_COLUMNS)))
+    frame = _read_table(path, read_columns)
+    _save_sidecar(
+        cache_path,
+        {
+            "format": CACHE_FORMAT,
+            "signature": signature,
+            "digest": digest,
+            "columns": read_columns,
+            "frame": frame,
+        },
+    )
+    return _project(frame, columns)
+
+
+def _iter_excel_chunks(path, columns, chunk_size):
+    # openpyxl в режиме только чтения не загружает лист целиком
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+        positions = [
+            (position, name) for position, name in enumerate(header) if name in columns
+        ]
+        names = [name for _, name in positions]
+
+        start = 0
+        records = []
+        # Пустые строки в конце листа pandas отбрасывает, в середине оставляет
+        blank = []
+        for row in rows:
+            values = [
+                row[position] if position < len(row) else None
+                for position, _ in positions
+            ]
+            if all(value is None for value in values):
+                blank.append(values)
+                continue
+            blank.append(values)
+            for record in blank:
+                records.append(record)
+                if len(records) >= chunk_size:
+                    yield pd.DataFrame(
+                        records,
+                        columns=names,
+                        index=range(start, start + len(records)),
+                    )
+                    start += len(records)
+                    records = []
+            blank = []
+        if records:
+            yield pd.DataFrame(
+                records, columns=names, index=range(start, start + len(records))
+            )
+    finally:
+        workbook.close()
+
+
+def _iter_chunks(path, columns, chunk_size):
+    extension = os.path.splitext(path)[1].lower()
+    wanted = set(columns)
+
+    if extension == ".csv":
+        # Индексы строк в частях read_csv сквозные
+        yield from pd.read_csv(
+            path, usecols=lambda column: column in wanted, chunksize=chunk_size
+        )
+    elif extension == ".parquet":
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        start = 0
+        for batch in parquet.iter_batches(
+            batch_size=chunk_size,
+            columns=[
+                column for column in parquet.schema_arrow.names if column in wanted
+            ],
+        ):
+            frame = batch.to_pandas()
+            frame.index = range(start, start + len(frame))
+            start += len(frame)
+            yield frame
+    elif extension in (".xlsx", ".xlsm"):
+        yield from _iter_excel_chunks(path, wanted, chunk_size)
+    else:
+        # Старый формат .xls по частям не читается
+        frame = _read_table(path, columns)
+        for start in range(0, len(frame), chunk_size):
+            yield frame.iloc[start : start + chunk_size]
+
+
+def iter_roster_chunks(path, columns=ROSTER_COLUMNS, chunk_size=1000):
+    """Читает таблицу участников частями по chunk_size строк
+
+    В отличие от load_roster таблица не загружается в память целиком:
+    CSV и Parquet читаются по частям, Excel (.xlsx) - через openpyxl в
+    режиме только чтения. Индексы строк сквозные, как у load_roster.
+    Кэш разобранной таблицы не используется.
+    """
+    chunks = _iter_chunks(path, list(columns), max(1, chunk_size))
+    while True:
+        with metrics.timer("roster_load"):
+            frame = next(chunks, None)
+        if frame is None:
+            return
+        yield frame
+
+
+def split_chunks(items, chunk_size):
+    """Делит список на части по chunk_size элементов (0 - одна часть)"""
+    if chunk_size <= 0 or len(items) <= chunk_size:
+        return [items]
+    return [
+        items[start : start + chunk_size] for start in range(0, len(items), chunk_size)
+    ]
+
+
+# Участник после предварительной обработки таблицы
+Participant = namedtuple(
+    "Participant",
+    [
+        "index",
+        "fio",
+        "paper_title",
+        "supervisor",
+        "email",
+        "prize",
+        "prize_text",
+        "safe_fio",
+        "safe_supervisor",
+        "complete",
+    ],
+)
+
+PRIZE_TEXTS = {1: "I место", 2: "II место", 3: "III место"}
+
+UNSAFE_FILENAME_PATTERN = r'[<>:"/\\|?*]'
+
+
+def _clean_column(df, column):
+    """Колонка как строки без пробелов по краям
+
+    Значения получаются так же, как str(row[column]).strip() при обходе
+    строк: пустая ячейка дает "nan", число 5.0 - "5.0".
+    """
+    if column not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    # Пустые ячейки (NaN, а при чтении по частям None) заменяются до
+    # astype(str): начиная с pandas 3 astype(str) оставляет их пустыми
+    return df[column].fillna("nan").astype(str).str.strip()
+
+
+def _filled(df, column):
+    """Маска строк, в которых ячейка колонки заполнена (не пустая и не пробелы)"""
+    if column not in df.columns:
+        return pd.Series(False, index=df.index)
+    values = df[column]
+    return values.notna() & (values.astype(str).str.strip() != "")
+
+
+def _safe_filename(values):
+    """Имена для файлов: недопустимые символы и пробелы заменяются на _"""
+    return values.str.replace(UNSAFE_FILENAME_PATTERN, "_", regex=True).str.replace(
+        " ", "_", regex=False
+    )
+
+
+def prepare_participants(df):
+    """Подготавливает строки таблицы для заполнения документов
+
+    Очистка значений, места призеров и безопасные имена файлов считаются
+    сразу для целых колонок, а программам передается список Participant
+    без построения Series для каждой строки. Призерами считаются строки,
+    где в колонке "Призер" стоит 1, 2 или 3. complete - заполнены ли ФИО,
+    название доклада и e-mail (без этого приглашение не отправляется).
+    """
+    fio = _clean_column(df, "ФИО участника")
+    supervisor = _clean_column(df, "ФИО руководителя")
+
+    if "Призер" in df.columns:
+        winners = df["Призер"].isin(list(PRIZE_TEXTS))
+        prize = df["Призер"].where(winners, 0).astype(int)
+    else:
+        prize = pd.Series(0, index=df.index)
+
+    columns = [
+        df.index.tolist(),
+        fio.tolist(),
+        _clean_column(df, "Название доклада").tolist(),
+        supervisor.tolist(),
+        _clean_column(df, "e-mail").tolist(),
+        prize.tolist(),
+        prize.map(PRIZE_TEXTS).fillna("").tolist(),
+        _safe_filename(fio).tolist(),
+        _safe_filename(supervisor).tolist(),
+        (
+            _filled(df, "ФИО участника")
+            & _filled(df, "Название доклада")
+            & _filled(df, "e-mail")
+        ).tolist(),
+    ]
+    return [Participant._make(values) for values in zip(*columns)]
@@ -0,0 +1,143 @@
+import os
+import sqlite3
+import threading
+import time
+
+from hashing import content_hash
+
+
+# Состояния приглашения в журнале, по порядку продвижения
+STATES = ("rendered", "converted", "sent")
+
+
+class SendLedger:
+    """Журнал рассылки в SQLite: что уже подготовлено и отправлено
+
+    Запись определяется адресом получателя и хешем содержимого письма,
+    поэтому при изменении шаблона или данных участника письмо считается
+    новым. Каждое изменение сразу сохраняется на диск, так что после
+    сбоя повторный запуск продолжает рассылку с места остановки.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # PDF, которые не сохраняются в output_dir (обработка в памяти без
+        # archive_pdf), хранятся здесь до отправки письма
+        self.pdf_directory = os.path.splitext(path)[0] + "_pdf"
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS invitations (
+                recipient TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                state TEXT NOT NULL,
+                pdf_path TEXT,
+                updated REAL NOT NULL,
+                PRIMARY KEY (recipient, content_hash)
+            )
+            """
+        )
+        self._connection.commit()
+
+    def get(self, recipient, key):
+        """Возвращает (состояние, путь к PDF) или (None, None)"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT state, pdf_path FROM invitations"
+                " WHERE recipient = ? AND content_hash = ?",
+                (recipient, key),
+            ).fetchone()
+        return row if row else (None, None)
+
+    def is_sent(self, recipient, key):
+        return self.get(recipient, key)[0] == "sent"
+
+    def converted_pdf(self, recipient, key):
+        """Возвращает путь к готовому PDF, если письмо подготовлено, но не отправлено"""
+        state, pdf_path = self.get(recipient, key)
+        if state == "converted" and pdf_path and os.path.exists(pdf_path):
+            return pdf_path
+        return None
+
+    def store_pdf(self, recipient, key, pdf_data):
+        """Сохраняет PDF письма в папку журнала, возвращает путь к нему"""
+        os.makedirs(self.pdf_directory, exist_ok=True)
+        pdf_path = os.path.join(
+            self.pdf_directory, f"{content_hash(recipient, key)}.pdf"
+        )
+        temp_path = f"{pdf_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(pdf_data)
+        os.replace(temp_path, pdf_path)
+        return pdf_path
+
+    def mark(self, recipient, key, state, pdf_path=None):
+        """Записывает новое состояние письма
+
+        После отправки PDF из папки журнала (store_pdf) удаляется.
+        """
+        if state not in STATES:
+            raise ValueError(f"Неизвестное состояние: {state}")
+        if state == "sent":
+            stored = self.get(recipient, key)[1]
+            if stored and os.path.dirname(stored) == self.pdf_directory:
+                try:
+                    os.remove(stored)
+                except FileNotFoundError:
+                    pass
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO invitations"
+                " (recipient, content_hash, state, pdf_path, updated)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (recipient, content_hash) DO UPDATE SET"
+                " state = excluded.state,"
+                " pdf_path = COALESCE(excluded.pdf_path, invitations.pdf_path),"
+                " updated = excluded.updated",
+                (recipient, key, state, pdf_path, time.time()),
+            )
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class NullLedger:
+    """Заглушка журнала, когда он отключен в настройках"""
+
+    def get(self, recipient, key):
+        return None, None
+
+    def is_sent(self, recipient, key):
+        return False
+
+    def converted_pdf(self, recipient, key):
+        return None
+
+    def store_pdf(self, recipient, key, pdf_data):
+        return None
+
+    def mark(self, recipient, key, state, pdf_path=None):
+        pass
+
+    def close(self):
+        pass
+
+
+def open_ledger(config, output_dir):
+    """Открывает журнал рассылки по секции [ledger] конфигурации"""
+    if not config.getboolean("ledger", "enabled", fallback=True):
+        return NullLedger()
+    filename = config.get("ledger", "filename", fallback="send_ledger.sqlite3")
+    os.makedirs(output_dir, exist_ok=True)
+    return SendLedger(os.path.join(output_dir, filename))
@@ -0,0 +1,161 @@
+import queue
+import smtplib
+
+import metrics
+from rate_limit import RateLimiter, create_rate_limiter, is_throttling_error
+
+
+# Сколько раз повторять отправку, если сервер просит подождать (421/450/451)
+SMTP_THROTTLE_RETRIES = 3
+
+
+class SmtpSession:
+    """Авторизованное SMTP соединение и число отправленных через него писем"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.messages = 0
+
+    def close(self):
+        try:
+            self.connection.quit()
+        except smtplib.SMTPException:
+            self.connection.close()
+        except OSError:
+            pass
+
+
+class SmtpMailer:
+    """Пул авторизованных SMTP сессий для отправки многих писем
+
+    Соединение, STARTTLS и авторизация выполняются один раз на сессию,
+    после чего через нее отправляется до messages_per_session писем.
+    Разорванная сервером сессия переподключается незаметно для вызывающего.
+    """
+
+    def __init__(
+        self,
+        server,
+        port,
+        username,
+        password,
+        sessions=1,
+        messages_per_session=50,
+        timeout=60,
+        limiter=None,
+        starttls=True,
+    ):
+        self.server = server
+        self.port = port
+        self.username = username
+        self.password = password
+        self.messages_per_session = messages_per_session
+        self.timeout = timeout
+        self.starttls = starttls
+        self.limiter = limiter or RateLimiter()
+        self.sessions = max(1, sessions)
+        self._idle = queue.LifoQueue()
+        for _ in range(self.sessions):
+            self._idle.put(None)
+
+    def _connect(self):
+        """Открывает новую авторизованную сессию"""
+        with metrics.timer("smtp_connect"):
+            connection = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+            try:
+                if self.starttls:
+                    connection.starttls()
+                if self.username and self.password:
+                    connection.login(self.username, self.password)
+            except Exception:
+                connection.close()
+                raise
+        return SmtpSession(connection)
+
+    def _send_once(self, message):
+        """Отправляет письмо через свободную сессию пула"""
+        session = self._idle.get()
+        try:
+            if session is not None and (
+                self.messages_per_session > 0
+                and session.messages >= self.messages_per_session
+            ):
+                # Ротация: сервер может ограничивать число писем на соединение
+                session.close()
+                session = None
+
+            for reconnect in range(2):
+                if session is None:
+                    session = self._connect()
+                try:
+                    with metrics.timer("smtp_send"):
+                        session.connection.send_message(message)
+                    session.messages += 1
+                    return
+                except smtplib.SMTPServerDisconnected:
+                    session = None
+                    if reconnect == 1:
+                        raise
+        except smtplib.SMTPRecipientsRefused:
+            # Адрес отклонен, но соединение осталось рабочим
+            raise
+        except Exception:
+            if session is not None:
+                session.close()
+                session = None
+            raise
+        finally:
+            self._idle.put(session)
+
+    def send(self, message):
+        """Отправляет письмо, снижая скорость, если сервер просит подождать"""
+        for attempt in range(SMTP_THROTTLE_RETRIES + 1):
+            self.limiter.acquire()
+            try:
+                self._send_once(message)
+                self.limiter.on_success()
+                return
+            except smtplib.SMTPException as e:
+                if not is_throttling_error(e) or attempt == SMTP_THROTTLE_RETRIES:
+                    raise
+                self.limiter.on_throttle(attempt)
+
+    def close(self):
+        """Закрывает все свободные сессии"""
+        sessions = []
+        while True:
+            try:
+                sessions.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for session in sessions:
+            if session is not None:
+                session.close()
+            self._idle.put(None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def create_mailer(config, username, password, sessions=None):
+    """Создает пул SMTP сессий по секциям [email] и [rate_limits]
+
+    sessions задает число сессий вместо [email] sessions (но не меньше него).
+    """
+    configured_sessions = config.getint("email", "sessions", fallback=1)
+    return SmtpMailer(
+        config.get("email", "smtp_server"),
+        config.getint("email", "smtp_port"),
+        username,
+        password,
+        sessions=max(configured_sessions, sessions or 0),
+        messages_per_session=config.getint(
+            "email", "messages_per_session", fallback=50
+        ),
+        timeout=config.getint("email", "timeout", fallback=60),
+        limiter=create_rate_limiter(config, "smtp"),
+        starttls=config.getboolean("email", "starttls", fallback=True),
+    )
@@ -0,0 +1,29 @@
+import pytest
+
+from combined_convert import page_ranges
+
+
+def test_one_page_per_section():
+    assert page_ranges([1, 2, 1], 4) == [(0, 1), (1, 3), (3, 4)]
+
+
+def test_equal_documents_share_extra_pages():
+    # Каждый документ из одного раздела занял по две страницы
+    assert page_ranges([1, 1, 1], 6) == [(0, 2), (2, 4), (4, 6)]
+
+
+@pytest.mark.parametrize(
+    "section_counts, page_count",
+    [
+        ([1, 1, 1], 5),
+        ([1, 2], 6),
+        ([1, 1], 1),
+    ],
+)
+def test_unsplittable_pages(section_counts, page_count):
+    assert page_ranges(section_counts, page_count) is None
+
+
+def test_no_documents():
+    assert page_ranges([], 0) == []
+    assert page_ranges([], 3) is None
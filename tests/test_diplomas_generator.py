@@ -0,0 +1,126 @@
+import io
+import os
+
+import pandas as pd
+import pytest
+from docx import Document
+from docx.enum.section import WD_ORIENT
+from docx.opc.package import OpcPackage
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.ns import qn
+from docx.shared import Cm
+
+import docx_templates
+from diplomas_generator import DiplomaGenerator
+from pdf_cache import PdfCache
+from pdf_converters import FakeWorker, PdfConverter
+from roster import prepare_participants
+from test_docx_combine import LOGO, relationship_ids
+
+
+@pytest.fixture
+def template(tmp_path):
+    """Шаблон диплома: альбомная страница, поля, логотип в колонтитуле и в тексте"""
+    document = Document()
+    section = document.sections[0]
+    section.orientation = WD_ORIENT.LANDSCAPE
+    section.page_width, section.page_height = Cm(29.7), Cm(21)
+    section.left_margin = Cm(3)
+    section.header.paragraphs[0].add_run().add_picture(io.BytesIO(LOGO))
+    document.add_paragraph("{ФИО_участника}")
+    document.add_paragraph("{Название_доклада} ({ФИО_руководителя})")
+    document.add_picture(io.BytesIO(LOGO))
+    path = str(tmp_path / "template.docx")
+    document.save(path)
+    return path
+
+
+@pytest.fixture
+def winners():
+    frame = pd.DataFrame(
+        {
+            "ФИО участника": [f"Призер {index}" for index in range(5)],
+            "Название доклада": [f"Доклад {index}" for index in range(5)],
+            "ФИО руководителя": ["Руководитель"] * 5,
+            "Призер": [1, 2, 3, 1, 2],
+        }
+    )
+    return prepare_participants(frame)
+
+
+def create(generator, winners, template, output_dir, pdf_cache=None):
+    with PdfConverter(lambda index: FakeWorker()) as converter:
+        return generator.create_diplomas(
+            winners, template, output_dir, "Все", converter, None, pdf_cache
+        )
+
+
+def check_combined(path, winners, template):
+    document = Document(path)
+    rels = document.part.rels
+    expected = Document(template).sections[0]
+
+    assert len(document.sections) == len(winners)
+    for section in document.sections:
+        assert section.orientation == WD_ORIENT.LANDSCAPE
+        assert (section.page_width, section.page_height) == (
+            expected.page_width,
+            expected.page_height,
+        )
+        assert section.left_margin == expected.left_margin
+        assert (
+            section.header.part.rels[
+                next(relationship_ids(section.header._element))
+            ].target_part.blob
+            == LOGO
+        )
+
+    assert all(rid in rels for rid in relationship_ids(document.element.body))
+    images = {rel.target_part for rel in rels.values() if rel.reltype == RT.IMAGE}
+    assert len(images) == 1
+    text = [p.text for p in document.paragraphs if p.text.startswith("Призер")]
+    assert text == [participant.fio for participant in winners]
+
+
+@pytest.mark.parametrize("combined_conversion", [False, True])
+def test_combined_docx_is_built_from_renders(
+    tmp_path, template, winners, monkeypatch, combined_conversion
+):
+    output_dir = str(tmp_path / "output")
+    os.makedirs(output_dir)
+    generator = DiplomaGenerator(
+        combined_conversion=combined_conversion, combined_batch_size=2
+    )
+
+    # Шаблон разбирается заранее, после этого DOCX с диска не читаются
+    docx_templates.load_template(template)
+
+    def no_reads(*args, **kwargs):
+        raise AssertionError("DOCX прочитан с диска")
+
+    monkeypatch.setattr(OpcPackage, "open", classmethod(no_reads))
+    totals = create(generator, winners, template, output_dir)
+    monkeypatch.undo()
+
+    assert totals["diplomas"] == len(winners)
+    check_combined(os.path.join(output_dir, "Все.docx"), winners, template)
+    assert sorted(os.listdir(output_dir)) == sorted(
+        ["Все.docx", "Все.pdf"]
+        + [f"Диплом_{participant.safe_fio}.pdf" for participant in winners]
+    )
+
+
+@pytest.mark.parametrize("combined_conversion", [False, True])
+def test_cached_diplomas_stay_in_combined_docx(
+    tmp_path, template, winners, combined_conversion
+):
+    output_dir = str(tmp_path / "output")
+    os.makedirs(output_dir)
+    cache = PdfCache(str(tmp_path / "cache"))
+    generator = DiplomaGenerator(combined_conversion=combined_conversion)
+    create(generator, winners[:3], template, output_dir, cache)
+
+    totals = create(generator, winners, template, output_dir, cache)
+
+    assert (totals["diplomas"], totals["cached"]) == (5, 3)
+    check_combined(os.path.join(output_dir, "Все.docx"), winners, template)
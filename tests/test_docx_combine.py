@@ -0,0 +1,148 @@
+import io
+import struct
+import zlib
+
+import pytest
+from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+
+from docx_combine import RELATIONSHIP_NAMESPACE, CombinedDocument
+
+
+def png(color):
+    """PNG 1x1 пиксель заданного цвета (r, g, b)"""
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    header = struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0)
+    pixels = zlib.compress(b"\x00" + bytes(color))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", pixels)
+        + chunk(b"IEND", b"")
+    )
+
+
+LOGO = png((0, 0, 255))
+
+
+def make_document(name, photo_color, url):
+    """Документ с колонтитулом, общим логотипом, своим фото и ссылкой"""
+    document = Document()
+    document.sections[0].header.paragraphs[0].text = f"Колонтитул {name}"
+    document.add_paragraph(f"Документ {name}")
+    document.add_picture(io.BytesIO(LOGO))
+    document.add_picture(io.BytesIO(png(photo_color)))
+
+    rid = document.part.relate_to(url, RT.HYPERLINK, is_external=True)
+    paragraph = document.add_paragraph()
+    paragraph._p.append(
+        parse_xml(
+            f'<w:hyperlink {nsdecls("w", "r")} r:id="{rid}">'
+            f"<w:r><w:t>{url}</w:t></w:r></w:hyperlink>"
+        )
+    )
+    return document
+
+
+def reopen(combined):
+    stream = io.BytesIO()
+    combined.save(stream)
+    stream.seek(0)
+    return Document(stream)
+
+
+def relationship_ids(element):
+    for node in element.iter():
+        for name, value in node.attrib.items():
+            if name.startswith(RELATIONSHIP_NAMESPACE):
+                yield value
+
+
+@pytest.fixture
+def combined():
+    combined = CombinedDocument()
+    combined.append(make_document("A", (255, 0, 0), "https://example.com/a"))
+    combined.append(make_document("B", (0, 255, 0), "https://example.com/b"))
+    return combined
+
+
+def test_every_relationship_resolves(combined):
+    document = reopen(combined)
+    rels = document.part.rels
+
+    ids = list(relationship_ids(document.element.body))
+    assert ids
+    assert all(rid in rels for rid in ids)
+
+
+def test_sections_keep_their_headers(combined):
+    document = reopen(combined)
+
+    assert combined.count == 2
+    assert [section.header.paragraphs[0].text for section in document.sections] == [
+        "Колонтитул A",
+        "Колонтитул B",
+    ]
+
+
+def test_images_are_remapped_and_shared(combined):
+    document = reopen(combined)
+    rels = document.part.rels
+
+    blips = [
+        rels[blip.get(qn("r:embed"))].target_part.blob
+        for blip in document.element.body.iter(qn("a:blip"))
+    ]
+
+    assert blips == [LOGO, png((255, 0, 0)), LOGO, png((0, 255, 0))]
+    images = {
+        rel.target_part.partname for rel in rels.values() if rel.reltype == RT.IMAGE
+    }
+    assert len(images) == 3
+
+
+def test_external_links_are_remapped(combined):
+    document = reopen(combined)
+    rels = document.part.rels
+
+    links = [
+        rels[link.get(qn("r:id"))].target_ref
+        for link in document.element.body.iter(qn("w:hyperlink"))
+    ]
+
+    assert links == ["https://example.com/a", "https://example.com/b"]
+
+
+def test_drawing_ids_are_unique(combined):
+    document = reopen(combined)
+
+    ids = [drawing.get("id") for drawing in document.element.body.iter(qn("wp:docPr"))]
+
+    assert len(ids) == 4
+    assert len(set(ids)) == 4
+
+
+def test_empty_document_cannot_be_saved():
+    with pytest.raises(ValueError):
+        CombinedDocument().save(io.BytesIO())
+
+
+def test_appended_documents_are_not_modified():
+    first = make_document("A", (255, 0, 0), "https://example.com/a")
+    second = make_document("B", (0, 255, 0), "https://example.com/b")
+    before = [[p.text for p in document.paragraphs] for document in (first, second)]
+
+    combined = CombinedDocument()
+    combined.append(first)
+    combined.append(second)
+
+    assert [
+        [p.text for p in document.paragraphs] for document in (first, second)
+    ] == before
+    assert len(reopen(combined).sections) == 2
@@ -0,0 +1,217 @@
+import io
+import zipfile
+
+import pytest
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from lxml import etree
+
+from docx_templates import (
+    CompiledTemplate,
+    iter_story_parts,
+    load_template,
+    replace_placeholders,
+)
+
+
+def make_paragraph(*runs):
+    """Параграф из runs: (текст, полужирный)"""
+    paragraph = Document().add_paragraph()
+    for text, bold in runs:
+        paragraph.add_run(text).bold = bold
+    return paragraph
+
+
+def run_texts(paragraph):
+    return [(run.text, run.bold) for run in paragraph.runs]
+
+
+def test_split_placeholder_takes_first_run_formatting():
+    paragraph = make_paragraph(("{ФИО_", True), ("участника}", False))
+
+    found = replace_placeholders(paragraph, {"{ФИО_участника}": "Иванов"})
+
+    assert found == ["{ФИО_участника}"]
+    assert run_texts(paragraph) == [("Иванов", True), ("", False)]
+
+
+def test_longer_placeholder_wins():
+    paragraph = make_paragraph(("{Название_доклада*} и {Название_доклада}", None))
+
+    found = replace_placeholders(
+        paragraph,
+        {"{Название_доклада}": "Доклад", "{Название_доклада*}": "«Доклад»"},
+    )
+
+    assert found == ["{Название_доклада*}", "{Название_доклада}"]
+    assert paragraph.text == "«Доклад» и Доклад"
+
+
+def test_surrounding_text_stays_in_its_runs():
+    paragraph = make_paragraph(
+        ("Награждается ", False),
+        ("{ФИО_", True),
+        ("участника}", None),
+        (" за доклад", False),
+    )
+
+    replace_placeholders(paragraph, {"{ФИО_участника}": "Иванов И. И."})
+
+    assert run_texts(paragraph) == [
+        ("Награждается ", False),
+        ("Иванов И. И.", True),
+        ("", None),
+        (" за доклад", False),
+    ]
+
+
+def test_edge_spaces_are_preserved():
+    paragraph = make_paragraph(("{ФИО_участника}", None), (" - участник", None))
+
+    replace_placeholders(paragraph, {"{ФИО_участника}": " Иванов "})
+
+    nodes = paragraph._p.findall(".//" + qn("w:t"))
+    assert [node.text for node in nodes] == [" Иванов ", " - участник"]
+    assert all(node.get(qn("xml:space")) == "preserve" for node in nodes)
+
+
+def test_text_without_placeholders_is_not_touched():
+    paragraph = make_paragraph(("Текст {без замен}", None))
+
+    assert replace_placeholders(paragraph, {"{ФИО_участника}": "Иванов"}) == []
+    assert paragraph.text == "Текст {без замен}"
+    assert paragraph.runs[0]._r.find(qn("w:t")).get(qn("xml:space")) is None
+
+
+def test_alignment_is_applied_only_to_matching_paragraphs():
+    alignments = {"{Название_доклада}": WD_ALIGN_PARAGRAPH.CENTER}
+    with_title = make_paragraph(("{Название_доклада}", None))
+    without_title = make_paragraph(("{ФИО_участника}", None))
+    replacements = {"{Название_доклада}": "Доклад", "{ФИО_участника}": "Иванов"}
+
+    replace_placeholders(with_title, replacements, alignments)
+    replace_placeholders(without_title, replacements, alignments)
+
+    assert with_title.alignment == WD_ALIGN_PARAGRAPH.CENTER
+    assert without_title.alignment is None
+
+
+def test_last_matching_alignment_wins():
+    paragraph = make_paragraph(("{ФИО_участника}: {Название_доклада}", None))
+    alignments = {
+        "{ФИО_участника}": WD_ALIGN_PARAGRAPH.LEFT,
+        "{Название_доклада}": WD_ALIGN_PARAGRAPH.RIGHT,
+    }
+
+    replace_placeholders(
+        paragraph,
+        {"{Название_доклада}": "Доклад", "{ФИО_участника}": "Иванов"},
+        alignments,
+    )
+
+    assert paragraph.alignment == WD_ALIGN_PARAGRAPH.RIGHT
+    assert paragraph.text == "Иванов: Доклад"
+
+
+# Надпись (текстовое поле) с плейсхолдером внутри run
+TEXT_BOX_XML = (
+    f'<w:r {nsdecls("w")} xmlns:v="urn:schemas-microsoft-com:vml">'
+    "<w:pict><v:shape><v:textbox><w:txbxContent>"
+    "<w:p><w:r><w:t>{Текст_надписи}</w:t></w:r></w:p>"
+    "</w:txbxContent></v:textbox></v:shape></w:pict></w:r>"
+)
+
+NESTED_PLACEHOLDERS = {
+    "{Тело}",
+    "{Внешняя_таблица}",
+    "{Вложенная_таблица}",
+    "{Верхний_колонтитул}",
+    "{Нижний_колонтитул}",
+    "{Текст_надписи}",
+}
+
+
+@pytest.fixture
+def nested_template(tmp_path):
+    """Шаблон с плейсхолдерами во всех местах, где их ищет индекс"""
+    document = Document()
+    section = document.sections[0]
+    section.header.paragraphs[0].text = "{Верхний_колонтитул}"
+    section.footer.paragraphs[0].text = "{Нижний_колонтитул}"
+    document.add_paragraph("Тело: {Тело}")
+
+    outer = document.add_table(rows=1, cols=1)
+    cell = outer.cell(0, 0)
+    cell.paragraphs[0].text = "{Внешняя_таблица}"
+    inner = cell.add_table(rows=1, cols=1)
+    inner.cell(0, 0).paragraphs[0].text = "{Вложенная_таблица}"
+
+    document.add_paragraph("Надпись:")._p.append(parse_xml(TEXT_BOX_XML))
+
+    path = tmp_path / "nested.docx"
+    document.save(str(path))
+    return str(path)
+
+
+def all_text(data):
+    """Текст всех w:t во всех частях документа"""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        return " ".join(
+            node.text or ""
+            for name in archive.namelist()
+            if name.startswith("word/") and name.endswith(".xml")
+            for node in etree.fromstring(archive.read(name)).iter(qn("w:t"))
+        )
+
+
+def saved(document):
+    stream = io.BytesIO()
+    document.save(stream)
+    return stream.getvalue()
+
+
+def source_xml(template):
+    """XML всех частей исходного документа шаблона"""
+    return {
+        name: etree.tostring(root) for name, root in iter_story_parts(template._source)
+    }
+
+
+def test_index_covers_nested_tables_headers_footers_and_text_boxes(nested_template):
+    template = CompiledTemplate(nested_template)
+
+    assert template.placeholders == NESTED_PLACEHOLDERS
+    parts = {location.part for location in template.locations}
+    assert "word/document.xml" in parts
+    assert any(part.startswith("word/header") for part in parts)
+    assert any(part.startswith("word/footer") for part in parts)
+    # Индекс хранит только параграфы с плейсхолдерами
+    assert sum(len(paths) for paths in template.index.values()) == 6
+    assert "Тело: {Тело}" in set(template.placeholder_paragraphs())
+
+
+@pytest.mark.parametrize("renderer", ["docx", "zip"])
+def test_render_fills_every_indexed_paragraph(nested_template, renderer):
+    template = load_template(nested_template, renderer)
+    replacements = {placeholder: "Значение" for placeholder in NESTED_PLACEHOLDERS}
+
+    text = all_text(saved(template.render(replacements, replace_placeholders)))
+    assert "{" not in text
+    assert text.count("Значение") == len(NESTED_PLACEHOLDERS)
+
+
+def test_render_leaves_source_unmodified(nested_template):
+    template = CompiledTemplate(nested_template)
+    source = source_xml(template)
+
+    for value in ("Первый", "Второй", "Третий"):
+        replacements = {placeholder: value for placeholder in NESTED_PLACEHOLDERS}
+        document = template.render(replacements, replace_placeholders)
+        assert value in all_text(saved(document))
+
+    assert source_xml(template) == source
+    # Каждая копия заполняется из исходного шаблона, а не из предыдущей копии
+    document = template.render({"{Тело}": "Последний"}, replace_placeholders)
+    assert "{Внешняя_таблица}" in all_text(saved(document))
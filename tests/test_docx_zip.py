@@ -0,0 +1,86 @@
+import io
+import os
+import zipfile
+
+import pytest
+from docx import Document
+from lxml import etree
+
+from docx_templates import load_template, replace_placeholders
+from docx_zip import TEXT_PART_PATTERN
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TEMPLATES = [
+    "Шаблон_благодарственное.docx",
+    "Шаблон_сертификат.docx",
+    "Шаблон_призер.docx",
+    "Шаблон_приглашение.docx",
+]
+
+
+def render_bytes(template_path, replacements, renderer):
+    template = load_template(template_path, renderer)
+    document = template.render(replacements, replace_placeholders)
+    stream = io.BytesIO()
+    document.save(stream)
+    return stream.getvalue()
+
+
+def text_parts(data):
+    """XML части с текстом в каноническом виде: {имя части: XML}"""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        return {
+            name: etree.tostring(etree.fromstring(archive.read(name)), method="c14n")
+            for name in archive.namelist()
+            if TEXT_PART_PATTERN.match(name)
+        }
+
+
+def replacements_for(template_path, value):
+    template = load_template(template_path)
+    return {placeholder: value for placeholder in template.placeholders}
+
+
+@pytest.mark.parametrize("name", TEMPLATES)
+def test_zip_renderer_matches_docx_renderer(name):
+    template_path = os.path.join(REPO_DIR, name)
+    replacements = replacements_for(template_path, "Иванов Иван Иванович")
+
+    docx_data = render_bytes(template_path, replacements, "docx")
+    zip_data = render_bytes(template_path, replacements, "zip")
+
+    assert text_parts(zip_data) == text_parts(docx_data)
+    with zipfile.ZipFile(io.BytesIO(zip_data)) as archive:
+        assert archive.testzip() is None
+
+
+@pytest.mark.parametrize("renderer", ["docx", "zip"])
+def test_special_characters_are_escaped(renderer):
+    template_path = os.path.join(REPO_DIR, "Шаблон_приглашение.docx")
+    replacements = replacements_for(template_path, "A <&> B")
+
+    data = render_bytes(template_path, replacements, renderer)
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        xml = archive.read("word/document.xml").decode("utf-8")
+    assert "A &lt;&amp;&gt; B" in xml
+    text = "\n".join(p.text for p in Document(io.BytesIO(data)).paragraphs)
+    assert "A <&> B" in text
+    assert "{" not in text
+
+
+def test_unchanged_parts_are_copied_byte_for_byte():
+    template_path = os.path.join(REPO_DIR, "Шаблон_сертификат.docx")
+    replacements = replacements_for(template_path, "Значение")
+
+    data = render_bytes(template_path, replacements, "zip")
+
+    with zipfile.ZipFile(template_path) as source, zipfile.ZipFile(
+        io.BytesIO(data)
+    ) as rendered:
+        assert rendered.namelist() == source.namelist()
+        for name in source.namelist():
+            if name != "word/document.xml":
+                assert rendered.read(name) == source.read(name), name
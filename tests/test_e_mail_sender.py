@@ -0,0 +1,161 @@
+import asyncio
+import configparser
+import smtplib
+import threading
+
+from benchmarks.smtp_sink import SmtpSink
+from e_mail_sender import EmailTemplate, create_email_body, send_invitations_async
+from send_ledger import SendLedger
+from smtp_mailer import create_mailer
+
+
+def make_config(tmp_path):
+    template_path = tmp_path / "email_template.html"
+    template_path.write_text("<p>{fio}: {paper_title}</p>", encoding="utf-8")
+    config = configparser.ConfigParser()
+    config["files"] = {"email_template": str(template_path)}
+    return config
+
+
+def make_outbox(count):
+    return [
+        (f"user{i}@example.com", f"Участник {i}", f"Доклад {i}", None, b"%PDF")
+        for i in range(count)
+    ]
+
+
+class RecordingMailer:
+    """Заглушка пула SMTP сессий, отказывающая указанным адресатам"""
+
+    def __init__(self, rejected=()):
+        self.rejected = set(rejected)
+        self.recipients = []
+
+    def send(self, msg):
+        if msg["To"] in self.rejected:
+            raise smtplib.SMTPRecipientsRefused({msg["To"]: (550, b"rejected")})
+        self.recipients.append(msg["To"])
+
+
+def test_on_sent_reports_each_delivered_message(tmp_path):
+    outbox = make_outbox(5)
+    mailer = RecordingMailer(rejected={"user3@example.com"})
+    positions = []
+
+    results = asyncio.run(
+        send_invitations_async(
+            outbox,
+            "sender@example.com",
+            "",
+            make_config(tmp_path),
+            mailer,
+            2,
+            positions.append,
+        )
+    )
+
+    assert results == [(item[0], item[0] != "user3@example.com") for item in outbox]
+    assert sorted(positions) == [0, 1, 2, 4]
+
+
+def test_on_sent_marks_ledger_before_sending_finishes(tmp_path):
+    outbox = make_outbox(2)
+    keys = ["key0", "key1"]
+    first_marked = threading.Event()
+    waited = []
+
+    class SlowMailer(RecordingMailer):
+        def send(self, msg):
+            # Второе письмо ждет, пока первое будет записано в журнал
+            if msg["To"] == outbox[1][0]:
+                waited.append(first_marked.wait(10))
+            super().send(msg)
+
+    with SendLedger(str(tmp_path / "ledger.sqlite3")) as ledger:
+
+        def on_sent(position):
+            ledger.mark(outbox[position][0], keys[position], "sent")
+            if position == 0:
+                first_marked.set()
+
+        asyncio.run(
+            send_invitations_async(
+                outbox,
+                "sender@example.com",
+                "",
+                make_config(tmp_path),
+                SlowMailer(),
+                2,
+                on_sent,
+            )
+        )
+
+        assert waited == [True]
+        assert ledger.is_sent(outbox[0][0], "key0")
+        assert ledger.is_sent(outbox[1][0], "key1")
+
+
+def sink_config(tmp_path, port):
+    config = make_config(tmp_path)
+    config["email"] = {
+        "smtp_server": "127.0.0.1",
+        "smtp_port": str(port),
+        "starttls": "false",
+        "sessions": "3",
+        "messages_per_session": "4",
+    }
+    config["rate_limits"] = {"smtp": "0"}
+    return config
+
+
+def test_async_sending_delivers_through_smtp_sink(tmp_path):
+    outbox = make_outbox(12)
+    rejected = {"user2@example.com", "user7@example.com"}
+    positions = []
+
+    with SmtpSink(rejected=rejected) as sink:
+        config = sink_config(tmp_path, sink.port)
+        with create_mailer(config, "sender@example.com", "", 3) as mailer:
+            results = asyncio.run(
+                send_invitations_async(
+                    outbox,
+                    "sender@example.com",
+                    "",
+                    config,
+                    mailer,
+                    3,
+                    positions.append,
+                )
+            )
+
+    emails = [item[0] for item in outbox]
+    delivered = [email for email in emails if email not in rejected]
+    # Результаты в порядке outbox, отклоненные адреса отмечены как неудача
+    assert results == [(email, email not in rejected) for email in emails]
+    assert sink.messages == len(delivered)
+    assert sorted(sink.recipients) == sorted(delivered)
+    assert sorted(positions) == [
+        i for i, email in enumerate(emails) if email not in rejected
+    ]
+
+
+def test_email_template_escapes_values_but_not_markup():
+    template = EmailTemplate(
+        '<p class="greeting">Уважаемый(ая) <b>{fio}</b>!</p>\n'
+        "<p>Доклад «{paper_title}» & {fio}</p>"
+    )
+
+    body = template.render(fio="Иванов <И.И.>", paper_title='"A & B" <script>')
+
+    assert body == (
+        '<p class="greeting">Уважаемый(ая) <b>Иванов &lt;И.И.&gt;</b>!</p>\n'
+        "<p>Доклад «&quot;A &amp; B&quot; &lt;script&gt;» & Иванов &lt;И.И.&gt;</p>"
+    )
+
+
+def test_email_body_is_built_from_configured_template(tmp_path):
+    config = make_config(tmp_path)
+
+    assert (
+        create_email_body("Петров", "<Тема>", config) == "<p>Петров: &lt;Тема&gt;</p>"
+    )
@@ -0,0 +1,135 @@
+import collections
+import configparser
+import os
+
+import pytest
+
+from pdf_cache import PdfCache, create_pdf_cache, pdf_path_for
+
+
+Job = collections.namedtuple("Job", ["template_path", "replacements", "output_path"])
+
+
+class FakeOverlay:
+    def __init__(self, digest):
+        self.value = digest
+
+    def digest(self, template_path):
+        return self.value
+
+
+@pytest.fixture
+def template(tmp_path):
+    path = tmp_path / "template.docx"
+    path.write_bytes(b"template")
+    return str(path)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PdfCache(str(tmp_path / "cache"))
+
+
+def write_pdf(path, data=b"%PDF"):
+    with open(path, "wb") as file:
+        file.write(data)
+    return path
+
+
+def test_key_depends_on_values_not_their_order(cache, template):
+    key = cache.key(template, {"{A}": "1", "{B}": "2"})
+
+    assert cache.key(template, {"{B}": "2", "{A}": "1"}) == key
+    assert cache.key(template, {"{A}": "1", "{B}": "3"}) != key
+
+
+def test_key_depends_on_template_content(cache, template):
+    key = cache.key(template, {"{A}": "1"})
+
+    with open(template, "ab") as file:
+        file.write(b" changed")
+
+    assert cache.key(template, {"{A}": "1"}) != key
+
+
+def test_key_depends_on_version_and_overlay(tmp_path, template):
+    replacements = {"{A}": "1"}
+    keys = {
+        PdfCache(str(tmp_path / "a"), version="word::docx").key(template, replacements),
+        PdfCache(str(tmp_path / "b"), version="word::zip").key(template, replacements),
+        PdfCache(str(tmp_path / "c"), overlay=FakeOverlay("one")).key(
+            template, replacements
+        ),
+        PdfCache(str(tmp_path / "d"), overlay=FakeOverlay("two")).key(
+            template, replacements
+        ),
+    }
+
+    assert len(keys) == 4
+
+
+def test_store_and_fetch(cache, tmp_path):
+    source = write_pdf(str(tmp_path / "source.pdf"), b"%PDF-1")
+    cache.store("ab" * 32, source)
+
+    target = str(tmp_path / "target.pdf")
+    assert cache.fetch("ab" * 32, target)
+    assert not cache.fetch("cd" * 32, str(tmp_path / "other.pdf"))
+
+    with open(target, "rb") as file:
+        assert file.read() == b"%PDF-1"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_restore_returns_keys_for_misses(cache, template, tmp_path):
+    cached = Job(template, {"{A}": "1"}, str(tmp_path / "cached.docx"))
+    missing = Job(template, {"{A}": "2"}, str(tmp_path / "missing.docx"))
+    source = write_pdf(str(tmp_path / "source.pdf"))
+    cache.store(cache.key(cached.template_path, cached.replacements), source)
+
+    restored, keys = cache.restore([cached, missing])
+
+    assert restored == {cached.output_path}
+    assert os.path.exists(pdf_path_for(cached.output_path))
+    assert keys == {
+        missing.output_path: cache.key(missing.template_path, missing.replacements)
+    }
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    cache = PdfCache(str(tmp_path / "cache"), max_bytes=250)
+    source = write_pdf(str(tmp_path / "source.pdf"), b"x" * 100)
+    keys = ["aa" * 32, "bb" * 32, "cc" * 32]
+    for age, key in enumerate(keys):
+        cache.store(key, source)
+        entry = cache._entry_path(key)
+        os.utime(entry, (1000 + age, 1000 + age))
+    # Обращение к самому старому файлу делает его недавно использованным
+    cache.fetch(keys[0], str(tmp_path / "target.pdf"))
+
+    assert cache.evict() == 1
+    assert os.path.exists(cache._entry_path(keys[0]))
+    assert not os.path.exists(cache._entry_path(keys[1]))
+    assert os.path.exists(cache._entry_path(keys[2]))
+
+
+def test_evict_without_limit_keeps_everything(cache, tmp_path):
+    cache.store("aa" * 32, write_pdf(str(tmp_path / "source.pdf")))
+
+    assert cache.evict() == 0
+    assert os.path.exists(cache._entry_path("aa" * 32))
+
+
+def test_create_pdf_cache_follows_config(tmp_path):
+    config = configparser.ConfigParser()
+    config.read_string("[cache]\nenabled = false\n")
+    assert create_pdf_cache(config, str(tmp_path)) is None
+
+    config.read_string(
+        "[cache]\nenabled = true\ndirectory = pdfs\nmax_size_mb = 2\n"
+        "converter_version = 16\n"
+    )
+    cache = create_pdf_cache(config, str(tmp_path), "libreoffice", "zip")
+    assert cache.directory == str(tmp_path / "pdfs")
+    assert cache.max_bytes == 2 * 1024 * 1024
+    assert cache.version == "libreoffice:16:zip"
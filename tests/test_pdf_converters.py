@@ -0,0 +1,162 @@
+import io
+
+import pytest
+from docx import Document
+
+from pdf_converters import ConversionError, FakeWorker, PdfConverter
+
+
+class ScriptedWorker(FakeWorker):
+    """Исполнитель-заглушка, ошибки которого заданы заранее
+
+    failures - общий список: каждая конвертация берет из него первый
+    элемент и вызывает это исключение (None - успешная конвертация).
+    """
+
+    def __init__(self, number, failures, log):
+        self.number = number
+        self.failures = failures
+        self.log = log
+        self.alive = True
+
+    def start(self):
+        self.log.append(("start", self.number))
+
+    def stop(self):
+        self.alive = False
+        self.log.append(("stop", self.number))
+
+    def is_alive(self):
+        return self.alive
+
+    def convert_bytes(self, docx_data):
+        self.log.append(("convert", self.number))
+        error = self.failures.pop(0) if self.failures else None
+        if error is not None:
+            raise error
+        return super().convert_bytes(docx_data)
+
+
+@pytest.fixture
+def docx_data():
+    stream = io.BytesIO()
+    Document().save(stream)
+    return stream.getvalue()
+
+
+def make_converter(failures=None, **kwargs):
+    log = []
+    failures = failures if failures is not None else []
+    numbers = iter(range(100))
+    converter = PdfConverter(
+        lambda index: ScriptedWorker(next(numbers), failures, log), **kwargs
+    )
+    return converter, log
+
+
+def test_worker_is_reused(docx_data):
+    converter, log = make_converter()
+    with converter:
+        for _ in range(3):
+            assert converter.convert_bytes(docx_data).startswith(b"%PDF")
+
+    assert log == [("start", 0)] + [("convert", 0)] * 3 + [("stop", 0)]
+
+
+def test_failed_worker_is_restarted_and_document_retried(docx_data):
+    converter, log = make_converter([ConnectionError("worker crashed")])
+    with converter:
+        assert converter.convert_bytes(docx_data).startswith(b"%PDF")
+
+    assert log == [
+        ("start", 0),
+        ("convert", 0),
+        ("stop", 0),
+        ("start", 1),
+        ("convert", 1),
+        ("stop", 1),
+    ]
+
+
+def test_dead_worker_is_replaced_before_use(docx_data):
+    converter, log = make_converter()
+    with converter:
+        converter.convert_bytes(docx_data)
+        # Исполнитель завершился между документами
+        index, worker = converter._idle.get()
+        worker.alive = False
+        converter._idle.put((index, worker))
+        converter.convert_bytes(docx_data)
+
+    assert ("start", 1) in log
+    assert log[-2:] == [("convert", 1), ("stop", 1)]
+
+
+def test_document_error_keeps_worker(docx_data):
+    converter, log = make_converter([ValueError("broken document")])
+    with converter:
+        with pytest.raises(ConversionError):
+            converter.convert_bytes(docx_data, "broken.docx")
+        converter.convert_bytes(docx_data)
+
+    assert [entry for entry in log if entry[0] == "start"] == [("start", 0)]
+
+
+def test_repeated_worker_failure_raises(docx_data):
+    failures = [TimeoutError("hung"), TimeoutError("hung again")]
+    converter, log = make_converter(failures)
+    with converter:
+        with pytest.raises(ConversionError):
+            converter.convert_bytes(docx_data)
+        # Пул продолжает работать с новым исполнителем
+        assert converter.convert_bytes(docx_data).startswith(b"%PDF")
+
+    assert [entry for entry in log if entry[0] == "start"] == [
+        ("start", 0),
+        ("start", 1),
+        ("start", 2),
+    ]
+
+
+def test_worker_is_recycled_after_limit(docx_data):
+    converter, log = make_converter(recycle_after=3)
+    with converter:
+        for _ in range(7):
+            converter.convert_bytes(docx_data)
+
+    conversions = [number for action, number in log if action == "convert"]
+    assert conversions == [0, 0, 0, 1, 1, 1, 2]
+    assert log.count(("stop", 0)) == 1
+    assert log.count(("stop", 1)) == 1
+
+
+def test_batch_with_failed_worker_reports_chunk_errors(tmp_path):
+    pairs = []
+    for number in range(4):
+        docx_path = tmp_path / f"{number}.docx"
+        Document().save(str(docx_path))
+        pairs.append((str(docx_path), str(tmp_path / f"{number}.pdf")))
+
+    class FailingBatchWorker(ScriptedWorker):
+        def convert_many(self, chunk):
+            if self.number == 0:
+                self.alive = False
+                raise ConnectionError("worker crashed")
+            return super().convert_many(chunk)
+
+    log = []
+    numbers = iter(range(100))
+    converter = PdfConverter(
+        lambda index: FailingBatchWorker(next(numbers), [], log), batch_size=2
+    )
+    with converter:
+        results = converter.convert_batch(pairs)
+
+    assert [error for _, _, error in results] == [
+        "worker crashed",
+        "worker crashed",
+        None,
+        None,
+    ]
+    assert ("stop", 0) in log
+    assert (tmp_path / "2.pdf").exists() and not (tmp_path / "0.pdf").exists()
@@ -0,0 +1,216 @@
+import configparser
+import os
+
+import pytest
+from docx import Document
+from PyPDF2 import PdfReader
+
+pytest.importorskip("reportlab")
+
+from pdf_converters import FakeWorker, PdfConverter
+from pdf_overlay import (
+    OverlayField,
+    create_overlay_renderer,
+    fit_text,
+    parse_field,
+    register_font,
+    wrap_text,
+)
+from render_pool import RenderJob
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def font_name():
+    try:
+        return register_font("")
+    except RuntimeError as e:
+        pytest.skip(str(e))
+
+
+def text_width(text, font_name, size):
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    return stringWidth(text, font_name, size)
+
+
+def test_parse_field_with_all_values():
+    assert parse_field("36, 470.5, 523, 24, Left, 3") == OverlayField(
+        36.0, 470.5, 523.0, 24.0, "left", 3
+    )
+
+
+def test_parse_field_defaults():
+    assert parse_field("10,20,30,12") == OverlayField(
+        10.0, 20.0, 30.0, 12.0, "center", 1
+    )
+    assert parse_field("10, 20, 30, 12, right, 0").lines == 1
+
+
+@pytest.mark.parametrize(
+    "value",
+    ["10, 20, 30", "1, 2, 3, 4, left, 2, 7", "1, 2, 3, 4, justify", "x, 2, 3, 4"],
+)
+def test_parse_field_rejects_bad_values(value):
+    with pytest.raises(ValueError):
+        parse_field(value)
+
+
+def test_wrap_text_keeps_short_text_on_one_line(font_name):
+    assert wrap_text("Иванов Иван", font_name, 12, 500, 1) == ["Иванов Иван"]
+    assert wrap_text("", font_name, 12, 500, 1) == []
+
+
+def test_wrap_text_breaks_by_words(font_name):
+    text = "Исследование свойств материалов при низких температурах"
+    width = text_width("Исследование свойств", font_name, 12) + 1
+
+    lines = wrap_text(text, font_name, 12, width, 5)
+
+    assert " ".join(lines) == text
+    assert len(lines) > 1
+    assert all(text_width(line, font_name, 12) <= width for line in lines)
+
+
+def test_wrap_text_reports_overflow(font_name):
+    text = "Исследование свойств материалов при низких температурах"
+    width = text_width("Исследование свойств", font_name, 12) + 1
+
+    # Строк больше допустимого
+    assert wrap_text(text, font_name, 12, width, 1) is None
+    # Одно слово шире поля
+    assert wrap_text("Электроэнцефалография", font_name, 12, 20, 3) is None
+
+
+def test_fit_text_uses_field_size_when_text_fits(font_name):
+    field = OverlayField(0, 0, 500, 24, "center", 1)
+
+    assert fit_text("Иванов Иван", font_name, field, 8) == (24, ["Иванов Иван"])
+
+
+def test_fit_text_reduces_size(font_name):
+    text = "Иванов Иван Иванович"
+    width = text_width(text, font_name, 18)
+    field = OverlayField(0, 0, width, 24, "center", 1)
+
+    size, lines = fit_text(text, font_name, field, 8)
+
+    assert 8 <= size <= 18
+    assert lines == [text]
+
+
+def test_fit_text_raises_when_text_does_not_fit(font_name):
+    field = OverlayField(0, 0, 40, 24, "center", 2)
+
+    with pytest.raises(ValueError, match="не помещается"):
+        fit_text("Очень длинное название доклада о многом", font_name, field, 8)
+
+
+def make_template(path, paragraphs):
+    document = Document()
+    for text in paragraphs:
+        document.add_paragraph(text)
+    document.save(str(path))
+    return str(path)
+
+
+def overlay_config(sections):
+    config = configparser.ConfigParser()
+    config.read_dict({"overlay": {"font": "", "min_font_size": "8"}, **sections})
+    return config
+
+
+@pytest.fixture
+def converter():
+    with PdfConverter(lambda index: FakeWorker(), name="fake") as converter:
+        yield converter
+
+
+@pytest.fixture
+def separate_template(tmp_path):
+    return make_template(
+        tmp_path / "Сертификат.docx",
+        ["Сертификат участника", "{ФИО_участника}", "{Название_доклада}"],
+    )
+
+
+LAYOUT = {
+    "ФИО_участника": "36, 470, 523, 24, center, 1",
+    "Название_доклада": "36, 380, 523, 20, left, 3",
+}
+
+
+def test_layout_reads_fields(separate_template, converter, tmp_path, font_name):
+    config = overlay_config({"overlay:Сертификат.docx": LAYOUT})
+
+    renderer = create_overlay_renderer(
+        config, converter, str(tmp_path), [separate_template]
+    )
+    fields, _, _, min_font_size = renderer.layout(separate_template)
+
+    assert fields == {
+        "{ФИО_участника}": OverlayField(36, 470, 523, 24, "center", 1),
+        "{Название_доклада}": OverlayField(36, 380, 523, 20, "left", 3),
+    }
+    assert min_font_size == 8
+
+
+def test_layout_requires_section(separate_template, converter, tmp_path, font_name):
+    with pytest.raises(ValueError, match="нет секции"):
+        create_overlay_renderer(
+            overlay_config({}), converter, str(tmp_path), [separate_template]
+        )
+
+
+def test_layout_requires_every_field(separate_template, converter, tmp_path, font_name):
+    config = overlay_config(
+        {"overlay:Сертификат.docx": {"ФИО_участника": LAYOUT["ФИО_участника"]}}
+    )
+
+    with pytest.raises(ValueError, match="Название_доклада"):
+        create_overlay_renderer(config, converter, str(tmp_path), [separate_template])
+
+
+def test_layout_rejects_inline_placeholders(converter, tmp_path, font_name):
+    template = make_template(
+        tmp_path / "Сертификат.docx",
+        ["{ФИО_участника}", "выступил(а) с докладом «{Название_доклада}»"],
+    )
+    config = overlay_config({"overlay:Сертификат.docx": LAYOUT})
+
+    with pytest.raises(ValueError, match="Название_доклада"):
+        create_overlay_renderer(config, converter, str(tmp_path), [template])
+
+
+def test_repository_templates_need_separate_placeholder_paragraphs(
+    converter, tmp_path, font_name
+):
+    # Шаблоны из репозитория не готовы к наложению (см. [overlay] в config.ini)
+    template = os.path.join(REPO_DIR, "Шаблон_сертификат.docx")
+    config = overlay_config({"overlay:Шаблон_сертификат.docx": LAYOUT})
+
+    with pytest.raises(ValueError, match="отдельным параграфом"):
+        create_overlay_renderer(config, converter, str(tmp_path), [template])
+
+
+def test_render_jobs_draw_text_on_background(
+    separate_template, converter, tmp_path, font_name
+):
+    config = overlay_config({"overlay:Сертификат.docx": LAYOUT})
+    renderer = create_overlay_renderer(
+        config, converter, str(tmp_path / "backgrounds"), [separate_template]
+    )
+    job = RenderJob(
+        separate_template,
+        {"{ФИО_участника}": "Иванов Иван", "{Название_доклада}": "Теплопроводность"},
+        str(tmp_path / "Иванов.docx"),
+    )
+
+    ((rendered, error),) = list(renderer.render_jobs([job]))
+
+    assert error is None
+    reader = PdfReader(str(tmp_path / "Иванов.pdf"))
+    assert len(reader.pages) == 1
+    text = reader.pages[0].extract_text()
+    assert "Иванов Иван" in text and "Теплопроводность" in text
@@ -0,0 +1,97 @@
+import random
+import threading
+import time
+
+from pipeline import PipelineResult, PipelineStage, run_pipeline
+
+
+def test_results_keep_input_order():
+    def jitter(item):
+        time.sleep(random.random() / 500)
+        return item
+
+    stages = [
+        PipelineStage("double", lambda item: jitter(item * 2), 4),
+        PipelineStage("increment", lambda item: jitter(item + 1), 3),
+    ]
+
+    results = run_pipeline(range(50), stages, queue_size=2)
+
+    assert results == [PipelineResult(item * 2 + 1, None, None) for item in range(50)]
+
+
+def test_failed_item_stops_at_its_stage():
+    later = []
+
+    def check(item):
+        if item % 3 == 0:
+            raise ValueError(f"bad {item}")
+        return item
+
+    def record(item):
+        later.append(item)
+        return item
+
+    stages = [PipelineStage("check", check, 2), PipelineStage("record", record, 2)]
+
+    results = run_pipeline(range(7), stages)
+
+    assert [result.failed_stage for result in results] == [
+        "check" if item % 3 == 0 else None for item in range(7)
+    ]
+    assert results[3] == PipelineResult(3, "check", "bad 3")
+    assert sorted(later) == [1, 2, 4, 5]
+
+
+def test_error_in_last_stage_is_reported():
+    def send(item):
+        if item == 2:
+            raise RuntimeError("send failed")
+        return item
+
+    stages = [
+        PipelineStage("render", lambda item: item, 1),
+        PipelineStage("send", send, 1),
+    ]
+
+    results = run_pipeline(range(4), stages)
+
+    assert results[2] == PipelineResult(2, "send", "send failed")
+    assert [result.failed_stage for result in results] == [None, None, "send", None]
+
+
+def test_bounded_queues_hold_back_fast_stage():
+    released = threading.Event()
+    produced = []
+
+    def produce(item):
+        produced.append(item)
+        return item
+
+    def consume(item):
+        released.wait(10)
+        return item
+
+    stages = [
+        PipelineStage("produce", produce, 1),
+        PipelineStage("consume", consume, 1),
+    ]
+    results = []
+    runner = threading.Thread(
+        target=lambda: results.extend(run_pipeline(range(100), stages, queue_size=2))
+    )
+    runner.start()
+
+    # Один элемент ждет в медленном этапе, два - в очереди перед ним,
+    # еще один обработан и ждет места в очереди
+    deadline = time.monotonic() + 5
+    while len(produced) < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.2)
+    assert len(produced) == 4
+
+    released.set()
+    runner.join(10)
+    assert not runner.is_alive()
+    assert len(produced) == 100
+    assert [result.item for result in results] == list(range(100))
@@ -0,0 +1,164 @@
+import smtplib
+
+import pytest
+
+import rate_limit
+from rate_limit import RateLimiter, create_rate_limiter, is_throttling_error
+
+
+class FakeClock:
+    """Время для ограничителя: sleep только сдвигает monotonic"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeConfig:
+    def __init__(self, values):
+        self.values = values
+
+    def get(self, section, option, fallback=None):
+        return self.values.get(f"{section}.{option}", fallback)
+
+    def getint(self, section, option, fallback=None):
+        value = self.values.get(f"{section}.{option}")
+        return int(value) if value is not None else fallback
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(rate_limit.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_acquire_waits_for_tokens(clock):
+    limiter = RateLimiter(rate=2.0, burst=1)
+
+    limiter.acquire()
+    limiter.acquire()
+    limiter.acquire()
+
+    assert clock.sleeps == [pytest.approx(0.5), pytest.approx(0.5)]
+
+
+def test_burst_passes_without_waiting(clock):
+    limiter = RateLimiter(rate=1.0, burst=3)
+
+    for _ in range(3):
+        limiter.acquire()
+
+    assert clock.sleeps == []
+
+
+def test_disabled_limiter_never_waits(clock):
+    limiter = RateLimiter(rate=0)
+
+    for _ in range(10):
+        limiter.acquire()
+
+    assert not limiter.enabled
+    assert clock.sleeps == []
+
+
+def test_throttle_halves_rate_down_to_minimum(clock):
+    limiter = RateLimiter(rate=8.0, min_rate=1.5)
+
+    limiter.on_throttle()
+    assert limiter.rate == 4.0
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.rate == 1.5
+    assert clock.sleeps == []
+
+
+def test_throttle_empties_bucket(clock):
+    limiter = RateLimiter(rate=1.0, burst=5)
+
+    limiter.on_throttle()
+    limiter.acquire()
+
+    assert clock.sleeps == [pytest.approx(2.0)]
+
+
+def test_success_restores_rate_gradually(clock):
+    limiter = RateLimiter(rate=10.0)
+    limiter.on_throttle()
+
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(5.5)
+    for _ in range(20):
+        limiter.on_success()
+    assert limiter.rate == 10.0
+
+
+def test_disabled_limiter_backs_off_exponentially(clock):
+    limiter = RateLimiter(rate=0, backoff=5)
+
+    for attempt in range(6):
+        limiter.on_throttle(attempt)
+
+    assert clock.sleeps == [5, 10, 20, 40, 60, 60]
+
+
+def test_throttling_errors():
+    assert is_throttling_error(smtplib.SMTPResponseException(421, b"slow down"))
+    assert is_throttling_error(
+        smtplib.SMTPRecipientsRefused({"a@example.com": (450, b"try later")})
+    )
+    assert not is_throttling_error(smtplib.SMTPResponseException(550, b"no user"))
+    assert not is_throttling_error(ConnectionError())
+
+
+def test_smtp_rate_falls_back_to_delay_between_files():
+    config = FakeConfig({"processing.delay_between_files": "4"})
+
+    limiter = create_rate_limiter(config, "smtp")
+
+    assert limiter.max_rate == 0.25
+    assert limiter.backoff == 5
+
+
+def test_stage_settings_are_read_from_rate_limits():
+    config = FakeConfig(
+        {
+            "processing.delay_between_files": "4",
+            "rate_limits.smtp": "2",
+            "rate_limits.smtp_burst": "3",
+            "rate_limits.smtp_min": "0.5",
+            "rate_limits.smtp_backoff": "1",
+        }
+    )
+
+    limiter = create_rate_limiter(config, "smtp")
+
+    assert (limiter.max_rate, limiter.burst, limiter.min_rate) == (2.0, 3, 0.5)
+    assert limiter.backoff == 1
+    assert not create_rate_limiter(config, "render").enabled
+
+
+def test_mailer_retries_throttled_message_with_backoff(clock, monkeypatch):
+    from smtp_mailer import SmtpMailer
+
+    mailer = SmtpMailer("localhost", 25, "", "", limiter=RateLimiter(backoff=2))
+    attempts = []
+
+    def send_once(message):
+        attempts.append(message)
+        if len(attempts) < 3:
+            raise smtplib.SMTPResponseException(421, b"slow down")
+
+    monkeypatch.setattr(mailer, "_send_once", send_once)
+    mailer.send("message")
+
+    assert len(attempts) == 3
+    assert clock.sleeps == [2, 4]
@@ -0,0 +1,200 @@
+import math
+import os
+
+import pandas as pd
+import pytest
+
+import roster
+from roster import (
+    ROSTER_COLUMNS,
+    iter_roster_chunks,
+    load_roster,
+    prepare_participants,
+    sidecar_path,
+    split_chunks,
+)
+
+
+def make_frame(rows=5):
+    return pd.DataFrame(
+        {
+            "ФИО участника": [f"Участник {index}" for index in range(rows)],
+            "Название доклада": [f"Доклад {index}" for index in range(rows)],
+            "ФИО руководителя": [f"Руководитель {index}" for index in range(rows)],
+            "e-mail": [f"user{index}@example.com" for index in range(rows)],
+            "Призер": [index % 4 for index in range(rows)],
+            "Лишняя колонка": ["x"] * rows,
+        }
+    )
+
+
+@pytest.fixture
+def table(tmp_path):
+    path = str(tmp_path / "roster.xlsx")
+    make_frame().to_excel(path, index=False)
+    return path
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """Считает чтения исходной таблицы (мимо кэша)"""
+    calls = []
+    read_table = roster._read_table
+
+    def counting_read(path, columns):
+        calls.append(path)
+        return read_table(path, columns)
+
+    monkeypatch.setattr(roster, "_read_table", counting_read)
+    return calls
+
+
+def test_only_requested_columns_are_loaded(table):
+    frame = load_roster(table, ["ФИО участника", "e-mail"])
+
+    assert list(frame.columns) == ["ФИО участника", "e-mail"]
+    assert len(frame) == 5
+
+
+def test_sidecar_is_reused(table, reads):
+    first = load_roster(table)
+    second = load_roster(table, ["ФИО участника"])
+
+    assert os.path.exists(sidecar_path(table))
+    assert len(reads) == 1
+    pd.testing.assert_frame_equal(second, first[["ФИО участника"]])
+
+
+def test_changed_table_invalidates_sidecar(table, reads):
+    load_roster(table)
+    make_frame(rows=3).to_excel(table, index=False)
+
+    frame = load_roster(table)
+
+    assert len(reads) == 2
+    assert len(frame) == 3
+
+
+def test_touched_but_unchanged_table_keeps_sidecar(table, reads):
+    load_roster(table)
+    stat = os.stat(table)
+    os.utime(table, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    load_roster(table)
+    load_roster(table)
+
+    assert len(reads) == 1
+
+
+def test_broken_sidecar_is_ignored(table, reads):
+    with open(sidecar_path(table), "wb") as file:
+        file.write(b"not a pickle")
+
+    frame = load_roster(table)
+
+    assert len(reads) == 1
+    assert len(frame) == 5
+
+
+def test_cache_can_be_disabled(table, reads):
+    load_roster(table, use_cache=False)
+    load_roster(table, use_cache=False)
+
+    assert len(reads) == 2
+    assert not os.path.exists(sidecar_path(table))
+
+
+def test_participants_keep_row_values():
+    frame = pd.DataFrame(
+        {
+            "ФИО участника": [" Иванов Иван ", math.nan],
+            "Название доклада": ["Доклад", None],
+            "ФИО руководителя": [math.nan, "Петров: П/П"],
+            "e-mail": ["a@example.com", "b@example.com"],
+            "Призер": [2, math.nan],
+        },
+        index=[3, 4],
+    )
+
+    first, second = prepare_participants(frame)
+
+    assert first.index == 3
+    assert first.fio == "Иванов Иван"
+    assert first.safe_fio == "Иванов_Иван"
+    # Как str(row[...]) в построчной обработке
+    assert first.supervisor == "nan"
+    assert second.fio == "nan"
+    # None из чтения по частям дает то же, что и NaN
+    assert second.paper_title == "nan"
+    assert second.safe_supervisor == "Петров__П_П"
+    assert first.complete
+    assert not second.complete
+
+
+def test_only_one_two_three_are_prizes():
+    frame = pd.DataFrame({"Призер": [1, 2.0, 3, 4, 0, math.nan, "1", " 1", "1 место"]})
+
+    participants = prepare_participants(frame)
+
+    assert [participant.prize for participant in participants] == [
+        1,
+        2,
+        3,
+        0,
+        0,
+        0,
+        0,
+        0,
+        0,
+    ]
+    assert [participant.prize_text for participant in participants[:4]] == [
+        "I место",
+        "II место",
+        "III место",
+        "",
+    ]
+
+
+def test_missing_columns_give_empty_values():
+    participants = prepare_participants(pd.DataFrame({"ФИО участника": ["Иванов"]}))
+
+    assert participants[0].paper_title == ""
+    assert participants[0].prize == 0
+    assert not participants[0].complete
+
+
+@pytest.mark.parametrize("extension", [".xlsx", ".csv"])
+@pytest.mark.parametrize("chunk_size", [1, 4, 7, 100])
+def test_chunks_match_load_roster(tmp_path, extension, chunk_size):
+    path = str(tmp_path / f"roster{extension}")
+    frame = make_frame(rows=7)
+    # Пустая строка в середине таблицы сохраняется и в частях
+    frame.loc[3] = math.nan
+    if extension == ".csv":
+        frame.to_csv(path, index=False)
+    else:
+        frame.to_excel(path, index=False)
+
+    expected = load_roster(path, ROSTER_COLUMNS, use_cache=False)
+    chunks = list(iter_roster_chunks(path, ROSTER_COLUMNS, chunk_size))
+
+    assert all(len(chunk) <= chunk_size for chunk in chunks)
+    indices = [index for chunk in chunks for index in chunk.index]
+    assert indices == expected.index.tolist()
+    streamed = [
+        participant for chunk in chunks for participant in prepare_participants(chunk)
+    ]
+    assert streamed == prepare_participants(expected)
+
+
+@pytest.mark.parametrize(
+    "chunk_size, expected",
+    [
+        (0, [[1, 2, 3, 4, 5]]),
+        (2, [[1, 2], [3, 4], [5]]),
+        (5, [[1, 2, 3, 4, 5]]),
+        (10, [[1, 2, 3, 4, 5]]),
+    ],
+)
+def test_split_chunks(chunk_size, expected):
+    assert split_chunks([1, 2, 3, 4, 5], chunk_size) == expected
@@ -0,0 +1,118 @@
+import configparser
+import os
+
+import pytest
+
+from hashing import content_hash
+from send_ledger import NullLedger, SendLedger, open_ledger
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    with SendLedger(str(tmp_path / "ledger.sqlite3")) as ledger:
+        yield ledger
+
+
+def test_unknown_invitation_has_no_state(ledger):
+    assert ledger.get("a@example.com", "key") == (None, None)
+    assert not ledger.is_sent("a@example.com", "key")
+    assert ledger.converted_pdf("a@example.com", "key") is None
+
+
+def test_states_advance_and_keep_pdf_path(ledger, tmp_path):
+    pdf_path = tmp_path / "invitation.pdf"
+    pdf_path.write_bytes(b"%PDF")
+
+    ledger.mark("a@example.com", "key", "rendered", "invitation.docx")
+    assert ledger.get("a@example.com", "key") == ("rendered", "invitation.docx")
+    assert ledger.converted_pdf("a@example.com", "key") is None
+
+    ledger.mark("a@example.com", "key", "converted", str(pdf_path))
+    assert ledger.converted_pdf("a@example.com", "key") == str(pdf_path)
+
+    # Без нового пути остается записанный раньше
+    ledger.mark("a@example.com", "key", "sent")
+    assert ledger.get("a@example.com", "key") == ("sent", str(pdf_path))
+    assert ledger.is_sent("a@example.com", "key")
+    assert ledger.converted_pdf("a@example.com", "key") is None
+
+
+def test_unknown_state_is_rejected(ledger):
+    with pytest.raises(ValueError):
+        ledger.mark("a@example.com", "key", "queued")
+
+
+def test_converted_pdf_must_exist(ledger, tmp_path):
+    ledger.mark("a@example.com", "key", "converted", str(tmp_path / "missing.pdf"))
+
+    assert ledger.converted_pdf("a@example.com", "key") is None
+
+
+def test_changed_content_is_a_new_invitation(ledger):
+    old_key = content_hash("template", "Иванов", "Доклад")
+    new_key = content_hash("template", "Иванов", "Новый доклад")
+    ledger.mark("a@example.com", old_key, "sent")
+
+    assert ledger.is_sent("a@example.com", old_key)
+    assert not ledger.is_sent("a@example.com", new_key)
+    assert not ledger.is_sent("b@example.com", old_key)
+
+
+def test_stored_pdf_is_removed_after_sending(ledger):
+    pdf_path = ledger.store_pdf("a@example.com", "key", b"%PDF-data")
+    ledger.mark("a@example.com", "key", "converted", pdf_path)
+
+    assert os.path.dirname(pdf_path) == ledger.pdf_directory
+    assert ledger.converted_pdf("a@example.com", "key") == pdf_path
+    with open(pdf_path, "rb") as file:
+        assert file.read() == b"%PDF-data"
+
+    ledger.mark("a@example.com", "key", "sent")
+    assert not os.path.exists(pdf_path)
+
+
+def test_pdf_outside_ledger_is_kept_after_sending(ledger, tmp_path):
+    pdf_path = tmp_path / "archive.pdf"
+    pdf_path.write_bytes(b"%PDF")
+    ledger.mark("a@example.com", "key", "converted", str(pdf_path))
+
+    ledger.mark("a@example.com", "key", "sent")
+
+    assert pdf_path.exists()
+
+
+def test_rerun_resumes_from_saved_states(tmp_path):
+    path = str(tmp_path / "ledger.sqlite3")
+    with SendLedger(path) as ledger:
+        ledger.mark("sent@example.com", "key", "sent")
+        pdf_path = ledger.store_pdf("converted@example.com", "key", b"%PDF")
+        ledger.mark("converted@example.com", "key", "converted", pdf_path)
+        ledger.mark("rendered@example.com", "key", "rendered")
+
+    with SendLedger(path) as ledger:
+        assert ledger.is_sent("sent@example.com", "key")
+        assert ledger.converted_pdf("converted@example.com", "key") == pdf_path
+        assert ledger.get("rendered@example.com", "key")[0] == "rendered"
+        assert ledger.converted_pdf("rendered@example.com", "key") is None
+
+
+def test_open_ledger_follows_config(tmp_path):
+    config = configparser.ConfigParser()
+    config.read_string("[ledger]\nenabled = false\n")
+    assert isinstance(open_ledger(config, str(tmp_path)), NullLedger)
+
+    config.read_string("[ledger]\nenabled = true\nfilename = journal.sqlite3\n")
+    ledger = open_ledger(config, str(tmp_path / "output"))
+    try:
+        assert ledger.path == str(tmp_path / "output" / "journal.sqlite3")
+        assert ledger.pdf_directory == str(tmp_path / "output" / "journal_pdf")
+    finally:
+        ledger.close()
+
+
+def test_null_ledger_records_nothing():
+    ledger = NullLedger()
+    ledger.mark("a@example.com", "key", "sent")
+
+    assert not ledger.is_sent("a@example.com", "key")
+    assert ledger.store_pdf("a@example.com", "key", b"%PDF") is None
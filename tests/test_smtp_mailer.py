@@ -0,0 +1,134 @@
+import smtplib
+from email.message import EmailMessage
+
+import pytest
+
+import smtp_mailer
+from rate_limit import RateLimiter
+from smtp_mailer import SMTP_THROTTLE_RETRIES, SmtpMailer
+
+
+class FakeSMTP:
+    """Заглушка smtplib.SMTP: ошибки отправки берутся из очереди failures"""
+
+    connections = []
+    failures = []
+
+    def __init__(self, server, port, timeout=None):
+        self.sent = []
+        self.closed = False
+        self.logins = 0
+        FakeSMTP.connections.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        self.logins += 1
+
+    def send_message(self, message):
+        if FakeSMTP.failures:
+            error = FakeSMTP.failures.pop(0)
+            if error is not None:
+                raise error
+        self.sent.append(message["To"])
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_smtp(monkeypatch):
+    FakeSMTP.connections = []
+    FakeSMTP.failures = []
+    monkeypatch.setattr(smtp_mailer.smtplib, "SMTP", FakeSMTP)
+    return FakeSMTP
+
+
+def message(number):
+    msg = EmailMessage()
+    msg["To"] = f"user{number}@example.com"
+    return msg
+
+
+def make_mailer(**kwargs):
+    # Без ограничения скорости и без пауз при просьбе сервера подождать
+    kwargs.setdefault("limiter", RateLimiter(backoff=0.0))
+    return SmtpMailer("smtp.example.com", 587, "user", "password", **kwargs)
+
+
+def test_session_is_reused_and_rotated(fake_smtp):
+    with make_mailer(messages_per_session=3) as mailer:
+        for number in range(7):
+            mailer.send(message(number))
+
+    assert [len(connection.sent) for connection in fake_smtp.connections] == [3, 3, 1]
+    # Авторизация один раз на сессию, ротированные сессии закрыты
+    assert [connection.logins for connection in fake_smtp.connections] == [1, 1, 1]
+    assert all(connection.closed for connection in fake_smtp.connections)
+
+
+def test_disconnected_session_is_reopened(fake_smtp):
+    with make_mailer() as mailer:
+        mailer.send(message(0))
+        fake_smtp.failures = [smtplib.SMTPServerDisconnected("timeout")]
+        mailer.send(message(1))
+        mailer.send(message(2))
+
+    first, second = fake_smtp.connections
+    assert first.sent == ["user0@example.com"]
+    assert second.sent == ["user1@example.com", "user2@example.com"]
+
+
+def test_repeated_disconnect_is_raised(fake_smtp):
+    fake_smtp.failures = [smtplib.SMTPServerDisconnected("down")] * 2
+
+    with make_mailer() as mailer:
+        with pytest.raises(smtplib.SMTPServerDisconnected):
+            mailer.send(message(0))
+        # Пул не теряет сессию и продолжает работать
+        mailer.send(message(1))
+
+    assert fake_smtp.connections[-1].sent == ["user1@example.com"]
+
+
+def test_throttled_message_is_retried(fake_smtp):
+    fake_smtp.failures = [
+        smtplib.SMTPResponseException(421, b"try later"),
+        smtplib.SMTPResponseException(451, b"slow down"),
+    ]
+
+    with make_mailer() as mailer:
+        mailer.send(message(0))
+
+    sent = [to for connection in fake_smtp.connections for to in connection.sent]
+    assert sent == ["user0@example.com"]
+
+
+def test_throttling_gives_up_after_retries(fake_smtp):
+    fake_smtp.failures = [smtplib.SMTPResponseException(421, b"try later")] * (
+        SMTP_THROTTLE_RETRIES + 1
+    )
+
+    with make_mailer() as mailer:
+        with pytest.raises(smtplib.SMTPResponseException):
+            mailer.send(message(0))
+
+    assert fake_smtp.failures == []
+
+
+def test_refused_recipient_is_not_retried_and_keeps_session(fake_smtp):
+    fake_smtp.failures = [
+        smtplib.SMTPRecipientsRefused({"user0@example.com": (550, b"no such user")})
+    ]
+
+    with make_mailer() as mailer:
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            mailer.send(message(0))
+        mailer.send(message(1))
+
+    (connection,) = fake_smtp.connections
+    assert connection.sent == ["user1@example.com"]